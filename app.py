@@ -1,91 +1,22 @@
 """
 Flask server for Mental Health Text Analysis API.
+Use create_app() to build the application; importing this module only
+defines it. Schema creation is an explicit step: flask --app app init-db
 """
 
 import logging
 import os
 import re
-from flask import Flask, request, jsonify, render_template, has_request_context
-from flask_sqlalchemy import SQLAlchemy 
+from flask import Flask, has_request_context
 from dotenv import load_dotenv
-import json 
-
-from pydantic import ValidationError
-import pydantic_core 
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from extensions import db 
-
-load_dotenv() 
+from src.models.database import configure_database, install_database_profile
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-
-# User-friendly error messages for both languages
-ERROR_MESSAGES = {
-    'ru': {
-        'text_too_short': 'Текст слишком короткий. Минимальная длина - 10 символов.',
-        'text_too_long': 'Текст слишком длинный. Максимальная длина - 2000 символов.',
-        'validation_error': 'Ошибка проверки данных'
-    },
-    'en': {
-        'text_too_short': 'Text is too short. Minimum length is 10 characters.',
-        'text_too_long': 'Text is too long. Maximum length is 2000 characters.',
-        'validation_error': 'Data validation error'
-    }
-}
-
-@app.errorhandler(ValidationError)
-def handle_validation_error(e):
-    return _handle_validation_error_internal(e)
-
-@app.errorhandler(pydantic_core._pydantic_core.ValidationError)
-def handle_pydantic_core_validation_error(e):
-    return _handle_validation_error_internal(e)
-
-def _handle_validation_error_internal(e):
-    """Common logic for handling ValidationError"""
-    # Detect user language from request
-    language = 'ru'  # Default to Russian
-    if request.data:
-        try:
-            data = request.get_json()
-            language = data.get('language', 'ru')
-        except:
-            pass
-    
-    # Convert Pydantic errors to friendly messages
-    error_messages = []
-    
-    # Handle different Pydantic v1/v2 error formats
-    if hasattr(e, 'errors'):
-        errors = e.errors()
-    else:
-        errors = [{'msg': str(e)}]
-    
-    for error in errors:
-        error_msg = str(error.get('msg', '')).lower()
-        
-        if 'too short' in error_msg or 'text_too_short' in error_msg:
-            error_code = 'text_too_short'
-        elif 'too long' in error_msg or 'text_too_long' in error_msg:
-            error_code = 'text_too_long'
-        else:
-            error_code = 'validation_error'
-        
-        friendly_message = ERROR_MESSAGES[language].get(
-            error_code, 
-            ERROR_MESSAGES[language]['validation_error']
-        )
-        error_messages.append(friendly_message)
-    
-    return jsonify({
-        'error': 'Validation failed',
-        'message': ' | '.join(error_messages),
-        'language': language
-    }), 400
-
 # SECURITY: Filter to mask sensitive user data in logs (PII protection)
 class SensitiveDataFilter(logging.Filter):
     """Filter to mask confidential data in application logs"""
@@ -129,138 +60,53 @@ def get_database_uri():
             os.makedirs(os.path.dirname(db_path), exist_ok=True)
             return f'sqlite:///{db_path}'
 
-app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# ← SECURITY: Apply sensitive data filtering to all loggers
-# IMPORTANT: This protects user privacy by masking personal data in logs
-sensitive_filter = SensitiveDataFilter()
-app.logger.addFilter(sensitive_filter)
-logging.getLogger('werkzeug').addFilter(sensitive_filter)
-
-db.init_app(app) 
-
-with app.app_context():
-    try:
-        db.create_all()
-        logger.info("✅ Database tables created successfully!")
-    except Exception as e:
-        logger.error(f"❌ Error creating database tables: {e}")
-
-from src.models.sql_models import AnalysisResult, User
-from src.api.models import AnalysisRequest
-from src.api.yandex_gpt import get_yandex_gpt_client
-from src.auth.utils import token_required
-from src.auth.routes import auth_bp
-
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-
-@app.route('/')
-def home():
-    """Render main page with analysis form."""
-    return render_template('index.html')
-
-@app.route('/api/analyze', methods=['POST'])
-@token_required  # ADD: Protect endpoint with JWT authentication
-def analyze_text(user_id):
-    """Analyze text using YandexGPT API."""
-    try:
-        client = get_yandex_gpt_client()
-        if client is None:
-            return jsonify({"error": "YandexGPT client not configured"}), 500
-    
-        request_data = request.get_json()
-        app.logger.info(f"Received analysis request (text length: {len(request_data.get('text', ''))} chars, language: {request_data.get('language', 'ru')})")
-
-        analysis_request = AnalysisRequest(**request_data)
-        # ← SECURITY: Log metadata only, not actual text content
-        app.logger.info(f"User {user_id} analyzing text (length: {len(analysis_request.text)} chars, language: {analysis_request.language})")
-        
-        analysis_result = client.analyze_text(
-            text=analysis_request.text,
-            language=analysis_request.language
-        )
-        result_dict = analysis_result.model_dump()
-        
-        db_record = AnalysisResult(
-            user_id=user_id,
-            original_text=analysis_request.text,
-            language=analysis_request.language,
-            sentiment=result_dict['sentiment'],
-            confidence_score=result_dict['confidence_score'],
-            emotions=json.dumps(result_dict['entities']['emotions']),
-            skills=json.dumps(result_dict['entities']['skills']),
-            distortions=json.dumps(result_dict['distortions'])
-        )
-        
-        db.session.add(db_record)
-        db.session.commit()
-        # ← SECURITY: Log successful analysis without exposing data
-        app.logger.info(f"Analysis completed successfully for user {user_id}")
-
-        return jsonify(analysis_result.model_dump())
-        
-    except ValidationError as e:
-        app.logger.info(f"Validation failed for user {user_id} (text length issue)")
-        
-        language = 'ru'
-        if request.data:
-            try:
-                data = request.get_json()
-                language = data.get('language', 'ru')
-            except:
-                pass
-
-        error_msg = str(e).lower()
-        
-        if 'too short' in error_msg:
-            user_message = ERROR_MESSAGES[language]['text_too_short']
-        elif 'too long' in error_msg:
-            user_message = ERROR_MESSAGES[language]['text_too_long']
-        else:
-            user_message = ERROR_MESSAGES[language]['validation_error']
-        
-        return jsonify({
-            'error': 'Validation failed',
-            'message': user_message,
-            'language': language
-        }), 400
-
-    except Exception as e:
-        # ← SECURITY: Log errors without exposing sensitive request data
-        app.logger.error(f"Analysis failed for user {user_id}: {str(e)}")
-        db.session.rollback()
-        return jsonify({"error": "Analysis failed", "details": "Internal server error"}), 500
-    
-# ADD: User profile endpoint (protected)
-@app.route('/api/profile', methods=['GET'])
-@token_required
-def get_user_profile(user_id):
-    """Get current user profile information."""
-    try:
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
-            
-        return jsonify(user.to_dict())
-        
-    except Exception as e:
-        app.logger.error(f"Error fetching profile for user {user_id}: {str(e)}")
-        return jsonify({"error": "Failed to fetch profile", "details": str(e)}), 500
-
-# ADD: User analysis history endpoint (protected)
-@app.route('/api/analyses', methods=['GET'])
-@token_required
-def get_user_analyses(user_id):
-    """Get analysis history for current user."""
-    try:
-        analyses = AnalysisResult.query.filter_by(user_id=user_id).order_by(AnalysisResult.created_at.desc()).all()
-        return jsonify([analysis.to_dict() for analysis in analyses])
-        
-    except Exception as e:
-        app.logger.error(f"Error fetching analyses for user {user_id}: {str(e)}")
-        return jsonify({"error": "Failed to fetch analyses", "details": str(e)}), 500
+def create_app(config=None):
+    """
+    Application factory.
+    Cheap by design: no DB connection, no schema creation, no cipher or
+    YandexGPT client - those are built on first use.
+    """
+    load_dotenv()
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET'] = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
+    # Reverse proxies in front of the app (Railway: 1, set by gunicorn.conf.py); 0 trusts no X-Forwarded-For
+    app.config['TRUSTED_PROXY_HOPS'] = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+    if config:
+        app.config.update(config)
+    configure_database(app)
+
+    # request.remote_addr becomes the client address the trusted proxy saw, so
+    # per-client limits (password hashing) do not treat every user as the proxy
+    proxy_hops = app.config['TRUSTED_PROXY_HOPS']
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
+
+    # ← SECURITY: Apply sensitive data filtering to all loggers
+    # IMPORTANT: This protects user privacy by masking personal data in logs
+    sensitive_filter = SensitiveDataFilter()
+    app.logger.addFilter(sensitive_filter)
+    werkzeug_logger = logging.getLogger('werkzeug')
+    if not any(isinstance(existing, SensitiveDataFilter) for existing in werkzeug_logger.filters):
+        werkzeug_logger.addFilter(sensitive_filter)
+
+    db.init_app(app)
+    install_database_profile(app)
+
+    from src.api.routes import api_bp
+    from src.auth.routes import auth_bp
+    from src.commands import register_commands
+
+    app.register_blueprint(api_bp)
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    register_commands(app)
+
+    return app
+
+app = create_app()
 
 if __name__ == '__main__': 
     logger.info("Starting development server...")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5000)
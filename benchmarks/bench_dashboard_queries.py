@@ -0,0 +1,151 @@
+"""
+Benchmark: dashboard aggregation, legacy pandas pipeline vs SQL GROUP BY.
+Builds a synthetic SQLite database per size and times both approaches.
+
+Usage:
+    python benchmarks/bench_dashboard_queries.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import sqlalchemy as sa
+
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.dashboard import queries
+
+EMOTIONS = ["anxiety", "joy", "guilt", "fatigue", "pride", "fear", "anger", "relief", "sadness", "hope"]
+SENTIMENTS = ["positive", "negative", "neutral", "mixed"]
+DAYS = 30
+
+
+def build_database(path, rows):
+    """Create analysis_results with synthetic rows spread over the last DAYS days"""
+    engine = sa.create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(sa.text("""
+            CREATE TABLE analysis_results (
+                id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, original_text BLOB, text_length INTEGER,
+                language VARCHAR(2) NOT NULL, sentiment VARCHAR(20) NOT NULL,
+                confidence_score FLOAT NOT NULL, created_at DATETIME,
+                emotions TEXT, skills TEXT, distortions TEXT
+            )
+        """))
+        conn.execute(sa.text("CREATE INDEX ix_analysis_results_created_at ON analysis_results (created_at)"))
+
+        rng = random.Random(42)
+        now = datetime.now()
+        blob = os.urandom(400)  # Fernet token of a ~250 char text
+        # Rows arrive chronologically in production, so ids follow created_at
+        offsets = sorted((rng.randint(0, DAYS * 24 * 60) for _ in range(rows)), reverse=True)
+        batch = []
+        for index, offset in enumerate(offsets):
+            batch.append({
+                'user_id': rng.randint(1, 50),
+                'original_text': blob,
+                'text_length': 250,
+                'language': rng.choice(['ru', 'en']),
+                'sentiment': rng.choice(SENTIMENTS),
+                'confidence': rng.random(),
+                'created_at': str(now - timedelta(minutes=offset)),
+                'emotions': json.dumps(rng.sample(EMOTIONS, rng.randint(0, 3))),
+                'skills': json.dumps(["planning"]),
+                'distortions': json.dumps([])
+            })
+            if len(batch) == 10000 or index == rows - 1:
+                conn.execute(sa.text("""
+                    INSERT INTO analysis_results
+                        (user_id, original_text, text_length, language, sentiment, confidence_score,
+                         created_at, emotions, skills, distortions)
+                    VALUES (:user_id, :original_text, :text_length, :language, :sentiment, :confidence,
+                            :created_at, :emotions, :skills, :distortions)
+                """), batch)
+                batch = []
+    return engine
+
+
+def legacy_pipeline(engine, start, end):
+    """The pre-refactor dashboard: load everything, parse per row, loop over emotions"""
+    def parse_json_column(json_str, default):
+        try:
+            if json_str and json_str != '[]':
+                data = json.loads(json_str)
+                return ', '.join(data) if isinstance(data, list) else default
+            return default
+        except json.JSONDecodeError:
+            return default
+
+    query = sa.text("""
+        SELECT id, original_text, sentiment, confidence_score, emotions, skills, distortions, created_at
+        FROM analysis_results
+        WHERE DATE(created_at) BETWEEN :start_date AND :end_date
+    """)
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={'start_date': str(start), 'end_date': str(end)})
+
+    for column in ('emotions', 'skills', 'distortions'):
+        df[column] = df[column].apply(lambda x: parse_json_column(x, 'None'))
+    df['created_at'] = pd.to_datetime(df['created_at'], format='mixed')
+
+    len(df[df['sentiment'] == 'positive'])
+    df['confidence_score'].mean()
+    df['original_text'].str.len().mean()
+    df['sentiment'].value_counts()
+
+    all_emotions = []
+    for emotions_str in df['emotions']:
+        if emotions_str != 'None':
+            all_emotions.extend([e.strip() for e in emotions_str.split(',')])
+    pd.Series(all_emotions).value_counts().head(10)
+
+    df['created_at'].dt.date.value_counts().sort_index()
+
+
+def sql_pipeline(engine, start, end):
+    """The GROUP BY / vectorized dashboard queries"""
+    filters = queries.build_filters(start, end)
+    queries.overview_metrics(queries.sentiment_summary(engine, filters))
+    queries.emotion_counts(engine, filters)
+    queries.timeline(engine, filters)
+
+
+def timed(func, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    end = date.today()
+    start = end - timedelta(days=DAYS)
+
+    print(f"{'rows':>10} | {'legacy, s':>10} | {'sql, s':>10} | {'speedup':>8}")
+    print("-" * 48)
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = build_database(os.path.join(tmp, 'bench.db'), rows)
+            legacy = timed(legacy_pipeline, engine, start, end)
+            grouped = timed(sql_pipeline, engine, start, end)
+            engine.dispose()
+        print(f"{rows:>10} | {legacy:>10.3f} | {grouped:>10.3f} | {legacy / grouped:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: static vs retrieval-based few-shot prompts on the golden standard
+(src/api/few_shot.py, FEW_SHOT_MODE=dynamic).
+
+For every golden case the dynamic prompt is built leave-one-out (the case
+itself is excluded from the pool). Reports prompt tokens (estimated, same
+chars-per-token rule as the budget), top-k selection latency, and how often
+the examples share the case's expected sentiment / at least one distortion
+(a relevance proxy; no LLM calls are made).
+
+Usage:
+    python benchmarks/bench_few_shot.py [--k 3] [--budget 300]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.few_shot import DATA_DIR, estimate_tokens, get_index
+from src.api.yandex_gpt import load_prompt
+
+
+def relevance(examples, expected):
+    """(share with the same sentiment, share with a common distortion)"""
+    if not examples:
+        return 0.0, 0.0
+    distortions = set(expected['distortions'])
+    same_sentiment = sum(output['sentiment'] == expected['sentiment'] for _, output in examples)
+    shared = sum(bool(distortions & set(output['distortions'])) for _, output in examples)
+    return same_sentiment / len(examples), shared / len(examples)
+
+
+def evaluate(language, k, budget):
+    with open(DATA_DIR / f'golden_standard_{language}.json', 'r', encoding='utf-8') as file:
+        cases = json.load(file)
+
+    started = time.perf_counter()
+    index = get_index(language)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    system_tokens = estimate_tokens(load_prompt(f'system_prompt_{language}.md'))
+    static_block = load_prompt(f'few_shot_examples_{language}.md')
+    static_examples = index.examples[:len(index.examples) - len(cases)]
+
+    rows = []
+    for case in cases:
+        text, expected = case['input_text'], case['expected_output']
+        exclude = {text}
+        index.select(text, k, budget, exclude)  # warm
+        started = time.perf_counter()
+        for _ in range(100):
+            selected = index.select(text, k, budget, exclude)
+        latency_us = (time.perf_counter() - started) * 1e6 / 100
+
+        dynamic_block = '\n\n'.join(index.formatted[position] for position in selected)
+        rows.append({
+            'static_tokens': system_tokens + estimate_tokens(static_block) + estimate_tokens(text),
+            'dynamic_tokens': system_tokens + estimate_tokens(dynamic_block) + estimate_tokens(text),
+            'latency_us': latency_us,
+            'examples': len(selected),
+            'static_relevance': relevance(static_examples, expected),
+            'dynamic_relevance': relevance([index.examples[position] for position in selected], expected),
+        })
+    return build_ms, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--budget', type=int, default=300, help='Token budget for the examples')
+    args = parser.parse_args()
+
+    for language in ('ru', 'en'):
+        build_ms, rows = evaluate(language, args.k, args.budget)
+        latencies = sorted(row['latency_us'] for row in rows)
+        static_tokens = statistics.mean(row['static_tokens'] for row in rows)
+        dynamic_tokens = statistics.mean(row['dynamic_tokens'] for row in rows)
+        print(f"[{language}] {len(rows)} cases, index built in {build_ms:.1f}ms")
+        print(f"  prompt tokens   static {static_tokens:.0f}  dynamic {dynamic_tokens:.0f}"
+              f"  ({(dynamic_tokens / static_tokens - 1) * 100:+.0f}%),"
+              f" {statistics.mean(row['examples'] for row in rows):.1f} examples")
+        print(f"  top-k latency   p50 {statistics.median(latencies):.0f}us"
+              f"  p95 {latencies[int(len(latencies) * 0.95)]:.0f}us")
+        for label, key in (('static', 'static_relevance'), ('dynamic', 'dynamic_relevance')):
+            sentiment = statistics.mean(row[key][0] for row in rows)
+            distortion = statistics.mean(row[key][1] for row in rows)
+            print(f"  {label:<8} examples: same sentiment {sentiment:.0%}, shared distortion {distortion:.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: cold import time of the web app (python -X importtime).
+Imports `app` in fresh interpreters without ENCRYPTION_KEY or a database,
+reports the median total and the slowest top-level imports, and fails if the
+budget is exceeded or a module that should load lazily is imported.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 5] [--budget-ms 1500] [--top 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Built on first use, never at import
+LAZY_MODULES = ('pyarrow', 'pandas', 'requests', 'src.api.yandex_gpt', 'src.api.models', 'src.api.fast_classifier')
+
+
+def import_once(env):
+    """One cold import; returns (total_us, [(cumulative_us, module)] imported by app, loaded lazy modules)"""
+    check = f"import sys, app; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', check],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    # importtime lists children before their parent, indented two spaces per level
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children.append((int(cumulative_us), name.strip()))
+        elif depth == 0:
+            if name.strip() == 'app':
+                loaded = [module for module in result.stdout.strip().split(',') if module]
+                return int(cumulative_us), sorted(children, reverse=True), loaded
+            children = []
+    raise RuntimeError("app import not found in importtime output")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500.0, help='Fail if the median import exceeds this')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    env = {key: value for key, value in os.environ.items() if key not in ('ENCRYPTION_KEY', 'DATABASE_URL')}
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_import_'), 'absent.db')}"
+
+    runs = [import_once(env) for _ in range(args.runs)]
+    totals = [total / 1000 for total, _, _ in runs]
+    median_ms = statistics.median(totals)
+    _, children, loaded = runs[-1]
+
+    print(f"import app: median {median_ms:.0f}ms over {args.runs} runs (min {min(totals):.0f}ms, max {max(totals):.0f}ms)")
+    for cumulative, name in children[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f}ms  {name}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median import {median_ms:.0f}ms exceeds budget {args.budget_ms:.0f}ms")
+    if loaded:
+        failures.append(f"imported eagerly: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
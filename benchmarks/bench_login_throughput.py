@@ -0,0 +1,140 @@
+"""
+Benchmark: login throughput and analyze latency under mixed load,
+password hashing inline vs in the hashing process pool.
+Runs the Flask app in-process against a temporary SQLite database with a
+fake upstream model, so only the app's own work is measured.
+
+Usage:
+    python benchmarks/bench_login_throughput.py [--duration 10] [--login-threads 8] [--analyze-threads 8] [--pool-workers 2]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'bench.db')
+os.environ['DATABASE_URL'] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault('ENCRYPTION_KEY', 'YmVuY2htYXJrLWtleS1ub3QtZm9yLXByb2R1Y3Rpb24=')
+
+from app import app, db
+from src.api.models import AnalysisResponse, Entities
+from src.auth.hashing import password_hasher
+from src.auth.utils import generate_jwt_token
+from src.models.sql_models import User
+
+PASSWORD = "bench_password_123"
+
+
+class FakeClient:
+    """Upstream stand-in: network wait plus response parsing work"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def analyze_text(self, text, language="ru"):
+        time.sleep(self.latency)
+        return AnalysisResponse(
+            sentiment="neutral",
+            entities=Entities(emotions=["calm"], skills=[]),
+            distortions=[],
+            confidence_score=0.8
+        )
+
+
+def setup_users(count):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users = []
+        for index in range(count):
+            user = User(username=f"bench_{index}", email=f"bench_{index}@example.com")
+            user.set_password(PASSWORD)
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def run_mixed_load(duration, login_threads, analyze_threads, user_ids):
+    """Run logins and analyses concurrently; returns counters and latencies"""
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'logins': 0, 'rejected': 0, 'login_latency': [], 'analyze_latency': []}
+
+    def login_worker(index):
+        client = app.test_client()
+        environ = {'REMOTE_ADDR': f"10.0.0.{index + 1}"}
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post('/api/auth/login', environ_base=environ,
+                                   json={'username': f"bench_{index % len(user_ids)}", 'password': PASSWORD})
+            elapsed = time.perf_counter() - started
+            with lock:
+                if response.status_code == 200:
+                    stats['logins'] += 1
+                    stats['login_latency'].append(elapsed)
+                elif response.status_code == 429:
+                    stats['rejected'] += 1
+
+    def analyze_worker(index):
+        client = app.test_client()
+        headers = {'Authorization': f"Bearer {generate_jwt_token(user_ids[index % len(user_ids)])}"}
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.post('/api/analyze', headers=headers, json={'text': "Benchmark journal entry", 'language': 'en'})
+            with lock:
+                stats['analyze_latency'].append(time.perf_counter() - started)
+
+    with app.app_context():
+        threads = [threading.Thread(target=login_worker, args=(i,)) for i in range(login_threads)]
+        threads += [threading.Thread(target=analyze_worker, args=(i,)) for i in range(analyze_threads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return stats
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--analyze-threads', type=int, default=8)
+    parser.add_argument('--pool-workers', type=int, default=2)
+    parser.add_argument('--upstream-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    user_ids = setup_users(max(args.login_threads, args.analyze_threads))
+
+    print(f"{'mode':<12}{'logins/s':>10}{'429s':>8}{'login p50':>12}{'analyze p50':>13}{'analyze p95':>13}")
+    with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=FakeClient(args.upstream_latency)):
+        for label, workers in (('inline', 0), (f'pool x{args.pool_workers}', args.pool_workers)):
+            password_hasher.workers = workers
+            stats = run_mixed_load(args.duration, args.login_threads, args.analyze_threads, user_ids)
+            print(f"{label:<12}{stats['logins'] / args.duration:>10.1f}{stats['rejected']:>8}"
+                  f"{statistics.median(stats['login_latency']) * 1000 if stats['login_latency'] else float('nan'):>10.0f}ms"
+                  f"{percentile(stats['analyze_latency'], 0.5) * 1000:>11.0f}ms"
+                  f"{percentile(stats['analyze_latency'], 0.95) * 1000:>11.0f}ms")
+    password_hasher.shutdown()
+
+
+if __name__ == '__main__':
+    main()
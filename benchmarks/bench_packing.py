@@ -0,0 +1,107 @@
+"""
+Benchmark: upstream calls and prompt tokens per analyzed text, one text per
+completion vs packing mode (YandexGPTClient.analyze_texts).
+
+The corpus is the golden standard texts (both languages, repeated). The HTTP
+session is replaced by a fake that answers every item, with a share of
+packed items made invalid to exercise the per-item re-run; prompt tokens
+are estimated with the same chars-per-token rule as the packing budget.
+
+Usage:
+    python benchmarks/bench_packing.py [--repeat 5] [--invalid 0.05] [--budget 1500]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+from pathlib import Path
+
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ.setdefault('YANDEX_API_KEY', 'bench')
+os.environ.setdefault('YANDEX_FOLDER_ID', 'bench')
+
+from src.api.yandex_gpt import PACK_MAX_ITEMS, YandexGPTClient
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+RESULT = {"sentiment": "neutral", "entities": {"emotions": [], "skills": []}, "distortions": [], "confidence_score": 0.8}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return {"result": {"alternatives": [{"message": {"text": self.text}}]}}
+
+
+class FakeSession:
+    def __init__(self, invalid_share, seed=1):
+        self.invalid_share = invalid_share
+        self.random = random.Random(seed)
+
+    def post(self, url, **kwargs):
+        prompt = kwargs['json']['messages'][1]['text']
+        if "USER TEXTS TO ANALYZE" not in prompt:
+            return FakeResponse(json.dumps(RESULT))
+        count = prompt.split("USER TEXTS TO ANALYZE:", 1)[1].count("\n[") + 1
+        items = []
+        for number in range(1, count + 1):
+            invalid = self.random.random() < self.invalid_share
+            items.append(dict(RESULT, id=number, confidence_score=1.5 if invalid else 0.8))
+        return FakeResponse(json.dumps(items))
+
+
+def load_corpus(repeat):
+    corpus = []
+    for language in ('ru', 'en'):
+        with open(DATA_DIR / f'golden_standard_{language}.json', 'r', encoding='utf-8') as file:
+            corpus.extend((case['input_text'], language) for case in json.load(file))
+    return corpus * repeat
+
+
+def run(corpus, pack, invalid_share, budget):
+    client = YandexGPTClient()
+    client.session = FakeSession(invalid_share)
+    for language in ('ru', 'en'):
+        texts = [text for text, text_language in corpus if text_language == language]
+        if pack:
+            client.analyze_texts(texts, language, token_budget=budget)
+        else:
+            for text in texts:
+                client.analyze_text(text, language)
+    return client.usage_per_text()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Copies of the golden corpus')
+    parser.add_argument('--invalid', type=float, default=0.05, help='Share of packed items returned invalid')
+    parser.add_argument('--budget', type=int, default=1500, help='Token budget for the texts of one pack')
+    args = parser.parse_args()
+    # Re-run warnings for the injected invalid items are expected
+    logging.basicConfig(level=logging.ERROR)
+
+    corpus = load_corpus(args.repeat)
+    print(f"{len(corpus)} texts, pack budget {args.budget} tokens / {PACK_MAX_ITEMS} items, "
+          f"{args.invalid:.0%} invalid packed items")
+    print(f"{'mode':<8}{'calls':>7}{'calls/text':>12}{'prompt tokens/text':>20}")
+    baseline = None
+    for label, pack in (('single', False), ('packed', True)):
+        usage = run(corpus, pack, args.invalid, args.budget)
+        print(f"{label:<8}{usage['calls']:>7}{usage['calls_per_text']:>12.2f}{usage['prompt_tokens_per_text']:>20.0f}")
+        if baseline is None:
+            baseline = usage
+        else:
+            print(f"reduction: calls {1 - usage['calls'] / baseline['calls']:.0%}, prompt tokens per text "
+                  f"{1 - usage['prompt_tokens_per_text'] / baseline['prompt_tokens_per_text']:.0%}")
+
+
+if __name__ == '__main__':
+    main()
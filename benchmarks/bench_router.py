@@ -0,0 +1,139 @@
+"""
+Benchmark: model routing on the golden standard, MODEL_ROUTING=full vs
+cascade (src/api/router.py). Reports p50/p95 latency, sentiment accuracy,
+distortion F1 and the per-route split, to tune CASCADE_MIN_CONFIDENCE.
+
+Runs against the real API (YANDEX_API_KEY / YANDEX_FOLDER_ID must be set).
+--simulate replaces the API with a fake: the full model answers the golden
+output in ~1s; the lite model answers in ~0.3s, matching the golden output
+with probability 0.75 and reporting lower confidence when it is wrong.
+
+Usage:
+    python benchmarks/bench_router.py [--simulate] [--min-confidence 0.75]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api import router, yandex_gpt
+from src.api.fast_classifier import canonical_distortion
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+
+
+class SimulatedSession:
+    """Fake API keyed by the user text embedded at the end of the prompt"""
+
+    def __init__(self, cases, time_scale, seed=7):
+        self.expected = {case['input_text']: case['expected_output'] for case in cases}
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+
+    def post(self, url, **kwargs):
+        model = kwargs['json']['modelUri'].rsplit('/', 1)[1]
+        prompt = kwargs['json']['messages'][1]['text']
+        text = prompt.split("USER TEXT TO ANALYZE:\n", 1)[1].rsplit("\n\nASSISTANT RESPONSE", 1)[0]
+        output = dict(self.expected[text], confidence_score=0.9)
+
+        if model == router.LITE_MODEL:
+            time.sleep(self.random.uniform(0.2, 0.4) * self.time_scale)
+            if self.random.random() >= 0.75:
+                wrong = [value for value in ('positive', 'negative', 'neutral', 'mixed') if value != output['sentiment']]
+                output = dict(output, sentiment=self.random.choice(wrong), distortions=[],
+                              confidence_score=round(self.random.uniform(0.5, 0.85), 2))
+            else:
+                output['confidence_score'] = round(self.random.uniform(0.7, 0.95), 2)
+        else:
+            time.sleep(self.random.uniform(0.8, 1.2) * self.time_scale)
+        return SimulatedResponse(json.dumps(output, ensure_ascii=False))
+
+
+class SimulatedResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return {"result": {"alternatives": [{"message": {"text": self.text}}]}}
+
+
+def load_cases():
+    cases = []
+    for language in ('ru', 'en'):
+        with open(DATA_DIR / f'golden_standard_{language}.json', 'r', encoding='utf-8') as file:
+            cases.extend(dict(case, language=language) for case in json.load(file))
+    return cases
+
+
+def run(mode, cases, session):
+    model_router = router.ModelRouter(mode)
+    yandex_gpt.model_router = model_router
+    client = yandex_gpt.YandexGPTClient()
+    if session:
+        client.session = session
+
+    latencies = []
+    correct = true_pos = false_pos = false_neg = failed = 0
+    for case in cases:
+        started = time.perf_counter()
+        try:
+            result = client.analyze_text(case['input_text'], case['language'])
+        except Exception:
+            failed += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+
+        expected = case['expected_output']
+        correct += result.sentiment == expected['sentiment']
+        expected_distortions = {canonical_distortion(label) for label in expected['distortions']}
+        found = {canonical_distortion(label) for label in result.distortions}
+        true_pos += len(expected_distortions & found)
+        false_pos += len(found - expected_distortions)
+        false_neg += len(expected_distortions - found)
+
+    f1 = 2 * true_pos / max(2 * true_pos + false_pos + false_neg, 1)
+    return latencies, correct / len(cases), f1, failed, model_router.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--simulate', action='store_true', help='Use a fake API instead of YandexGPT')
+    parser.add_argument('--time-scale', type=float, default=0.05, help='Simulated latency multiplier')
+    parser.add_argument('--min-confidence', type=float, default=router.CASCADE_MIN_CONFIDENCE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    router.CASCADE_MIN_CONFIDENCE = args.min_confidence
+    # Latency-based skipping would make the split depend on run order
+    router.CASCADE_LATENCY_RATIO = float('inf')
+    cases = load_cases()
+    if args.simulate:
+        os.environ.setdefault('YANDEX_API_KEY', 'bench')
+        os.environ.setdefault('YANDEX_FOLDER_ID', 'bench')
+
+    print(f"{len(cases)} golden cases, cascade min confidence {args.min_confidence}"
+          f"{' (simulated API)' if args.simulate else ''}")
+    print(f"{'mode':<9}{'p50':>8}{'p95':>8}{'sentiment':>11}{'distortion F1':>15}{'failed':>8}")
+    for mode in ('full', 'cascade'):
+        session = SimulatedSession(cases, args.time_scale) if args.simulate else None
+        latencies, accuracy, f1, failed, snapshot = run(mode, cases, session)
+        ordered = sorted(latencies) or [float('nan')]
+        print(f"{mode:<9}{statistics.median(ordered) * 1000:>6.0f}ms{ordered[int(len(ordered) * 0.95)] * 1000:>6.0f}ms"
+              f"{accuracy:>11.0%}{f1:>15.2f}{failed:>8}")
+        for route, stats in snapshot['routes'].items():
+            print(f"    {route:<28}{stats['count']:>4}  p50 {stats['p50_ms']:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
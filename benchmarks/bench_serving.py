@@ -0,0 +1,186 @@
+"""
+Benchmark: concurrent in-flight analyses per GB of RAM, sync vs gevent workers.
+Starts a fake YandexGPT endpoint with fixed latency, runs gunicorn with
+gunicorn.conf.py in each serving mode, fires concurrent /api/analyze requests
+and samples the resident memory of the gunicorn process tree.
+
+Usage:
+    python benchmarks/bench_serving.py [--concurrency 200] [--requests 600] [--latency 1.0]
+"""
+
+import argparse
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+UPSTREAM_TEXT = json.dumps({
+    "sentiment": "neutral",
+    "entities": {"emotions": ["calm"], "skills": []},
+    "distortions": [],
+    "confidence_score": 0.8
+})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_upstream(latency):
+    """Fake completion endpoint that answers after `latency` seconds"""
+    body = json.dumps({"result": {"alternatives": [{"message": {"text": UPSTREAM_TEXT}}]}}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def prepare_database(env):
+    """Create the schema and a user with an API key in a separate process"""
+    api_key = secrets.token_urlsafe(32)
+    script = (
+        "from app import app, db\n"
+        "from src.models.sql_models import User\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    user = User(username='bench', email='bench@example.com', api_key=%r)\n"
+        "    user.set_password('bench_password_123')\n"
+        "    db.session.add(user)\n"
+        "    db.session.commit()\n"
+    ) % api_key
+    subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return api_key
+
+
+def tree_rss_mb(pid):
+    """Resident memory of a process and all its descendants"""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as children:
+                pending.extend(int(child) for child in children.read().split())
+        except FileNotFoundError:
+            continue
+    return total_kb / 1024
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def run_mode(mode, workers, base_env, api_key, concurrency, total_requests):
+    port = free_port()
+    env = dict(base_env, SERVING_MODE=mode, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    if mode == 'sync':
+        # The per-process scheduler and admission control need gevent workers (gunicorn.conf.py)
+        env.update(SCHEDULER_ENABLED='0', ADMISSION_ENABLED='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_server(port)
+        payload = json.dumps({'text': "Benchmark journal entry about a calm day", 'language': 'en'}).encode()
+
+        def analyze(_):
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/api/analyze", data=payload, method='POST',
+                headers={'Content-Type': 'application/json', 'X-API-Key': api_key}
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=120) as response:
+                    return response.status == 200
+            except OSError:
+                return False
+
+        peak_rss = tree_rss_mb(process.pid)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(analyze, index) for index in range(total_requests)]
+            while not all(future.done() for future in futures):
+                peak_rss = max(peak_rss, tree_rss_mb(process.pid))
+                time.sleep(0.2)
+        elapsed = time.perf_counter() - started
+        succeeded = sum(future.result() for future in futures)
+        return succeeded, elapsed, peak_rss
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=600)
+    parser.add_argument('--latency', type=float, default=1.0, help='Fake upstream latency, seconds')
+    parser.add_argument('--sync-workers', type=int, default=4)
+    parser.add_argument('--gevent-workers', type=int, default=1)
+    args = parser.parse_args()
+
+    upstream = start_upstream(args.latency)
+    workdir = tempfile.mkdtemp(prefix='bench_serving_')
+    base_env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        ENCRYPTION_KEY=os.getenv('ENCRYPTION_KEY', 'YmVuY2htYXJrLWtleS1ub3QtZm9yLXByb2R1Y3Rpb24='),
+        YANDEX_API_KEY='bench', YANDEX_FOLDER_ID='bench',
+        YANDEX_API_URL=f"http://127.0.0.1:{upstream.server_address[1]}/completion",
+        PASSWORD_HASH_WORKERS='0'
+    )
+    api_key = prepare_database(base_env)
+
+    print(f"{'mode':<16}{'ok':>6}{'req/s':>9}{'in flight':>11}{'peak RSS':>12}{'in flight/GB':>14}")
+    for mode, workers in (('sync', args.sync_workers), ('gevent', args.gevent_workers)):
+        succeeded, elapsed, peak_rss = run_mode(mode, workers, base_env, api_key, args.concurrency, args.requests)
+        throughput = succeeded / elapsed
+        # Little's law: average analyses in flight = throughput x upstream latency
+        in_flight = throughput * args.latency
+        print(f"{f'{mode} x{workers}':<16}{succeeded:>6}{throughput:>9.1f}{in_flight:>11.1f}"
+              f"{peak_rss:>10.0f}MB{in_flight / (peak_rss / 1024):>14.1f}")
+    upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark: SQLite under concurrent writers and a dashboard-style reader,
+default settings vs the SQLite production profile (src/models/database.py).
+Writer processes stand in for gunicorn workers saving analyses; one reader
+process repeatedly runs an aggregate query like the dashboard does.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [--writers 4] [--duration 10]
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ.setdefault('ENCRYPTION_KEY', 'YmVuY2htYXJrLWtleS1ub3QtZm9yLXByb2R1Y3Rpb24=')
+
+RESULT = {
+    'sentiment': 'negative',
+    'entities': {'emotions': ['anxiety', 'fatigue'], 'skills': ['planning']},
+    'distortions': ['catastrophizing'],
+    'confidence_score': 0.8
+}
+
+
+def make_app(uri, profile):
+    os.environ['SQLITE_PROFILE'] = '1' if profile else '0'
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': uri})
+
+
+def prepare(uri, profile, users):
+    from extensions import db
+    from src.models.sql_models import User
+
+    app = make_app(uri, profile)
+    with app.app_context():
+        db.create_all()
+        for index in range(users):
+            user = User(username=f"bench_{index}", email=f"bench_{index}@example.com", password_hash='x')
+            db.session.add(user)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def writer(uri, profile, user_id, duration, results):
+    from sqlalchemy.exc import OperationalError
+    from extensions import db
+    from src.models.sql_models import AnalysisResult
+
+    app = make_app(uri, profile)
+    writes = errors = 0
+    deadline = time.monotonic() + duration
+    with app.app_context():
+        while time.monotonic() < deadline:
+            try:
+                db.session.add(AnalysisResult.from_response(
+                    user_id=user_id, text="Benchmark journal entry about a long day",
+                    language='en', result_dict=RESULT
+                ))
+                db.session.commit()
+                writes += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('writer', writes, errors))
+
+
+def reader(uri, profile, duration, results):
+    from sqlalchemy import func, select
+    from sqlalchemy.exc import OperationalError
+    from src.models.database import read_engine
+    from src.models.sql_models import AnalysisResult
+
+    app = make_app(uri, profile)
+    stmt = select(AnalysisResult.sentiment, func.count(), func.avg(AnalysisResult.confidence_score)).group_by(
+        AnalysisResult.sentiment)
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    with app.app_context():
+        engine = read_engine()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(stmt).all()
+                latencies.append((time.perf_counter() - started) * 1000)
+            except OperationalError:
+                errors += 1
+            time.sleep(0.01)
+    results.put(('reader', latencies, errors))
+
+
+def run(profile, writers, duration):
+    uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_sqlite_'), 'bench.db')}"
+    prepare(uri, profile, writers)
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=writer, args=(uri, profile, index + 1, duration, results))
+                 for index in range(writers)]
+    processes.append(multiprocessing.Process(target=reader, args=(uri, profile, duration, results)))
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    writes = sum(item[1] for item in collected if item[0] == 'writer')
+    write_errors = sum(item[2] for item in collected if item[0] == 'writer')
+    _, latencies, read_errors = next(item for item in collected if item[0] == 'reader')
+    return writes / duration, write_errors, latencies, read_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'writes/s':>10}{'locked':>8}{'read p50':>11}{'read p95':>11}{'read max':>11}{'read errors':>13}")
+    for label, profile in (('default', False), ('wal', True)):
+        rate, write_errors, latencies, read_errors = run(profile, args.writers, args.duration)
+        ordered = sorted(latencies) or [float('nan')]
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        print(f"{label:<10}{rate:>10.1f}{write_errors:>8}{statistics.median(ordered):>9.1f}ms"
+              f"{p95:>9.1f}ms{ordered[-1]:>9.1f}ms{read_errors:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: worker memory and first-request latency, cold workers vs
+preload + post-fork warm-up (gunicorn.conf.py PRELOAD_APP / WORKER_WARMUP).
+Memory is read from /proc/<pid>/smaps_rollup: PSS splits shared pages
+between workers, Private is what each worker owns alone.
+
+The fake upstream speaks plain HTTP, so the TLS handshake that warm-up saves
+against the real API is not included in the latency numbers.
+
+Usage:
+    python benchmarks/bench_worker_warmup.py [--workers 4] [--requests 20]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from bench_serving import ROOT, free_port, prepare_database, start_upstream
+
+CONFIGS = (
+    ('cold', {'PRELOAD_APP': '0', 'WORKER_WARMUP': '0'}),
+    ('preload+warmup', {'PRELOAD_APP': '1', 'WORKER_WARMUP': '1'}),
+)
+
+
+def smaps_rollup_mb(pid):
+    """(pss, private) in MB for one process"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            parts = line.split()
+            if parts[0] in ('Pss:', 'Private_Clean:', 'Private_Dirty:'):
+                values[parts[0]] = int(parts[1])
+    return values['Pss:'] / 1024, (values['Private_Clean:'] + values['Private_Dirty:']) / 1024
+
+
+def worker_pids(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as children:
+        return [int(pid) for pid in children.read().split()]
+
+
+def wait_for_workers(master_pid, count, timeout=60):
+    """Wait until all workers are forked and past their warm-up"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(worker_pids(master_pid)) >= count:
+            time.sleep(3)
+            return
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn workers did not start")
+
+
+def run_config(env, workers, api_key, request_count):
+    port = free_port()
+    env = dict(env, SERVING_MODE='sync', SCHEDULER_ENABLED='0', ADMISSION_ENABLED='0', WEB_CONCURRENCY=str(workers), PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_workers(process.pid, workers)
+        payload = json.dumps({'text': "Benchmark journal entry about a calm day", 'language': 'en'}).encode()
+
+        def analyze():
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/api/analyze", data=payload, method='POST',
+                headers={'Content-Type': 'application/json', 'X-API-Key': api_key}
+            )
+            started = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            return (time.perf_counter() - started) * 1000
+
+        latencies = [analyze() for _ in range(request_count)]
+        memory = [smaps_rollup_mb(pid) for pid in worker_pids(process.pid)]
+        return latencies, memory
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake upstream latency, seconds')
+    args = parser.parse_args()
+
+    upstream = start_upstream(args.latency)
+    workdir = tempfile.mkdtemp(prefix='bench_warmup_')
+    base_env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        ENCRYPTION_KEY=os.getenv('ENCRYPTION_KEY', 'YmVuY2htYXJrLWtleS1ub3QtZm9yLXByb2R1Y3Rpb24='),
+        YANDEX_API_KEY='bench', YANDEX_FOLDER_ID='bench',
+        YANDEX_API_URL=f"http://127.0.0.1:{upstream.server_address[1]}/completion",
+        PASSWORD_HASH_WORKERS='0'
+    )
+    api_key = prepare_database(base_env)
+
+    print(f"{'config':<16}{'first req':>11}{'median':>9}{'PSS/worker':>12}{'private/worker':>16}{'PSS total':>11}")
+    for label, overrides in CONFIGS:
+        latencies, memory = run_config(dict(base_env, **overrides), args.workers, api_key, args.requests)
+        pss = [value for value, _ in memory]
+        private = [value for _, value in memory]
+        print(f"{label:<16}{latencies[0]:>9.0f}ms{statistics.median(latencies[1:]):>7.0f}ms"
+              f"{statistics.mean(pss):>10.1f}MB{statistics.mean(private):>14.1f}MB{sum(pss):>9.0f}MB")
+    upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
 import os
 import jwt
 from datetime import datetime, timezone
+from dotenv import load_dotenv
 from src.auth.utils import generate_jwt_token, verify_jwt_token
 
+load_dotenv()
+
 # Проверяем переменные окружения
 print("=== ПЕРЕМЕННЫЕ ОКРУЖЕНИЯ ===")
 print(f"JWT_SECRET: {os.getenv('JWT_SECRET')}")
@@ -0,0 +1,87 @@
+"""
+Gunicorn configuration.
+
+SERVING_MODE selects how workers handle I/O-bound requests:
+    gevent - (default) cooperative workers; while /api/analyze waits on
+             YandexGPT the worker keeps serving other requests, so one
+             process holds hundreds of in-flight analyses. sqlite3 calls
+             still block the worker's loop while they run; the wait for
+             the SQLite write lock is made cooperative by
+             src/models/database.py
+    sync   - one request per worker process (gunicorn's own default)
+
+The upstream scheduler (src/api/scheduler.py) and admission control
+(src/api/admission.py) keep their queues and load in each process. They
+only have anything to schedule or shed when one process serves many
+requests at once, so SCHEDULER_ENABLED=1 and ADMISSION_ENABLED=1 (the
+defaults) require gevent workers. With sync workers, set both to 0;
+otherwise startup fails instead of running without fair queueing or
+load shedding.
+
+In production the app sits behind one reverse proxy (Railway), so
+TRUSTED_PROXY_HOPS defaults to 1 here and request.remote_addr is the
+client from X-Forwarded-For; set it to the number of proxies in front.
+
+PRELOAD_APP=1 (default) loads the app in the master and shares immutable
+state with workers copy-on-write; WORKER_WARMUP=1 (default) primes the DB
+connection, cipher and YandexGPT connection in each worker before it serves.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+    SERVING_MODE=sync SCHEDULER_ENABLED=0 ADMISSION_ENABLED=0 gunicorn -c gunicorn.conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+SERVING_MODE = os.getenv('SERVING_MODE', 'gevent').lower()
+if SERVING_MODE not in ('gevent', 'sync'):
+    raise RuntimeError(f"Unknown SERVING_MODE={SERVING_MODE!r}: use 'gevent' or 'sync'")
+
+# Per-process fair queueing and load shedding never engage when each process runs one request
+for setting in ('SCHEDULER_ENABLED', 'ADMISSION_ENABLED'):
+    if os.getenv(setting, '1') == '1' and SERVING_MODE != 'gevent':
+        raise RuntimeError(f"{setting}=1 requires SERVING_MODE=gevent: sync workers run one request "
+                           f"per process, so there is no per-process queue to schedule or shed. "
+                           f"Use gevent workers or set {setting}=0.")
+
+# Exported to the app (create_app()) before it loads; the development server trusts no proxy
+raw_env = [f"TRUSTED_PROXY_HOPS={os.getenv('TRUSTED_PROXY_HOPS', '1')}"]
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+accesslog = '-' if os.getenv('GUNICORN_ACCESS_LOG') else None
+
+if SERVING_MODE == 'gevent':
+    # Sockets, requests and locks are monkey-patched before the app loads;
+    # password hashing already runs in a process pool and yields while waiting
+    worker_class = 'gevent'
+    workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '500'))
+else:
+    worker_class = 'sync'
+    workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() * 2 + 1)))
+
+# Load the app in the master and fork workers from it: immutable state built
+# by src.warmup.preload() is shared copy-on-write instead of copied per worker
+preload_app = os.getenv('PRELOAD_APP', '1') == '1'
+WORKER_WARMUP = os.getenv('WORKER_WARMUP', '1') == '1'
+
+if SERVING_MODE == 'gevent' and preload_app:
+    # Patch before the master imports the app, or preloaded modules keep blocking primitives
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def when_ready(server):
+    """Master: runs once after the app is loaded, before the first fork"""
+    if preload_app:
+        from src.warmup import preload
+        preload()
+
+
+def post_worker_init(worker):
+    """Worker: runs after the app is loaded (and gevent patched), before serving"""
+    if WORKER_WARMUP:
+        from src.warmup import warm_worker
+        warm_worker(worker.wsgi)
@@ -0,0 +1,96 @@
+"""
+Admission control for LLM-bound requests.
+
+Before /api/analyze queues a call on the upstream scheduler, the
+AdmissionController predicts how long the call would wait for a slot:
+
+    ahead = calls queued + in flight + 1 - UPSTREAM_CONCURRENCY
+    wait  = ahead / UPSTREAM_CONCURRENCY * service time
+
+(and the same for the user's own calls against USER_MAX_IN_FLIGHT). Service
+time is the scheduler's EWMA of call durations, or the age of the oldest
+running call while the upstream is stalled. When the prediction exceeds
+ADMISSION_WAIT_BUDGET seconds, or ADMISSION_MAX_QUEUED calls are already
+waiting, the request is rejected with 503 and Retry-After instead of sitting
+on a worker until the client gives up.
+
+Only LLM-bound work is admitted here; cheap endpoints (/api/profile,
+/api/analyses, fast mode, reused analyses) are never shed, so under load
+the process keeps serving them.
+
+Decisions use the per-process load of the upstream scheduler, not load
+shared between gunicorn workers. Like the scheduler, admission therefore
+requires cooperative workers (SERVING_MODE=gevent, the default), where one
+process holds the queue it sheds from. With sync workers queued and
+in_flight are always 0 when the check runs, so gunicorn.conf.py refuses to
+start them with ADMISSION_ENABLED=1. With SCHEDULER_ENABLED=0 nothing is
+tracked and every request is admitted.
+"""
+
+import math
+import os
+import threading
+from collections import Counter
+
+from src.api.scheduler import upstream_scheduler
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_WAIT_BUDGET = float(os.getenv('ADMISSION_WAIT_BUDGET', '10'))
+ADMISSION_MAX_QUEUED = int(os.getenv('ADMISSION_MAX_QUEUED', '64'))
+RETRY_AFTER_MAX = 120
+
+
+class AdmissionController:
+    """Predicts the queue wait of a new upstream call and sheds over budget"""
+
+    def __init__(self, scheduler, wait_budget=None, max_queued=None):
+        self.scheduler = scheduler
+        self.wait_budget = ADMISSION_WAIT_BUDGET if wait_budget is None else wait_budget
+        self.max_queued = ADMISSION_MAX_QUEUED if max_queued is None else max_queued
+        self._lock = threading.Lock()
+        self.decisions = Counter()
+
+    def predicted_wait(self, user_id):
+        """Expected seconds a new call of user_id would wait for a slot"""
+        queued, in_flight, user_queued, user_in_flight, service = self.scheduler.load(user_id)
+        if service is None:
+            return 0.0
+        ahead = queued + in_flight + 1 - self.scheduler.concurrency
+        user_ahead = user_queued + user_in_flight + 1 - self.scheduler.user_max_in_flight
+        return max(0.0,
+                   ahead / self.scheduler.concurrency * service,
+                   user_ahead / self.scheduler.user_max_in_flight * service)
+
+    def check(self, user_id, max_wait=None):
+        """None to admit, else the Retry-After seconds for a 503
+
+        max_wait tightens the budget to what is left of the request's deadline.
+        """
+        if not ADMISSION_ENABLED:
+            return None
+        budget = self.wait_budget if max_wait is None else min(self.wait_budget, max_wait)
+        wait = self.predicted_wait(user_id)
+        queued = self.scheduler.load(user_id)[0]
+        if wait <= budget and queued < self.max_queued:
+            with self._lock:
+                self.decisions['admitted'] += 1
+            return None
+
+        with self._lock:
+            self.decisions['rejected'] += 1
+        # Retry once the backlog ahead of the caller should have drained
+        return min(RETRY_AFTER_MAX, max(1, math.ceil(wait)))
+
+    def snapshot(self):
+        with self._lock:
+            decisions = dict(self.decisions)
+        return {
+            'enabled': ADMISSION_ENABLED,
+            'wait_budget_s': self.wait_budget,
+            'max_queued': self.max_queued,
+            'admitted': decisions.get('admitted', 0),
+            'rejected': decisions.get('rejected', 0),
+        }
+
+
+admission_controller = AdmissionController(upstream_scheduler)
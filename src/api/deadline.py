@@ -0,0 +1,224 @@
+"""
+Request deadlines for LLM-bound endpoints and cancellation of upstream calls.
+
+A Deadline is created per request from the X-Request-Timeout header
+(seconds, capped at REQUEST_DEADLINE) or REQUEST_DEADLINE itself (45s by
+default, below the gunicorn worker timeout). It is carried in a context
+variable through validation, the scheduler queue, cascade/packing retries
+and the YandexGPT call. Each upstream call gets the remaining budget (minus
+DEADLINE_MARGIN for saving the result) as its timeout, instead of a fixed
+YANDEX_API_TIMEOUT.
+
+While a request is in scope, a monitor thread polls every
+DEADLINE_POLL_INTERVAL. It cancels the deadline when the deadline passes
+or the client has closed its connection (gunicorn.socket /
+werkzeug.socket in the WSGI environ). Cancelling shuts down the sockets
+of the in-flight upstream calls, which the YandexGPT client's
+CancellableAdapter attaches to the deadline, so the blocked read returns
+at once. Queued calls leave the scheduler, and the request ends with
+DeadlineExceeded: 504 on a deadline, 499 when the client is gone. Cancellations are counted per reason (per process).
+"""
+
+import contextvars
+import os
+import select
+import socket
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', '45'))
+DEADLINE_MARGIN = float(os.getenv('DEADLINE_MARGIN', '0.5'))
+DEADLINE_POLL_INTERVAL = 0.2
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+# Status per cancellation reason; 499 is the "client closed request" convention
+CANCELLATION_STATUS = {'deadline': 504, 'client_disconnected': 499}
+
+current_deadline = contextvars.ContextVar('current_deadline', default=None)
+
+_cancellations = Counter()
+_cancellations_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed or its client went away"""
+
+    def __init__(self, reason):
+        super().__init__(f"Request cancelled: {reason}")
+        self.reason = reason
+
+
+class Deadline:
+    """Expiry time of one request plus the upstream sockets to abort on cancel"""
+
+    def __init__(self, seconds, client_socket=None, clock=time.monotonic):
+        self.clock = clock
+        self.expires_at = clock() + seconds
+        self.client_socket = client_socket
+        self.reason = None
+        self._sockets = set()
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return self.expires_at - self.clock()
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+    def cancel(self, reason):
+        """Mark cancelled (first reason wins) and abort attached upstream sockets"""
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            sockets = list(self._sockets)
+        with _cancellations_lock:
+            _cancellations[reason] += 1
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def check(self):
+        """Raise DeadlineExceeded if cancelled or past the deadline"""
+        if self.reason is None and self.remaining() <= 0:
+            self.cancel('deadline')
+        if self.reason is not None:
+            raise DeadlineExceeded(self.reason)
+
+    def client_gone(self):
+        """True once the client's side of the connection is closed (never blocks)"""
+        if self.client_socket is None:
+            return False
+        try:
+            readable, _, _ = select.select([self.client_socket], [], [], 0)
+            # Readable with nothing to read means EOF; pipelined bytes mean still there
+            return bool(readable) and self.client_socket.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    def attach(self, sock):
+        with self._lock:
+            self._sockets.add(sock)
+            cancelled = self.reason is not None
+        if cancelled:
+            sock.shutdown(socket.SHUT_RDWR)
+
+    def detach(self, sock):
+        with self._lock:
+            self._sockets.discard(sock)
+
+
+class DeadlineMonitor:
+    """Background poller cancelling expired deadlines and those of gone clients"""
+
+    def __init__(self, interval=DEADLINE_POLL_INTERVAL):
+        self.interval = interval
+        self._active = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, deadline):
+        with self._lock:
+            self._active.add(deadline)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='deadline-monitor', daemon=True)
+                self._thread.start()
+
+    def unregister(self, deadline):
+        with self._lock:
+            self._active.discard(deadline)
+
+    def poll(self):
+        with self._lock:
+            active = list(self._active)
+        for deadline in active:
+            if deadline.cancelled:
+                continue
+            if deadline.remaining() <= 0:
+                deadline.cancel('deadline')
+            elif deadline.client_gone():
+                deadline.cancel('client_disconnected')
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+            self.poll()
+            time.sleep(self.interval)
+
+
+deadline_monitor = DeadlineMonitor()
+
+
+def check_deadline():
+    """Checkpoint: raise DeadlineExceeded if the current request is out of time"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def call_timeout(default):
+    """Timeout for one upstream call: the remaining budget, at most default"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    remaining = deadline.remaining() - DEADLINE_MARGIN
+    if remaining <= 0:
+        deadline.cancel('deadline')
+        deadline.check()
+    return min(default, remaining)
+
+
+def raise_if_cancelled():
+    """After a failed upstream call: report it as a cancellation if that is what it was"""
+    deadline = current_deadline.get()
+    if deadline is not None and (deadline.cancelled or deadline.remaining() <= DEADLINE_MARGIN):
+        if not deadline.cancelled:
+            deadline.cancel('deadline')
+        deadline.check()
+
+
+def cancellation_stats():
+    with _cancellations_lock:
+        return {reason: _cancellations.get(reason, 0) for reason in CANCELLATION_STATUS}
+
+
+def request_deadline():
+    """Deadline for the current Flask request (header, capped by REQUEST_DEADLINE)"""
+    seconds = REQUEST_DEADLINE
+    header = request.headers.get(DEADLINE_HEADER)
+    if header:
+        try:
+            seconds = min(seconds, max(0.0, float(header)))
+        except ValueError:
+            pass
+    client_socket = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+    return Deadline(seconds, client_socket=client_socket)
+
+
+def with_request_deadline(view):
+    """Run an LLM-bound view under a request deadline; cancellations become 504/499"""
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        deadline = request_deadline()
+        token = current_deadline.set(deadline)
+        deadline_monitor.register(deadline)
+        try:
+            return view(*args, **kwargs)
+        except DeadlineExceeded as e:
+            current_app.logger.warning(f"{request.path} cancelled: {e.reason}")
+            return jsonify({"error": "Request cancelled", "reason": e.reason}), CANCELLATION_STATUS[e.reason]
+        finally:
+            deadline_monitor.unregister(deadline)
+            current_deadline.reset(token)
+    return decorated
@@ -0,0 +1,215 @@
+"""
+Near-duplicate detection in front of the YandexGPT call.
+
+Each analysed text gets a MinHash signature over character 5-gram shingles
+of its normalized form, stored in analysis_results.text_signature, so the
+index never needs to decrypt stored texts. Per (user, language) the process
+keeps an LSH index over those signatures; a resubmitted entry whose
+estimated Jaccard similarity to a previous one reaches DEDUP_THRESHOLD
+reuses that analysis instead of calling the API.
+
+The index is refreshed incrementally (rows with a higher id than the last
+one seen), so analyses saved by other workers are picked up on the next
+lookup.
+"""
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', '1') == '1'
+# Estimated Jaccard similarity of shingle sets needed to reuse an analysis
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.9'))
+# Users whose index is kept in memory per process (least recently used are dropped)
+DEDUP_MAX_USERS = int(os.getenv('DEDUP_MAX_USERS', '1000'))
+
+SHINGLE_SIZE = 5
+# Changing these invalidates stored signatures (re-run backfill-signatures)
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_SEED = 20250101
+
+_NORMALIZE_RE = re.compile(r'[\W_]+')
+
+_permutations = None
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize(text):
+    """Lowercase, fold ё, collapse punctuation and whitespace"""
+    return _NORMALIZE_RE.sub(' ', text.lower().replace('ё', 'е')).strip()
+
+
+def shingles(text):
+    normalized = normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def _get_permutations():
+    """Fixed (a, b) pairs of the universal hash family; same in every process"""
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+
+        generator = np.random.default_rng(_SEED)
+        _permutations = (
+            generator.integers(1, _MERSENNE_PRIME, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64),
+            generator.integers(0, _MERSENNE_PRIME, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64),
+        )
+    return _permutations
+
+
+def text_signature(text):
+    """MinHash signature of a text as bytes (NUM_PERMUTATIONS little-endian uint32)"""
+    import numpy as np
+
+    a, b = _get_permutations()
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)), dtype=np.uint64
+    )
+    # uint64 products wrap around; the result is still a well-mixed hash
+    permuted = ((a * hashes + b) % _MERSENNE_PRIME) & np.uint64(0xFFFFFFFF)
+    return permuted.min(axis=1).astype('<u4').tobytes()
+
+
+def _to_array(signature):
+    import numpy as np
+
+    return np.frombuffer(signature, dtype='<u4')
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of the two shingle sets"""
+    return float((_to_array(signature_a) == _to_array(signature_b)).mean())
+
+
+def _bands(signature):
+    width = LSH_ROWS * 4
+    return [(band, signature[band * width:(band + 1) * width]) for band in range(LSH_BANDS)]
+
+
+class SignatureIndex:
+    """LSH buckets over the signatures of one user's analyses in one language"""
+
+    def __init__(self):
+        self.last_id = 0
+        self.signatures = {}
+        self.buckets = {}
+
+    def add(self, analysis_id, signature):
+        if analysis_id in self.signatures or len(signature) != NUM_PERMUTATIONS * 4:
+            return
+        self.signatures[analysis_id] = signature
+        for key in _bands(signature):
+            self.buckets.setdefault(key, []).append(analysis_id)
+
+    def remove(self, analysis_id):
+        signature = self.signatures.pop(analysis_id, None)
+        if signature is None:
+            return
+        for key in _bands(signature):
+            bucket = self.buckets.get(key)
+            if bucket and analysis_id in bucket:
+                bucket.remove(analysis_id)
+
+    def best_match(self, signature, threshold):
+        """(analysis_id, similarity) of the most similar candidate at or above threshold, or None"""
+        candidates = set()
+        for key in _bands(signature):
+            candidates.update(self.buckets.get(key, ()))
+
+        best = None
+        for analysis_id in candidates:
+            score = similarity(signature, self.signatures[analysis_id])
+            # Ties go to the most recent analysis
+            if score >= threshold and (best is None or (score, analysis_id) > (best[1], best[0])):
+                best = (analysis_id, score)
+        return best
+
+
+def _load_since(user_id, language, last_id):
+    """Signatures saved after last_id (by this or any other worker)"""
+    from src.models.database import read_engine
+    from src.models.sql_models import AnalysisResult
+
+    stmt = (
+        select(AnalysisResult.id, AnalysisResult.text_signature)
+        .where(
+            AnalysisResult.user_id == user_id,
+            AnalysisResult.language == language,
+            AnalysisResult.id > last_id,
+            AnalysisResult.text_signature.is_not(None)
+        )
+        .order_by(AnalysisResult.id)
+    )
+    with read_engine().connect() as conn:
+        return [(analysis_id, bytes(signature)) for analysis_id, signature in conn.execute(stmt)]
+
+
+def _get_index(user_id, language):
+    key = (user_id, language)
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = SignatureIndex()
+        while len(_indexes) > DEDUP_MAX_USERS:
+            _indexes.popitem(last=False)
+    else:
+        _indexes.move_to_end(key)
+    return index
+
+
+def find_duplicate(user_id, language, signature, threshold=None):
+    """(analysis_id, similarity) of a previous near-duplicate analysis, or None"""
+    with _lock:
+        last_id = _get_index(user_id, language).last_id
+    # The query runs outside the lock so lookups for other users are not serialized behind it
+    rows = _load_since(user_id, language, last_id)
+
+    with _lock:
+        index = _get_index(user_id, language)
+        for analysis_id, stored in rows:
+            index.add(analysis_id, stored)
+        if rows:
+            index.last_id = max(index.last_id, rows[-1][0])
+        return index.best_match(signature, DEDUP_THRESHOLD if threshold is None else threshold)
+
+
+def is_reusable(record, user_id, language, signature, threshold=None):
+    """Re-check a hit against the stored row: ids can be reused after deletes"""
+    return (
+        record is not None
+        and record.user_id == user_id
+        and record.language == language
+        and record.text_signature is not None
+        and similarity(signature, record.text_signature) >= (DEDUP_THRESHOLD if threshold is None else threshold)
+    )
+
+
+def remember(user_id, language, analysis_id, signature):
+    """Add a just-saved analysis without waiting for the next refresh"""
+    with _lock:
+        _get_index(user_id, language).add(analysis_id, signature)
+
+
+def forget(user_id, language, analysis_id):
+    """Drop an analysis that no longer exists"""
+    with _lock:
+        index = _indexes.get((user_id, language))
+        if index is not None:
+            index.remove(analysis_id)
+
+
+def reset():
+    """Drop all in-memory indexes (tests, after bulk deletes)"""
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,214 @@
+"""
+Streaming export of analysis history to NDJSON and Parquet.
+Rows are read with a server-side cursor in fixed-size chunks, decrypted per
+chunk and serialized immediately, so memory stays constant for any export size.
+Over the API a therapist may export only themselves and the clients linked
+to them in therapist_clients (`flask --app app assign-client`); the
+export-analyses command is the unrestricted admin path.
+"""
+
+import io
+import json
+import logging
+from datetime import datetime, time
+
+from sqlalchemy import and_, exists, select
+
+from src.models.sql_models import (
+    AnalysisResult, Tag, analysis_tags, decrypt_texts, parse_tag_list, therapist_clients
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    'id', 'user_id', 'created_at', 'language', 'sentiment', 'confidence_score',
+    'text_length', 'emotions', 'skills', 'distortions'
+)
+
+
+def export_schema(include_text=False):
+    """Arrow schema of an export (pyarrow is imported only for Parquet output)"""
+    import pyarrow as pa
+
+    tag_list = pa.list_(pa.string())
+    fields = [
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('created_at', pa.timestamp('us')),
+        ('language', pa.string()),
+        ('sentiment', pa.string()),
+        ('confidence_score', pa.float64()),
+        ('text_length', pa.int64()),
+        ('emotions', tag_list),
+        ('skills', tag_list),
+        ('distortions', tag_list),
+    ]
+    if include_text:
+        fields.append(('original_text', pa.string()))
+    return pa.schema(fields)
+
+
+def parse_date(value, end_of_day=False):
+    """Parse an ISO date/datetime filter value"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed = datetime.combine(parsed.date(), time.max)
+    return parsed
+
+
+def parse_tag_filter(value):
+    """Parse 'kind:name' tag filter, e.g. 'distortion:catastrophizing'"""
+    if not value:
+        return None
+    kind, _, name = value.partition(':')
+    if not name:
+        raise ValueError("Tag filter must look like kind:name")
+    return kind.strip(), Tag.normalize(name)
+
+
+def foreign_user_ids(session, therapist_id, user_ids):
+    """Requested ids that are neither the therapist nor one of their clients, sorted"""
+    requested = set(user_ids) - {therapist_id}
+    if not requested:
+        return []
+    clients = session.execute(
+        select(therapist_clients.c.client_id).where(
+            therapist_clients.c.therapist_id == therapist_id,
+            therapist_clients.c.client_id.in_(requested)
+        )
+    ).scalars()
+    return sorted(requested - set(clients))
+
+
+def build_export_query(user_ids=None, start=None, end=None, tag=None, include_text=False):
+    """Select statement over analysis_results for an export"""
+    table = AnalysisResult.__table__
+    columns = [table.c[name] for name in EXPORT_COLUMNS]
+    if include_text:
+        columns.append(table.c.original_text)
+
+    stmt = select(*columns).order_by(table.c.id)
+    if user_ids is not None:
+        stmt = stmt.where(table.c.user_id.in_(list(user_ids)))
+    if start is not None:
+        stmt = stmt.where(table.c.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.created_at <= end)
+    if tag is not None:
+        kind, name = tag
+        tags = Tag.__table__
+        stmt = stmt.where(exists(
+            select(analysis_tags.c.analysis_id)
+            .join(tags, tags.c.id == analysis_tags.c.tag_id)
+            .where(and_(
+                analysis_tags.c.analysis_id == table.c.id,
+                tags.c.kind == kind,
+                tags.c.name == name
+            ))
+        ))
+    return stmt
+
+
+def iter_batches(engine, stmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of export row dicts, chunk by chunk.
+    stream_results asks the driver for a server-side cursor where supported.
+    """
+    include_text = 'original_text' in stmt.selected_columns
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+        for partition in result.mappings().partitions(chunk_size):
+            texts = decrypt_texts([row['original_text'] for row in partition]) if include_text else None
+            batch = []
+            for index, row in enumerate(partition):
+                item = {
+                    'id': row['id'],
+                    'user_id': row['user_id'],
+                    'created_at': row['created_at'],
+                    'language': row['language'],
+                    'sentiment': row['sentiment'],
+                    'confidence_score': row['confidence_score'],
+                    'text_length': row['text_length'],
+                    'emotions': parse_tag_list(row['emotions']),
+                    'skills': parse_tag_list(row['skills']),
+                    'distortions': parse_tag_list(row['distortions'])
+                }
+                if include_text:
+                    item['original_text'] = texts[index]
+                batch.append(item)
+            yield batch
+
+
+def stream_ndjson(batches):
+    """Serialize batches as newline-delimited JSON, one chunk of bytes per batch"""
+    for batch in batches:
+        lines = []
+        for item in batch:
+            created_at = item['created_at']
+            item['created_at'] = created_at.isoformat() if created_at else None
+            lines.append(json.dumps(item, ensure_ascii=False))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the caller"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(batches, include_text=False):
+    """Serialize batches as a Parquet file, one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = export_schema(include_text)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for batch in batches:
+            columns = {name: [item[name] for item in batch] for name in schema.names}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(engine, stmt, export_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Byte chunks of an export in the requested format"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    batches = iter_batches(engine, stmt, chunk_size)
+    if export_format == 'parquet':
+        return stream_parquet(batches, include_text='original_text' in stmt.selected_columns)
+    return stream_ndjson(batches)
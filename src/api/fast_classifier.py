@@ -0,0 +1,426 @@
+"""
+Fast local pre-classifier (opt-in `mode=fast` on /api/analyze).
+
+Lexicon-based detection of sentiment polarity, common emotions, cognitive
+distortion markers and a few skills for RU and EN, without an LLM call.
+Every lexicon entry is a word or phrase; a trailing '*' matches any word
+with that prefix. All entries are compiled into one index keyed by the
+first three letters of their first word, so a text is classified in a
+single pass over its tokens (tens of microseconds for a typical entry).
+
+Label vocabularies are seeded from the repo: distortion labels are
+restricted to the ones the system prompt allows, and every emotion label
+used in the few-shot examples also matches itself literally. Entries are
+general markers, never phrases taken from an evaluation text: the
+golden set and data/fast_holdout_*.json only score the lexicons.
+"""
+
+import json
+import logging
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from src.api.models import AnalysisResponse, Entities
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).parent.parent.parent / 'prompts'
+
+MAX_EMOTIONS = 5
+MAX_SKILLS = 5
+# Words before a sentiment/emotion hit that flip or cancel it
+NEGATION_WINDOW = 2
+
+# Older EN labels used by the golden set and few-shot examples -> prompt labels
+DISTORTION_ALIASES = {
+    'black_and_white_thinking': 'all_or_nothing',
+    'disqualifying_the_positive': 'discounting_positive',
+}
+
+LEXICONS = {
+    'en': {
+        'negators': ['not', 'no', 'never', 'without', 'hardly'],
+        'positive': [
+            'proud*', 'happy', 'happier', 'happiness', 'happily', 'joy*', 'glad', 'great', 'good', 'love*', 'calm*', 'relie*', 'pleased',
+            'praise*', 'approv*', 'success*', 'celebrat*', 'laugh*', 'enjoy*', 'excit*', 'grateful', 'thank*',
+            'confiden*', 'wonderful', 'managed', 'composure', 'inspir*', 'delight*', 'cheerful', 'energized'
+        ],
+        'negative': [
+            'sad*', 'tired*', 'useless', 'wast*', 'fail*', 'afraid', 'lonel*', 'alone', 'empti*', 'empty',
+            'anxi*', 'worr*', 'annoy*', 'terribl*', 'ruin*', 'cry*', 'stupid', 'exhaust*', 'panic*',
+            'furious', 'angry', 'anger', 'hurt*', 'guilt*', 'mistake*', 'nervous*', 'paralyz*', 'stuck',
+            'criticiz*', 'worse', 'worst', 'hate*', 'miserable', 'depress*', 'hopeless*', 'helpless*', 'awful',
+            'horribl*', 'envy', 'jealous*', 'disappoint*', 'scared', 'upset', 'frustrat*', 'ashamed', 'stress*'
+        ],
+        'emotions': {
+            'anxiety': ['anxi*', 'worr*', 'nervous*', 'on edge'],
+            'panic': ['panic*', 'paralyz*'],
+            'fear': ['afraid', 'fear*', 'scared', 'terrified'],
+            'guilt': ['guilt*', 'my fault', 'let them down', 'let everyone down'],
+            'shame': ['asham*', 'shame*', 'embarrass*'],
+            'fatigue': ['tired*', 'fatigue*', 'worn out'],
+            'exhaustion': ['exhaust*', 'burn* out', 'burnout', 'drained'],
+            'helplessness': ['helpless*', 'powerless'],
+            'hopelessness': ['hopeless*', 'no way out', 'no point'],
+            'loneliness': ['lonel*', 'isolat*', 'all alone', 'nobody to talk to'],
+            'sadness': ['sad', 'sadness', 'crying', 'cry', 'tears', 'upset'],
+            'anger': ['anger', 'angry', 'furious', 'annoy*', 'rage', 'irritat*'],
+            'resentment': ['resent*', 'offended'],
+            'frustration': ['frustrat*'],
+            'disappointment': ['disappoint*'],
+            'emptiness': ['empti*', 'empty inside'],
+            'apathy': ['apath*', 'indifferen*', 'numb'],
+            'insecurity': ['insecur*', 'not good enough', 'not smart enough'],
+            'envy': ['envy', 'envious', 'jealous*'],
+            'nostalgia': ['nostalg*', 'miss the old', 'good old days'],
+            'joy': ['joy*', 'happy', 'happiness', 'glad', 'laugh*', 'delight*'],
+            'pride': ['proud*', 'pride'],
+            'confidence': ['confiden*'],
+            'relief': ['relie*', 'weight lifted'],
+            'hope': ['hope', 'hopes', 'hoped', 'hopeful', 'hoping'],
+            'calmness': ['calm*', 'composure', 'peaceful'],
+            'satisfaction': ['satisf*', 'pleased'],
+            'uncertainty': ['not sure', 'uncertain*', 'unsure'],
+        },
+        # Markers are first-person or self-evaluative phrases: a bare "should",
+        # "always" or "nothing" also turns up in ordinary neutral sentences
+        'distortions': {
+            'should_statements': ['i should', 'i must', 'i ought', 'should have', 'should not have', 'i have to be'],
+            'overgeneralization': [
+                'every single time', 'every time i', 'nobody ever', 'no one ever', 'always ruin*', 'always mess*',
+                'always fail*', 'always screw*', 'never do anything right'
+            ],
+            'all_or_nothing': [
+                'completely useless', 'completely worthless', 'totally useless', 'total failure', 'complete failure',
+                'nothing right', 'all or nothing', 'has to be perfect', 'must be perfect', 'perfect or nothing'
+            ],
+            'catastrophizing': [
+                'a disaster', 'total disaster', 'catastroph*', 'doomed', 'unbearable', 'ruin* everything',
+                'ruin* my life', 'my life is over', 'is the end', 'the end of me', 'never recover'
+            ],
+            'mind_reading': [
+                'thinks i am', 'they think i', 'everyone thinks i', 'will think i', 'must think i',
+                'probably think* i', 'judging me', 'laughing at me'
+            ],
+            'fortune_telling': [
+                'will never be', 'will never get', 'will never find', 'never going to', 'going to fail',
+                'bound to fail', 'will go wrong', 'nothing will change'
+            ],
+            'labeling': [
+                'i am useless', 'i am a failure', 'i am an idiot', 'i am stupid', 'i am so stupid', 'i am worthless',
+                'i am pathetic', 'i am a loser', 'such a loser', 'such an idiot', 'terrible friend',
+                'terrible person', 'bad person'
+            ],
+            'emotional_reasoning': [
+                'feel like a failure', 'feel like a fraud', 'feel like a burden', 'feel like an idiot',
+                'feel like a loser', 'i feel that i', 'i feel it so'
+            ],
+            'mental_filter': ['only the bad', 'only the negative', 'all i can think about', 'that one mistake'],
+            'discounting_positive': [
+                'just luck', 'only luck', 'just lucky', 'does not really count', 'anyone could have',
+                'not a real achievement', 'just being nice'
+            ],
+            'magnification': ['end of the world', 'huge mistake', 'biggest mistake', 'massive failure'],
+            'personalization': ['because of me', 'my fault', 'blame myself'],
+            'comparison': [
+                'better than me', 'smarter than me', 'more successful than me', 'unlike me', 'compared to everyone'
+            ],
+        },
+        'skills': {
+            'time management': ['procrastinat*', 'time management', 'deadline*'],
+            'concentration': ['concentrat*', 'focus*', 'distract*'],
+            'public speaking': ['presentation*', 'public speaking', 'speech'],
+            'exam preparation': ['exam', 'exams', 'studied', 'studying'],
+            'planning': ['plan', 'plans', 'planned', 'planning'],
+            'communication': ['conversation*', 'socializ*'],
+            'self-regulation': ['breath*', 'composure', 'meditat*'],
+            'job searching': ['interview*', 'job search*'],
+            'sleep': ['sleep*', 'insomnia'],
+        },
+    },
+    'ru': {
+        'negators': ['не', 'нет', 'ни', 'без'],
+        'positive': [
+            'горж*', 'горд*', 'рад', 'рада', 'радост*', 'радуюсь', 'счаст*', 'спокой*', 'облегч*', 'довол*',
+            'удовлетвор*', 'успе*', 'справил*', 'одобрен*', 'отлич*', 'хорош*', 'смея*', 'смеял*', 'лику*',
+            'уверен*', 'вдохнов*', 'благодар*', 'самообладан*', 'восторг*', 'весел*'
+        ],
+        'negative': [
+            'устал*', 'бесполез*', 'впустую', 'провал*', 'ярост*', 'парализ*', 'тревог*', 'тревож*', 'пустот*',
+            'одино*', 'бесит', 'бесят', 'раздраж*', 'злит*', 'злост*', 'ужас*', 'реву', 'плач*', 'ошибк*',
+            'страх*', 'боюсь', 'обид*', 'виноват*', 'груст*', 'тоск*', 'апати*', 'разочаров*', 'надоел*',
+            'критиков*', 'подвел*', 'завид*', 'ссор*', 'стыд*', 'отчаян*', 'стресс*'
+        ],
+        'emotions': {
+            'тревога': ['тревог*', 'тревож*', 'на иголках', 'волнуюсь'],
+            'паника': ['паник*', 'парализ*'],
+            'страх': ['страх*', 'боюсь', 'боял*', 'бояться'],
+            'вина': ['вина', 'вину', 'виноват*', 'подвел*', 'моя вина'],
+            'стыд': ['стыд*'],
+            'усталость': ['устал*'],
+            'истощение': ['истощ*', 'выгор*'],
+            'беспомощность': ['беспомощ*', 'бессил*'],
+            'безнадежность': ['безнадеж*', 'нет выхода', 'нет смысла'],
+            'одиночество': ['одино*', 'не с кем поговорить'],
+            'грусть': ['груст*', 'печал*', 'реву', 'плач*'],
+            'тоска': ['тоск*'],
+            'злость': ['злост*', 'злит*', 'злюсь', 'бесит', 'бесят', 'ярост*'],
+            'раздражение': ['раздраж*'],
+            'обида': ['обид*'],
+            'разочарование': ['разочаров*'],
+            'пустота': ['пустот*'],
+            'апатия': ['апати*', 'безразлич*'],
+            'неуверенность': ['неуверен*', 'недостаточно хорош*', 'недостаточно умн*'],
+            'зависть': ['завид*', 'завист*'],
+            'ностальгия': ['ностальг*', 'скучаю по'],
+            'радость': ['радост*', 'рад', 'рада', 'радуюсь', 'смея*', 'смеял*', 'счаст*'],
+            'гордость': ['горж*', 'горд*'],
+            'уверенность': ['уверенност*', 'уверенно'],
+            'облегчение': ['облегч*', 'камень с души'],
+            'надежда': ['надежд*', 'надеюсь'],
+            'спокойствие': ['спокой*', 'самообладан*'],
+            'удовлетворенность': ['удовлетвор*', 'довол*'],
+        },
+        # Same rule as EN: no bare "всегда", "ничего" or "должен"
+        'distortions': {
+            'долженствование': [
+                'я должен', 'я должна', 'я обязан', 'я обязана', 'должен был', 'должна была', 'надо было'
+            ],
+            'чрезмерное_обобщение': [
+                'каждый раз', 'вечно я', 'у меня вечно', 'у меня всегда', 'никто никогда', 'все всегда'
+            ],
+            'черно_белое_мышление': [
+                'абсолютно бесполез*', 'полностью бесполез*', 'совершенно бесполез*', 'полный провал',
+                'все или ничего', 'ничего не получается', 'ни на что не способ*'
+            ],
+            'катастрофизация': [
+                'все пропало', 'жизнь кончена', 'это конец', 'всему конец', 'катастроф*', 'кошмар*',
+                'не переживу', 'все рухнет'
+            ],
+            'чтение_мыслей': [
+                'подумают что я', 'думают что я', 'думает что я', 'считают меня', 'считает меня',
+                'смеются надо мной', 'осуждают меня'
+            ],
+            'предсказание_будущего': [
+                'никогда не смогу', 'никогда не получится', 'никогда не найду', 'ничего не изменится',
+                'точно провал*', 'ничего не выйдет'
+            ],
+            'навешивание_ярлыков': [
+                'я неудачни*', 'я ничтожество', 'я бесполезн*', 'я тупая', 'я тупой', 'я дура', 'я идиот*',
+                'я никчемн*', 'ужасный друг', 'ужасная подруга', 'плохой человек'
+            ],
+            'эмоциональное_обоснование': [
+                'чувствую себя неудачни*', 'чувствую себя ничтожеств*', 'чувствую себя обузой',
+                'чувствую себя никчемн*', 'раз я чувствую', 'значит так и есть'
+            ],
+            'ментальный_фильтр': ['только плохое', 'только о плохом', 'одна ошибка'],
+            'дискредитация_позитивного': [
+                'просто повезло', 'не считается', 'любой бы смог', 'это не заслуга'
+            ],
+            'преувеличение': ['конец света', 'огромная ошибка', 'чудовищная ошибка'],
+            'персонализация': ['из за меня', 'моя вина', 'по моей вине'],
+            'сравнение': ['на фоне других', 'на их фоне', 'по сравнению с ней', 'по сравнению с ним', 'все лучше меня'],
+        },
+        'skills': {
+            'тайм-менеджмент': ['прокрастин*', 'дедлайн*'],
+            'концентрация': ['сосредот*', 'концентр*', 'отвлека*'],
+            'публичные выступления': ['презентац*', 'выступлен*'],
+            'подготовка к экзаменам': ['экзамен*', 'учиться'],
+            'планирование': ['план', 'плана', 'планирую', 'список дел'],
+            'общение': ['общен*', 'пообща*', 'поссорил*'],
+            'саморегуляция': ['самообладан*', 'дыхан*', 'медитац*'],
+            'поиск работы': ['собеседован*'],
+            'сон': ['сон', 'сплю', 'бессонн*'],
+        },
+    },
+}
+
+_TOKEN_RE = re.compile(r'\w+')
+_CONTRACTIONS = [
+    ("can't", 'can not'), ("won't", 'will not'), ("n't", ' not'), ("'m", ' am'), ("'ll", ' will'),
+    ("'re", ' are'), ("'ve", ' have'), ("'d", ' would'), ("'s", ' is'),
+]
+_CONTRACTION_RE = re.compile('|'.join(re.escape(source) for source, _ in _CONTRACTIONS))
+_CONTRACTION_MAP = dict(_CONTRACTIONS)
+
+_compiled = {}
+
+
+def tokenize(text, language):
+    """Lowercased word tokens; EN contractions expanded, RU ё folded to е"""
+    text = text.lower().replace('’', "'")
+    if language == 'en':
+        text = _CONTRACTION_RE.sub(lambda match: _CONTRACTION_MAP[match.group()], text)
+    else:
+        text = text.replace('ё', 'е')
+    return _TOKEN_RE.findall(text)
+
+
+def _compile_entry(entry):
+    """'pins and needles' / 'catastroph*' -> ((stem, is_prefix), ...)"""
+    words = []
+    for word in entry.lower().replace('ё', 'е').replace('-', ' ').split():
+        is_prefix = word.endswith('*')
+        stem = word.rstrip('*')
+        if is_prefix and len(stem) < 3:
+            raise ValueError(f"Prefix entry too short to index: {entry!r}")
+        words.append((stem, is_prefix))
+    return tuple(words)
+
+
+def _index_key(stem, is_prefix):
+    return stem[:3] if is_prefix or len(stem) >= 3 else stem
+
+
+def allowed_distortions(language):
+    """Distortion labels listed in the system prompt for this language"""
+    try:
+        prompt = (PROMPTS_DIR / f'system_prompt_{language}.md').read_text(encoding='utf-8')
+    except OSError:
+        return None
+    section = re.search(r'3\.\s+\*\*[^*]+\*\*:(.*?)\n\d\.', prompt, re.S)
+    return set(re.findall(r'"([^"]+)"', section.group(1))) if section else None
+
+
+def seeded_emotion_labels(language):
+    """Emotion labels used by the few-shot examples"""
+    labels = set()
+    try:
+        examples = (PROMPTS_DIR / f'few_shot_examples_{language}.md').read_text(encoding='utf-8')
+    except OSError:
+        examples = ''
+    for line in examples.splitlines():
+        if line.startswith(('ASSISTANT:', 'АССИСТЕНТ:')):
+            try:
+                labels.update(json.loads(line.split(':', 1)[1])['entities']['emotions'])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return labels
+
+
+def canonical_distortion(label):
+    return DISTORTION_ALIASES.get(label, label)
+
+
+class CompiledLexicon:
+    """All entries of one language in a first-letters index"""
+
+    def __init__(self, language):
+        lexicon = LEXICONS[language]
+        self.language = language
+        self.negators = frozenset(lexicon['negators'])
+        self.index = defaultdict(list)
+
+        allowed = allowed_distortions(language)
+        for label, entries in lexicon['distortions'].items():
+            if allowed is not None and label not in allowed:
+                logger.warning(f"Skipping distortion label not allowed by the {language} prompt: {label}")
+                continue
+            self._add(entries, ('distortion', label))
+
+        emotions = {label: list(entries) for label, entries in lexicon['emotions'].items()}
+        for label in seeded_emotion_labels(language):
+            emotions.setdefault(label, []).append(label)
+        for label, entries in emotions.items():
+            self._add(entries, ('emotion', label))
+
+        for label, entries in lexicon['skills'].items():
+            self._add(entries, ('skill', label))
+        self._add(lexicon['positive'], ('sentiment', 1))
+        self._add(lexicon['negative'], ('sentiment', -1))
+
+        # Longer phrases first, so they are tried before their one-word prefixes
+        for candidates in self.index.values():
+            candidates.sort(key=lambda item: -len(item[0]))
+
+    def _add(self, entries, feature):
+        for entry in entries:
+            words = _compile_entry(entry)
+            self.index[_index_key(*words[0])].append((words, feature))
+
+    def scan(self, tokens):
+        """Yield (position, feature) for every lexicon hit"""
+        index = self.index
+        for position, token in enumerate(tokens):
+            candidates = index.get(token[:3])
+            if not candidates:
+                continue
+            for words, feature in candidates:
+                if position + len(words) > len(tokens):
+                    continue
+                for offset, (stem, is_prefix) in enumerate(words):
+                    word = tokens[position + offset]
+                    if not (word.startswith(stem) if is_prefix else word == stem):
+                        break
+                else:
+                    yield position, feature
+
+    def negated(self, tokens, position):
+        return any(token in self.negators for token in tokens[max(0, position - NEGATION_WINDOW):position])
+
+
+def get_lexicon(language):
+    """Compiled lexicon, built once per process (see src.warmup)"""
+    lexicon = _compiled.get(language)
+    if lexicon is None:
+        lexicon = _compiled[language] = CompiledLexicon(language)
+    return lexicon
+
+
+def _sentiment(positive, negative):
+    if not positive and not negative:
+        return 'neutral'
+    if positive and negative and min(positive, negative) / max(positive, negative) >= 0.34:
+        return 'mixed'
+    return 'positive' if positive > negative else 'negative'
+
+
+def classify(text, language='ru'):
+    """
+    Classify a text locally.
+
+    Returns:
+        AnalysisResponse: same shape as the LLM result, with a confidence
+        score capped well below typical LLM scores
+    """
+    lexicon = get_lexicon(language if language in LEXICONS else 'ru')
+    tokens = tokenize(text, lexicon.language)
+
+    positive = negative = 0
+    emotion_hits = {}
+    distortions = {}
+    skills = {}
+    for position, (kind, value) in lexicon.scan(tokens):
+        if kind == 'sentiment':
+            polarity = -value if lexicon.negated(tokens, position) else value
+            if polarity > 0:
+                positive += 1
+            else:
+                negative += 1
+        elif kind == 'emotion':
+            if not lexicon.negated(tokens, position):
+                count, first = emotion_hits.get(value, (0, position))
+                emotion_hits[value] = (count + 1, first)
+        elif kind == 'distortion':
+            distortions.setdefault(value, position)
+        else:
+            skills.setdefault(value, position)
+
+    emotions = sorted(emotion_hits, key=lambda label: (-emotion_hits[label][0], emotion_hits[label][1]))
+    hits = positive + negative + len(emotion_hits) + len(distortions)
+    return AnalysisResponse(
+        sentiment=_sentiment(positive, negative),
+        entities=Entities(
+            emotions=emotions[:MAX_EMOTIONS],
+            skills=sorted(skills, key=skills.get)[:MAX_SKILLS]
+        ),
+        distortions=sorted(distortions, key=distortions.get),
+        confidence_score=round(min(0.35 + 0.05 * hits, 0.75), 2)
+    )
+
+
+def preload():
+    """Compile every lexicon (gunicorn master, before fork)"""
+    for language in LEXICONS:
+        get_lexicon(language)
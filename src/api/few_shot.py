@@ -0,0 +1,174 @@
+"""
+Retrieval-based few-shot selection (FEW_SHOT_MODE=dynamic).
+
+Instead of sending the whole few_shot_examples_{lang}.md block with every
+request, the prompt gets the k examples most similar to the input text,
+within a token budget. The example pool is the static few-shot examples plus
+data/golden_standard_{lang}.json. Similarity is cosine over TF-IDF weighted
+character 3-grams (so RU inflections still match), held in a dense NumPy
+matrix built once per process.
+
+The golden standard is also the evaluation set: evaluations must exclude
+the case being scored (see exclude_texts), or it retrieves itself.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent.parent.parent / 'data'
+
+FEW_SHOT_MODE = os.getenv('FEW_SHOT_MODE', 'static').lower()
+FEW_SHOT_K = int(os.getenv('FEW_SHOT_K', '3'))
+# Approximate tokens spent on examples per prompt
+FEW_SHOT_TOKEN_BUDGET = int(os.getenv('FEW_SHOT_TOKEN_BUDGET', '300'))
+
+NGRAM_SIZE = 3
+# Rough chars-per-token for both languages; only used for budgeting
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r'\w+')
+
+_indexes = {}
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def char_ngrams(text):
+    """Character n-grams of the normalized text (words joined by single spaces)"""
+    normalized = f" {' '.join(_WORD_RE.findall(text.lower().replace('ё', 'е')))} "
+    return Counter(normalized[i:i + NGRAM_SIZE] for i in range(len(normalized) - NGRAM_SIZE + 1))
+
+
+def format_example(text, output):
+    return f"USER: {text}\nASSISTANT: {json.dumps(output, ensure_ascii=False, separators=(',', ':'))}"
+
+
+def load_examples(language):
+    """(text, expected output) pairs: static few-shot examples, then the golden standard"""
+    from src.api.yandex_gpt import load_prompt
+
+    examples = []
+    lines = load_prompt(f'few_shot_examples_{language}.md').splitlines()
+    for user_line, assistant_line in zip(lines, lines[1:]):
+        if user_line.startswith(('USER:', 'ПОЛЬЗОВАТЕЛЬ:')) and ':' in assistant_line:
+            try:
+                output = json.loads(assistant_line.split(':', 1)[1])
+            except ValueError:
+                continue
+            examples.append((user_line.split(':', 1)[1].strip(), output))
+
+    try:
+        with open(DATA_DIR / f'golden_standard_{language}.json', 'r', encoding='utf-8') as file:
+            golden = json.load(file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Golden standard for {language} not loaded: {str(e)}")
+        golden = []
+    examples.extend((case['input_text'], case['expected_output']) for case in golden)
+    return examples
+
+
+class ExampleIndex:
+    """L2-normalized TF-IDF vectors, one per example"""
+
+    def __init__(self, examples):
+        import numpy as np
+
+        self.examples = examples
+        self.formatted = [format_example(text, output) for text, output in examples]
+        self.tokens = np.array([estimate_tokens(block) for block in self.formatted])
+
+        counts = [char_ngrams(text) for text, _ in examples]
+        vocabulary = sorted(set().union(*counts)) if counts else []
+        self.vocabulary = {gram: column for column, gram in enumerate(vocabulary)}
+
+        document_frequency = np.zeros(len(vocabulary))
+        for grams in counts:
+            document_frequency[[self.vocabulary[gram] for gram in grams]] += 1
+        # Smoothed IDF, as in scikit-learn
+        self.idf = np.log((1 + len(examples)) / (1 + document_frequency)) + 1
+
+        matrix = np.zeros((len(examples), len(vocabulary)))
+        for row, grams in enumerate(counts):
+            columns = [self.vocabulary[gram] for gram in grams]
+            matrix[row, columns] = np.fromiter(grams.values(), dtype=float) * self.idf[columns]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        # Stored n-gram major: a query gathers only the rows of its own n-grams
+        self.columns = np.ascontiguousarray(matrix.T)
+
+    def scores(self, text):
+        """Cosine similarity of the text to every example"""
+        import numpy as np
+
+        columns = []
+        counts = []
+        # Unknown n-grams still count towards the query norm
+        unknown = 0
+        lookup = self.vocabulary.get
+        for gram, count in char_ngrams(text).items():
+            column = lookup(gram)
+            if column is None:
+                unknown += count * count
+            else:
+                columns.append(column)
+                counts.append(count)
+        if not columns:
+            return np.zeros(len(self.examples))
+
+        columns = np.array(columns, dtype=np.intp)
+        weights = np.array(counts, dtype=float) * self.idf[columns]
+        norm = math.sqrt(float(weights @ weights) + unknown)
+        return weights @ self.columns[columns] / norm
+
+    def select(self, text, k=FEW_SHOT_K, token_budget=FEW_SHOT_TOKEN_BUDGET, exclude_texts=()):
+        """Indexes of the most similar examples, best first, within k and the token budget"""
+        import numpy as np
+
+        scores = self.scores(text)
+        for position, (example_text, _) in enumerate(self.examples):
+            if example_text in exclude_texts:
+                scores[position] = -1
+        order = np.argsort(-scores, kind='stable')
+
+        selected = []
+        spent = 0
+        for position in order:
+            if len(selected) >= k or scores[position] <= 0:
+                break
+            cost = int(self.tokens[position])
+            if spent + cost > token_budget:
+                continue
+            selected.append(int(position))
+            spent += cost
+        return selected
+
+
+def get_index(language):
+    """Index for one language, built once per process (see src.warmup)"""
+    index = _indexes.get(language)
+    if index is None:
+        index = _indexes[language] = ExampleIndex(load_examples(language))
+        logger.info(f"Few-shot index for {language}: {len(index.examples)} examples, {len(index.vocabulary)} n-grams")
+    return index
+
+
+def select_examples(text, language, k=FEW_SHOT_K, token_budget=FEW_SHOT_TOKEN_BUDGET, exclude_texts=()):
+    """Few-shot block for the prompt: the selected examples in the static file's format"""
+    index = get_index(language)
+    return '\n\n'.join(index.formatted[position]
+                       for position in index.select(text, k, token_budget, exclude_texts))
+
+
+def preload():
+    """Build the indexes for every language with examples (gunicorn master, before fork)"""
+    for language in ('ru', 'en'):
+        get_index(language)
@@ -0,0 +1,202 @@
+"""
+Idempotency-Key support for POST /api/analyze.
+
+A client that may resend (network retries, flaky mobile links) sends the
+same Idempotency-Key header with every attempt. The first request claims
+the key with a pending row in idempotency_keys. Its response is stored in
+the same transaction as the AnalysisResult, so a replay never finds one
+without the other. Later requests with the key get:
+- the stored response (with Idempotent-Replayed: true) within
+  IDEMPOTENCY_TTL (24h by default): one indexed lookup, no LLM call,
+  no new row
+- while the first is still running: a wait of up to IDEMPOTENCY_WAIT
+  seconds for it to finish, then 409 with Retry-After
+- 422 when the key was used with a different request body
+
+Only 200 responses are stored; on any other outcome the claim is released
+so the client can retry. A pending claim whose request died expires after
+REQUEST_DEADLINE plus a margin. Keys are per user and stored as keyed
+BLAKE2 hashes. Expired rows are purged every IDEMPOTENCY_CLEANUP_INTERVAL
+seconds per process, or with `flask --app app purge-idempotency-keys`.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import Response, current_app, g, jsonify, make_response, request
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from src.api.deadline import REQUEST_DEADLINE
+from src.auth.utils import get_jwt_secret
+from src.models.database import read_session
+from src.models.sql_models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', str(24 * 3600)))
+IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', '5'))
+IDEMPOTENCY_CLEANUP_INTERVAL = int(os.getenv('IDEMPOTENCY_CLEANUP_INTERVAL', '300'))
+PENDING_TTL = REQUEST_DEADLINE + 15
+POLL_INTERVAL = 0.1
+MAX_KEY_LENGTH = 255
+
+_last_cleanup = time.monotonic()
+_cleanup_lock = threading.Lock()
+
+
+def _utcnow():
+    # Naive UTC: compared in SQL, and SQLite keeps no time zone
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def fingerprint(data):
+    """16-byte keyed hash (keyed so stored hashes cannot be matched against guesses)"""
+    return hashlib.blake2b(data, digest_size=16, key=get_jwt_secret().encode('utf-8')[:64]).digest()
+
+
+def request_fingerprint():
+    """Hash of the JSON body, insensitive to key order and whitespace"""
+    body = request.get_data()
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    except ValueError:
+        pass
+    return fingerprint(body)
+
+
+def purge_expired(now=None):
+    """Delete expired keys (indexed on expires_at); returns the number removed"""
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or _utcnow())))
+    db.session.commit()
+    return result.rowcount
+
+
+def _maybe_purge():
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.monotonic() - _last_cleanup < IDEMPOTENCY_CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.monotonic()
+    removed = purge_expired()
+    if removed:
+        current_app.logger.info(f"Purged {removed} expired idempotency keys")
+
+
+def _lookup(user_id, key_hash):
+    with read_session() as session:
+        row = session.get(IdempotencyKey, (user_id, key_hash))
+        if row is None:
+            return None
+        return row.request_hash, row.status_code, row.response, row.expires_at
+
+
+def _try_claim(user_id, key_hash, request_hash):
+    """Insert the pending row (replacing an expired one); False if someone holds the key"""
+    now = _utcnow()
+    db.session.execute(delete(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key_hash == key_hash,
+        IdempotencyKey.expires_at <= now
+    ))
+    db.session.add(IdempotencyKey(user_id=user_id, key_hash=key_hash, request_hash=request_hash,
+                                  expires_at=now + timedelta(seconds=PENDING_TTL)))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _claim_or_respond(user_id, key_hash, request_hash):
+    """None once this request owns the key, else the response to send instead"""
+    waited_until = time.monotonic() + IDEMPOTENCY_WAIT
+    while True:
+        row = _lookup(user_id, key_hash)
+        if row is None or row[3] <= _utcnow():
+            if _try_claim(user_id, key_hash, request_hash):
+                return None
+            continue
+
+        stored_request, status_code, body, _ = row
+        if stored_request != request_hash:
+            return jsonify({"error": "Idempotency-Key reused",
+                            "details": "The key was already used with a different request"}), 422
+        if status_code is not None:
+            response = Response(body, status=status_code, mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if time.monotonic() >= waited_until:
+            response = jsonify({"error": "Request in progress",
+                                "details": "A request with this Idempotency-Key is still being processed"})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        time.sleep(POLL_INTERVAL)
+
+
+def record_response(body, status_code=200):
+    """Store the response for the claimed key in the current (uncommitted) transaction"""
+    claim = g.get('idempotency_claim')
+    if claim is None:
+        return
+    user_id, key_hash = claim
+    db.session.execute(update(IdempotencyKey).where(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key_hash == key_hash
+    ).values(
+        status_code=status_code,
+        response=json.dumps(body, ensure_ascii=False),
+        expires_at=_utcnow() + timedelta(seconds=IDEMPOTENCY_TTL)
+    ))
+    g.idempotency_recorded = True
+
+
+def _release(user_id, key_hash):
+    """Drop a pending claim so the client can retry"""
+    try:
+        db.session.rollback()
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key_hash == key_hash,
+            IdempotencyKey.status_code.is_(None)
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Failed to release idempotency key for user {user_id}: {str(e)}")
+
+
+def idempotent(view):
+    """Honor the Idempotency-Key header on a view that calls record_response() before committing"""
+    @wraps(view)
+    def decorated(user_id, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(user_id, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": "Invalid Idempotency-Key",
+                            "details": f"At most {MAX_KEY_LENGTH} characters"}), 400
+
+        _maybe_purge()
+        key_hash = fingerprint(key.encode('utf-8'))
+        early = _claim_or_respond(user_id, key_hash, request_fingerprint())
+        if early is not None:
+            current_app.logger.info(f"Idempotency-Key replay for user {user_id}")
+            return early
+
+        g.idempotency_claim = (user_id, key_hash)
+        try:
+            response = make_response(view(user_id, *args, **kwargs))
+        except Exception:
+            _release(user_id, key_hash)
+            raise
+        if response.status_code != 200 or not g.get('idempotency_recorded'):
+            _release(user_id, key_hash)
+        return response
+    return decorated
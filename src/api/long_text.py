@@ -0,0 +1,193 @@
+"""
+Map-reduce analysis of texts longer than one request allows (POST /api/analyze/long).
+
+split_text() cuts the text at paragraph, then sentence, then word boundaries
+into chunks of similar size up to LONG_CHUNK_MAX_CHARS. The chunks are
+analyzed concurrently (up to LONG_TEXT_WORKERS calls at once), so wall-clock
+latency stays close to one call instead of growing with the text. The
+results are merged into one AnalysisResponse:
+- sentiment: the label with the largest mass, where each chunk adds
+  chunk length x confidence; "mixed" when positive and negative each
+  carry at least MIXED_SHARE of the mass
+- emotions/skills/distortions: union over chunks, ranked by summed
+  length x confidence; labels whose best chunk confidence is below
+  LABEL_MIN_CONFIDENCE are dropped, at most MAX_LABELS per list
+- confidence_score: length-weighted mean confidence, scaled by the share
+  of the text whose chunks were analyzed successfully
+"""
+
+import contextvars
+import logging
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from src.api.deadline import DeadlineExceeded
+from src.api.models import AnalysisResponse, Entities
+
+logger = logging.getLogger(__name__)
+
+# A chunk must pass AnalysisRequest validation (at most 2000 characters)
+LONG_CHUNK_MAX_CHARS = min(int(os.getenv('LONG_CHUNK_MAX_CHARS', '1800')), 2000)
+LONG_TEXT_WORKERS = int(os.getenv('LONG_TEXT_WORKERS', '8'))
+
+MIXED_SHARE = 0.25
+LABEL_MIN_CONFIDENCE = 0.5
+MAX_LABELS = 10
+SENTIMENTS = ('negative', 'positive', 'mixed', 'neutral')
+
+PARAGRAPH_BREAK = re.compile(r'\s*\n\s*')
+SENTENCE_END = re.compile(r'(?<=[.!?…])\s+')
+
+
+def _pieces(text, max_chars):
+    """Paragraphs, with over-long ones cut into sentences, then at spaces"""
+    for paragraph in PARAGRAPH_BREAK.split(text.strip()):
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(' ', 0, max_chars + 1)
+                cut = cut if cut > 0 else max_chars
+                yield sentence[:cut]
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                yield sentence
+
+
+def _pack(pieces, planned, max_chars):
+    """Join pieces into chunks aiming at an even share of the text per planned chunk"""
+    remaining = sum(len(piece) + 1 for piece in pieces)
+    chunks, current = [], ''
+    for piece in pieces:
+        target = remaining / max(1, planned - len(chunks))
+        joined = f"{current}\n{piece}" if current else piece
+        # Close the chunk when the piece would overshoot the target more than leaving it out undershoots
+        if current and (len(joined) > max_chars or len(joined) - target > target - len(current)):
+            chunks.append(current)
+            remaining -= len(current) + 1
+            joined = piece
+        current = joined
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_chars=LONG_CHUNK_MAX_CHARS):
+    """
+    Chunks of at most max_chars, cut only at paragraph/sentence/word boundaries.
+
+    Chunks are filled up to an even share of the text (not greedily to
+    max_chars), so the concurrent calls take about the same time; when
+    coarse paragraphs overflow the plan, it is redone with one more chunk
+    rather than leaving a short last chunk.
+    """
+    pieces = [piece for piece in _pieces(text, max_chars) if piece]
+    planned = math.ceil(sum(len(piece) + 1 for piece in pieces) / max_chars)
+    chunks = _pack(pieces, planned, max_chars)
+    while len(chunks) > planned:
+        planned += 1
+        chunks = _pack(pieces, planned, max_chars)
+
+    # A chunk too short to validate on its own (a heading, a trailing word) joins a
+    # neighbour; one that fits nowhere carries nothing to analyze and is dropped
+    merged = []
+    for chunk in chunks:
+        if merged and (len(chunk) < 10 or len(merged[-1]) < 10) and len(merged[-1]) + len(chunk) < max_chars:
+            merged[-1] = f"{merged[-1]}\n{chunk}"
+        else:
+            merged.append(chunk)
+    return [chunk for chunk in merged if len(chunk) >= 10]
+
+
+def _merge_labels(parts, labels_of):
+    scores, best, spelling = Counter(), {}, {}
+    for weight, result in parts:
+        for label in labels_of(result):
+            key = label.strip().lower()
+            if not key:
+                continue
+            spelling.setdefault(key, label.strip())
+            scores[key] += weight * result.confidence_score
+            best[key] = max(best.get(key, 0.0), result.confidence_score)
+    ranked = [key for key, _ in scores.most_common() if best[key] >= LABEL_MIN_CONFIDENCE]
+    return [spelling[key] for key in ranked[:MAX_LABELS]]
+
+
+def merge_results(parts, total_weight=None):
+    """
+    Merge chunk results into one AnalysisResponse.
+
+    Args:
+        parts: (weight, AnalysisResponse) per analyzed chunk; weight is the chunk length
+        total_weight: weight of the whole text, including chunks that failed
+    """
+    analyzed = sum(weight for weight, _ in parts)
+    mass = Counter()
+    for weight, result in parts:
+        mass[result.sentiment] += weight * result.confidence_score
+    total_mass = sum(mass.values())
+    if total_mass and min(mass['positive'], mass['negative']) / total_mass >= MIXED_SHARE:
+        sentiment = 'mixed'
+    else:
+        sentiment = max(SENTIMENTS, key=lambda label: mass[label])
+
+    confidence = sum(weight * result.confidence_score for weight, result in parts) / analyzed
+    coverage = analyzed / (total_weight or analyzed)
+    return AnalysisResponse(
+        sentiment=sentiment,
+        entities=Entities(
+            emotions=_merge_labels(parts, lambda result: result.entities.emotions),
+            skills=_merge_labels(parts, lambda result: result.entities.skills)
+        ),
+        distortions=_merge_labels(parts, lambda result: result.distortions),
+        confidence_score=round(confidence * coverage, 3)
+    )
+
+
+def analyze_long_text(client, text, language='ru', slot=None, max_workers=LONG_TEXT_WORKERS):
+    """
+    Split, analyze chunks concurrently and merge.
+
+    Args:
+        client: object with analyze_text(text, language) -> AnalysisResponse
+        slot: optional factory slot(chunk) -> context manager held around each
+              upstream call (the fair scheduler)
+
+    Returns:
+        (AnalysisResponse, number of chunks, number of chunks that failed)
+
+    Raises:
+        DeadlineExceeded: if the request's deadline was cancelled meanwhile
+        Exception: if every chunk failed
+    """
+    chunks = split_text(text)
+    slot = slot or (lambda chunk: nullcontext())
+
+    def analyze_chunk(chunk):
+        with slot(chunk):
+            return client.analyze_text(chunk, language)
+
+    parts, failed = [], 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        # Workers run in a copy of the request's context, so they share its deadline
+        futures = [(len(chunk), executor.submit(contextvars.copy_context().run, analyze_chunk, chunk))
+                   for chunk in chunks]
+        for weight, future in futures:
+            try:
+                parts.append((weight, future.result()))
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                failed += 1
+                logger.warning(f"Chunk analysis failed ({weight} chars): {str(e)}")
+
+    if not parts:
+        raise Exception(f"Analysis failed for all {len(chunks)} chunks")
+    merged = merge_results(parts, total_weight=sum(len(chunk) for chunk in chunks))
+    logger.info(f"Long text analyzed: {len(chunks)} chunks, {failed} failed, sentiment {merged.sentiment}")
+    return merged, len(chunks), failed
@@ -14,6 +14,7 @@ class AnalysisRequest(BaseModel):
     """Request model for text analysis"""
     text: str
     language: str = Field("ru", pattern="^(ru|en)$", description="Analysis language: ru or en")
+    mode: Literal["full", "fast"] = Field("full", description="full: YandexGPT, fast: local lexicon classifier")
 
     @field_validator('text')
     @classmethod
@@ -28,6 +29,21 @@ class AnalysisRequest(BaseModel):
             raise ValueError('Text is too long. Maximum length is 2000 characters.')
         return v
 
+class LongAnalysisRequest(BaseModel):
+    """Request model for long-text analysis (split into chunks and merged)"""
+    text: str
+    language: str = Field("ru", pattern="^(ru|en)$", description="Analysis language: ru or en")
+
+    @field_validator('text')
+    @classmethod
+    def validate_text_length(cls, v):
+        """Same error codes as AnalysisRequest, with the long-text limit"""
+        if len(v.strip()) < 10:
+            raise ValueError('Text is too short. Minimum length is 10 characters.')
+        if len(v) > 50000:
+            raise ValueError('Text is too long. Maximum length is 50000 characters.')
+        return v
+
 class AnalysisResponse(BaseModel):
     """Response model for analysis results"""
     sentiment: Literal["positive", "negative", "neutral", "mixed"] = Field(..., description="Overall sentiment")
@@ -0,0 +1,114 @@
+"""
+Model routing for YandexGPT calls.
+
+MODEL_ROUTING=full (default) sends everything to YANDEX_MODEL, as before.
+MODEL_ROUTING=cascade answers with the cheaper YANDEX_LITE_MODEL first and
+escalates to the full model when the result's confidence_score is below
+CASCADE_MIN_CONFIDENCE, or when the lite answer fails (API error, bad JSON,
+validation). Requests skip the lite model when:
+- the text is longer than CASCADE_MAX_LITE_CHARS (lite escalates too often)
+- the lite model's observed latency (EWMA) is not below the full model's by
+  CASCADE_LATENCY_RATIO; every ROUTER_PROBE_EVERY-th such request still goes
+  to lite so its latency estimate stays current
+
+Counters per route (count, p50/p95 latency) are kept per process; see
+snapshot() and GET /api/router/stats.
+"""
+
+import os
+import threading
+from collections import Counter, deque
+
+MODEL_ROUTING = os.getenv('MODEL_ROUTING', 'full').lower()
+FULL_MODEL = os.getenv('YANDEX_MODEL', 'yandexgpt')
+LITE_MODEL = os.getenv('YANDEX_LITE_MODEL', 'yandexgpt-lite')
+CASCADE_MIN_CONFIDENCE = float(os.getenv('CASCADE_MIN_CONFIDENCE', '0.75'))
+CASCADE_MAX_LITE_CHARS = int(os.getenv('CASCADE_MAX_LITE_CHARS', '1200'))
+CASCADE_LATENCY_RATIO = float(os.getenv('CASCADE_LATENCY_RATIO', '0.8'))
+ROUTER_PROBE_EVERY = int(os.getenv('ROUTER_PROBE_EVERY', '20'))
+
+EWMA_ALPHA = 0.2
+# Latency samples kept per route for percentiles
+ROUTE_SAMPLES = 1000
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ModelRouter:
+    """Thread-safe routing decisions and counters for one process"""
+
+    def __init__(self, mode=None):
+        self.mode = (mode or MODEL_ROUTING).lower()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = {}
+            self.model_calls = Counter()
+            self.model_errors = Counter()
+            self.route_counts = Counter()
+            self.route_latencies = {}
+            self._skipped_lite = 0
+
+    def plan(self, text):
+        """(route, models to try in order) for one text"""
+        if self.mode != 'cascade':
+            return 'full', [FULL_MODEL]
+        if len(text) > CASCADE_MAX_LITE_CHARS:
+            return 'full:long_text', [FULL_MODEL]
+
+        with self._lock:
+            lite, full = self.latency.get(LITE_MODEL), self.latency.get(FULL_MODEL)
+            if lite is not None and full is not None and lite > full * CASCADE_LATENCY_RATIO:
+                self._skipped_lite += 1
+                if self._skipped_lite % ROUTER_PROBE_EVERY:
+                    return 'full:lite_slow', [FULL_MODEL]
+        return 'lite', [LITE_MODEL, FULL_MODEL]
+
+    def should_escalate(self, result):
+        return result.confidence_score < CASCADE_MIN_CONFIDENCE
+
+    def observe_call(self, model, seconds, ok=True):
+        """Latency of one upstream call (successful calls update the EWMA)"""
+        with self._lock:
+            self.model_calls[model] += 1
+            if not ok:
+                self.model_errors[model] += 1
+                return
+            previous = self.latency.get(model)
+            self.latency[model] = seconds if previous is None else previous + EWMA_ALPHA * (seconds - previous)
+
+    def record(self, route, seconds):
+        """End-to-end latency of one analysis under its final route"""
+        with self._lock:
+            self.route_counts[route] += 1
+            self.route_latencies.setdefault(route, deque(maxlen=ROUTE_SAMPLES)).append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {}
+            for route, count in sorted(self.route_counts.items()):
+                samples = list(self.route_latencies.get(route, ()))
+                routes[route] = {
+                    'count': count,
+                    'p50_ms': round(percentile(samples, 0.5) * 1000, 1),
+                    'p95_ms': round(percentile(samples, 0.95) * 1000, 1),
+                }
+            models = {
+                model: {
+                    'calls': self.model_calls[model],
+                    'errors': self.model_errors[model],
+                    'ewma_ms': round(self.latency[model] * 1000, 1) if model in self.latency else None,
+                }
+                for model in sorted(self.model_calls)
+            }
+            return {'mode': self.mode, 'min_confidence': CASCADE_MIN_CONFIDENCE, 'models': models, 'routes': routes}
+
+
+model_router = ModelRouter()
@@ -0,0 +1,442 @@
+"""
+HTTP routes of the analysis API (registered by create_app).
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pydantic_core
+from flask import Blueprint, Response, current_app, jsonify, render_template, request, stream_with_context
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from extensions import db
+from src.api.deadline import DeadlineExceeded, check_deadline, current_deadline, with_request_deadline
+from src.api.export import (
+    EXPORT_FORMATS, build_export_query, foreign_user_ids, parse_date, parse_tag_filter, stream_export
+)
+from src.api.idempotency import idempotent, record_response
+from src.auth.utils import token_required
+from src.models.database import read_engine, read_session
+from src.models.analytics import rollup_summary, rollup_timeline, rollup_top_tags
+from src.models.sql_models import AnalysisResult, User
+
+api_bp = Blueprint('api', __name__)
+
+# User-friendly error messages for both languages
+ERROR_MESSAGES = {
+    'ru': {
+        'text_too_short': 'Текст слишком короткий. Минимальная длина - 10 символов.',
+        'text_too_long': 'Текст слишком длинный. Максимальная длина - 2000 символов.',
+        'long_text_too_long': 'Текст слишком длинный. Максимальная длина - 50000 символов.',
+        'validation_error': 'Ошибка проверки данных',
+        'overloaded': 'Сервис перегружен. Повторите попытку позже.'
+    },
+    'en': {
+        'text_too_short': 'Text is too short. Minimum length is 10 characters.',
+        'text_too_long': 'Text is too long. Maximum length is 2000 characters.',
+        'long_text_too_long': 'Text is too long. Maximum length is 50000 characters.',
+        'validation_error': 'Data validation error',
+        'overloaded': 'The service is overloaded. Please retry later.'
+    }
+}
+
+@api_bp.app_errorhandler(ValidationError)
+def handle_validation_error(e):
+    return _handle_validation_error_internal(e)
+
+@api_bp.app_errorhandler(pydantic_core._pydantic_core.ValidationError)
+def handle_pydantic_core_validation_error(e):
+    return _handle_validation_error_internal(e)
+
+def _handle_validation_error_internal(e):
+    """Common logic for handling ValidationError"""
+    # Detect user language from request
+    language = 'ru'  # Default to Russian
+    if request.data:
+        try:
+            data = request.get_json()
+            language = data.get('language', 'ru')
+        except:
+            pass
+    
+    # Convert Pydantic errors to friendly messages
+    error_messages = []
+    
+    # Handle different Pydantic v1/v2 error formats
+    if hasattr(e, 'errors'):
+        errors = e.errors()
+    else:
+        errors = [{'msg': str(e)}]
+    
+    for error in errors:
+        error_msg = str(error.get('msg', '')).lower()
+        
+        if 'too short' in error_msg or 'text_too_short' in error_msg:
+            error_code = 'text_too_short'
+        elif 'too long' in error_msg or 'text_too_long' in error_msg:
+            error_code = 'text_too_long'
+        else:
+            error_code = 'validation_error'
+        
+        friendly_message = ERROR_MESSAGES[language].get(
+            error_code, 
+            ERROR_MESSAGES[language]['validation_error']
+        )
+        error_messages.append(friendly_message)
+    
+    return jsonify({
+        'error': 'Validation failed',
+        'message': ' | '.join(error_messages),
+        'language': language
+    }), 400
+
+@api_bp.route('/')
+def home():
+    """Render main page with analysis form."""
+    return render_template('index.html')
+
+def _overloaded_response(user_id, language):
+    """503 + Retry-After if admission control sheds this LLM-bound request, else None."""
+    from src.api.admission import admission_controller
+
+    # Shed before queueing: the predicted wait is past what a client will sit through
+    deadline = current_deadline.get()
+    retry_after = admission_controller.check(user_id, max_wait=deadline.remaining() if deadline else None)
+    if retry_after is None:
+        return None
+    current_app.logger.warning(f"Shedding analysis for user {user_id}, retry after {retry_after}s")
+    response = jsonify({
+        "error": "Service overloaded",
+        "message": ERROR_MESSAGES[language]['overloaded'],
+        "retry_after": retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 503
+
+def _scheduler_weight(user_id):
+    """Fair-queueing weight of the user's upstream calls (therapists get more)."""
+    from src.api.scheduler import THERAPIST_WEIGHT
+
+    with read_session() as session:
+        user = session.get(User, user_id)
+        return THERAPIST_WEIGHT if user and user.is_therapist else 1.0
+
+@api_bp.route('/api/analyze', methods=['POST'])
+@token_required  # ADD: Protect endpoint with JWT authentication
+@idempotent
+@with_request_deadline
+def analyze_text(user_id):
+    """Analyze text using YandexGPT API (or the local classifier with mode=fast)."""
+    # Imported on first use: the client pulls in requests, the schemas build pydantic models
+    from src.api.models import AnalysisRequest
+    from src.api.usage import UsageMeter, metered
+    from src.api.yandex_gpt import get_yandex_gpt_client, prompt_version
+
+    usage_meter = UsageMeter()
+    try:
+        request_data = request.get_json()
+        current_app.logger.info(f"Received analysis request (text length: {len(request_data.get('text', ''))} chars, language: {request_data.get('language', 'ru')})")
+
+        analysis_request = AnalysisRequest(**request_data)
+        check_deadline()
+        # ← SECURITY: Log metadata only, not actual text content
+        current_app.logger.info(f"User {user_id} analyzing text (length: {len(analysis_request.text)} chars, language: {analysis_request.language}, mode: {analysis_request.mode})")
+
+        signature = None
+        reused_from = None
+        if analysis_request.mode == 'fast':
+            from src.api.fast_classifier import classify
+            result_dict = classify(analysis_request.text, analysis_request.language).model_dump()
+        else:
+            from src.api import dedup
+
+            result_dict = None
+            if dedup.DEDUP_ENABLED:
+                # Near-duplicate of an earlier entry: reuse its analysis instead of calling the API
+                signature = dedup.text_signature(analysis_request.text)
+                match = dedup.find_duplicate(user_id, analysis_request.language, signature)
+                if match:
+                    # Read engine: no write transaction stays open into the upstream call
+                    with read_session() as session:
+                        previous = session.get(AnalysisResult, match[0])
+                        reusable = dedup.is_reusable(previous, user_id, analysis_request.language, signature)
+                        if reusable:
+                            result_dict = previous.to_response()
+                            reused_from = previous.id
+                    if not reusable:
+                        dedup.forget(user_id, analysis_request.language, match[0])
+                    else:
+                        current_app.logger.info(f"Reusing analysis {reused_from} for user {user_id} (similarity {match[1]:.2f})")
+
+            if result_dict is None:
+                client = get_yandex_gpt_client()
+                if client is None:
+                    return jsonify({"error": "YandexGPT client not configured"}), 500
+
+                from src.api.scheduler import call_cost, upstream_scheduler
+
+                overloaded = _overloaded_response(user_id, analysis_request.language)
+                if overloaded:
+                    return overloaded
+                # Fair share of upstream calls across users (bulk submitters queue behind their own calls)
+                with upstream_scheduler.slot(user_id, _scheduler_weight(user_id), call_cost(analysis_request.text)), \
+                        metered(usage_meter):
+                    analysis_result = client.analyze_text(
+                        text=analysis_request.text,
+                        language=analysis_request.language
+                    )
+                result_dict = analysis_result.model_dump()
+
+        db_record = AnalysisResult.from_response(
+            user_id=user_id,
+            text=analysis_request.text,
+            language=analysis_request.language,
+            result_dict=result_dict,
+            # Only LLM results are offered for reuse, never fast-mode ones
+            text_signature=signature
+        )
+        
+        if usage_meter.calls:
+            db_record.usage = usage_meter.to_record(prompt_version(analysis_request.language))
+        db.session.add(db_record)
+        response = dict(result_dict, reused=reused_from is not None)
+        if reused_from is not None:
+            response['reused_from'] = reused_from
+        # Same transaction as the analysis: a replay never finds one without the other
+        record_response(response)
+        db.session.commit()
+        if signature is not None:
+            dedup.remember(user_id, analysis_request.language, db_record.id, signature)
+        # ← SECURITY: Log successful analysis without exposing data
+        current_app.logger.info(f"Analysis completed successfully for user {user_id}")
+
+        return jsonify(response)
+        
+    except ValidationError as e:
+        current_app.logger.info(f"Validation failed for user {user_id} (text length issue)")
+        
+        language = 'ru'
+        if request.data:
+            try:
+                data = request.get_json()
+                language = data.get('language', 'ru')
+            except:
+                pass
+
+        error_msg = str(e).lower()
+        
+        if 'too short' in error_msg:
+            user_message = ERROR_MESSAGES[language]['text_too_short']
+        elif 'too long' in error_msg:
+            user_message = ERROR_MESSAGES[language]['text_too_long']
+        else:
+            user_message = ERROR_MESSAGES[language]['validation_error']
+        
+        return jsonify({
+            'error': 'Validation failed',
+            'message': user_message,
+            'language': language
+        }), 400
+
+    except DeadlineExceeded:
+        db.session.rollback()
+        raise
+
+    except Exception as e:
+        # ← SECURITY: Log errors without exposing sensitive request data
+        current_app.logger.error(f"Analysis failed for user {user_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Analysis failed", "details": "Internal server error"}), 500
+    
+# ADD: Long texts (diary entries up to 50k chars): chunks analyzed concurrently, results merged
+@api_bp.route('/api/analyze/long', methods=['POST'])
+@token_required
+@with_request_deadline
+def analyze_long_text(user_id):
+    """Split a long text, analyze the chunks in parallel and merge the results."""
+    from src.api.long_text import LONG_TEXT_WORKERS, analyze_long_text as run_long_analysis
+    from src.api.models import LongAnalysisRequest
+    from src.api.scheduler import call_cost, upstream_scheduler
+    from src.api.usage import UsageMeter, metered
+    from src.api.yandex_gpt import get_yandex_gpt_client, prompt_version
+
+    usage_meter = UsageMeter()
+    request_data = request.get_json(silent=True) or {}
+    language = request_data.get('language') if request_data.get('language') in ERROR_MESSAGES else 'ru'
+    try:
+        long_request = LongAnalysisRequest(**request_data)
+    except ValidationError as e:
+        current_app.logger.info(f"Long-text validation failed for user {user_id}")
+        error_msg = str(e).lower()
+        if 'too short' in error_msg:
+            user_message = ERROR_MESSAGES[language]['text_too_short']
+        elif 'too long' in error_msg:
+            user_message = ERROR_MESSAGES[language]['long_text_too_long']
+        else:
+            user_message = ERROR_MESSAGES[language]['validation_error']
+        return jsonify({'error': 'Validation failed', 'message': user_message, 'language': language}), 400
+
+    try:
+        check_deadline()
+        current_app.logger.info(f"User {user_id} analyzing long text (length: {len(long_request.text)} chars, language: {long_request.language})")
+        client = get_yandex_gpt_client()
+        if client is None:
+            return jsonify({"error": "YandexGPT client not configured"}), 500
+        overloaded = _overloaded_response(user_id, long_request.language)
+        if overloaded:
+            return overloaded
+
+        weight = _scheduler_weight(user_id)
+        # Chunks of one text may exceed the per-user in-flight cap, or latency would grow with length
+        with metered(usage_meter):
+            result, chunks, failed = run_long_analysis(
+                client, long_request.text, long_request.language,
+                slot=lambda chunk: upstream_scheduler.slot(user_id, weight, call_cost(chunk), max_in_flight=LONG_TEXT_WORKERS)
+            )
+        result_dict = result.model_dump()
+
+        db_record = AnalysisResult.from_response(
+            user_id=user_id,
+            text=long_request.text,
+            language=long_request.language,
+            result_dict=result_dict
+        )
+        if usage_meter.calls:
+            db_record.usage = usage_meter.to_record(prompt_version(long_request.language))
+        db.session.add(db_record)
+        db.session.commit()
+        current_app.logger.info(f"Long-text analysis completed for user {user_id} ({chunks} chunks, {failed} failed)")
+
+        return jsonify(dict(result_dict, chunks=chunks, chunks_failed=failed))
+
+    except DeadlineExceeded:
+        db.session.rollback()
+        raise
+
+    except Exception as e:
+        current_app.logger.error(f"Long-text analysis failed for user {user_id}: {str(e)}")
+        db.session.rollback()
+        return jsonify({"error": "Analysis failed", "details": "Internal server error"}), 500
+
+# ADD: User profile endpoint (protected)
+@api_bp.route('/api/profile', methods=['GET'])
+@token_required
+def get_user_profile(user_id):
+    """Get current user profile information."""
+    try:
+        with read_session() as session:
+            user = session.get(User, user_id)
+            if not user:
+                return jsonify({"error": "User not found"}), 404
+                
+            return jsonify(user.to_dict())
+        
+    except Exception as e:
+        current_app.logger.error(f"Error fetching profile for user {user_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch profile", "details": str(e)}), 500
+
+# ADD: User analysis history endpoint (protected)
+@api_bp.route('/api/analyses', methods=['GET'])
+@token_required
+def get_user_analyses(user_id):
+    """Get analysis history for current user."""
+    try:
+        with read_session() as session:
+            analyses = session.scalars(
+                select(AnalysisResult).filter_by(user_id=user_id).order_by(AnalysisResult.created_at.desc())
+            ).all()
+            return jsonify([analysis.to_dict() for analysis in analyses])
+        
+    except Exception as e:
+        current_app.logger.error(f"Error fetching analyses for user {user_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch analyses", "details": str(e)}), 500
+
+# ADD: Aggregated statistics endpoint (reads daily rollups, not raw rows)
+@api_bp.route('/api/stats', methods=['GET'])
+@token_required
+def get_user_stats(user_id):
+    """Get sentiment, confidence, timeline and top tags for the last N days."""
+    try:
+        days = min(max(request.args.get('days', 30, type=int), 1), 365)
+        start_day = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date()
+        with read_session() as session:
+            filters = {'start_day': start_day, 'user_id': user_id, 'session': session}
+
+            return jsonify({
+                'days': days,
+                'summary': rollup_summary(**filters),
+                'timeline': [{'date': day.isoformat(), 'count': count} for day, count in rollup_timeline(**filters)],
+                'top_emotions': [{'name': name, 'count': count} for name, count in rollup_top_tags('emotion', **filters)],
+                'top_distortions': [{'name': name, 'count': count} for name, count in rollup_top_tags('distortion', **filters)]
+            })
+
+    except Exception as e:
+        current_app.logger.error(f"Error fetching stats for user {user_id}: {str(e)}")
+        return jsonify({"error": "Failed to fetch stats", "details": str(e)}), 500
+
+# ADD: Model routing counters of this worker process (tuning the cascade split)
+@api_bp.route('/api/router/stats', methods=['GET'])
+@token_required
+def get_router_stats(user_id):
+    """Per-route counts and latency percentiles, per-model latency EWMA."""
+    from src.api.router import model_router
+
+    return jsonify(model_router.snapshot())
+
+# ADD: Upstream scheduler queue, admission decisions and per-user wait metrics of this worker process
+@api_bp.route('/api/scheduler/stats', methods=['GET'])
+@token_required
+def get_scheduler_stats(user_id):
+    """Queue state; therapists see every user's waits, others only their own."""
+    from src.api.admission import admission_controller
+    from src.api.deadline import cancellation_stats
+    from src.api.scheduler import upstream_scheduler
+
+    with read_session() as session:
+        user = session.get(User, user_id)
+        is_therapist = bool(user and user.is_therapist)
+    stats = upstream_scheduler.snapshot(None if is_therapist else {user_id})
+    return jsonify(dict(stats, admission=admission_controller.snapshot(), cancellations=cancellation_stats()))
+
+# ADD: Streaming bulk export (NDJSON / Parquet)
+@api_bp.route('/api/export', methods=['GET'])
+@token_required
+def export_analyses(user_id):
+    """Stream analysis history; therapists may export their clients via user_ids."""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": "Unsupported format", "details": f"Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+        user_ids = [user_id]
+        requested_ids = request.args.get('user_ids')
+        if requested_ids:
+            user_ids = [int(value) for value in requested_ids.split(',') if value.strip()]
+            with read_session() as session:
+                user = session.get(User, user_id)
+                is_therapist = bool(user and user.is_therapist)
+                foreign = foreign_user_ids(session, user_id, user_ids) if is_therapist else None
+            if not is_therapist:
+                return jsonify({"error": "Cohort export is available to therapists only"}), 403
+            if foreign:
+                current_app.logger.warning(f"User {user_id} requested export of non-client users {foreign}")
+                return jsonify({"error": "Cohort export is limited to your clients",
+                                "details": f"Not your clients: {', '.join(map(str, foreign))}"}), 403
+
+        stmt = build_export_query(
+            user_ids=user_ids,
+            start=parse_date(request.args.get('start')),
+            end=parse_date(request.args.get('end'), end_of_day=True),
+            tag=parse_tag_filter(request.args.get('tag')),
+            include_text=request.args.get('include_text', 'false').lower() in ('1', 'true', 'yes')
+        )
+    except ValueError as e:
+        return jsonify({"error": "Invalid export parameters", "details": str(e)}), 400
+
+    current_app.logger.info(f"User {user_id} started {export_format} export for {len(user_ids)} user(s)")
+    filename = f"analyses_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.{export_format}"
+    return Response(
+        stream_with_context(stream_export(read_engine(), stmt, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
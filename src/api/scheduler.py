@@ -0,0 +1,234 @@
+"""
+Per-user fair scheduling of upstream YandexGPT calls.
+
+Every call to the API from /api/analyze takes a slot from the process-wide
+UpstreamScheduler first. At most UPSTREAM_CONCURRENCY calls run at once per
+worker process, and at most USER_MAX_IN_FLIGHT per user. Waiting calls sit in
+per-user FIFO queues and are released by weighted fair queueing
+(start-time fair queueing): each call gets a start tag
+
+    start = max(virtual_time, previous finish tag of the user)
+    finish = start + cost / weight
+
+and the free slot goes to the eligible call with the smallest start tag.
+Cost is the estimated prompt tokens of the text, so a user sending long texts
+gets proportionally fewer calls. Therapist accounts get THERAPIST_WEIGHT
+(default 3), everyone else weight 1; a user alone in the queue is never
+throttled below the global limit except by the per-user cap.
+
+Queue waits are tracked per user (count, p50/p95/max); see snapshot() and
+GET /api/scheduler/stats. Counters are per process.
+
+Queues, caps and virtual time are per process, not shared between gunicorn
+workers. Scheduling therefore requires cooperative workers
+(SERVING_MODE=gevent, the default in gunicorn.conf.py), where one process
+serves many requests and waits cooperatively on the Condition.
+gunicorn.conf.py refuses to start sync workers with SCHEDULER_ENABLED=1:
+there each process runs one request, so nothing ever queues and a bulk
+user could hold every worker. The global limit of a deployment is
+WEB_CONCURRENCY x UPSTREAM_CONCURRENCY.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.api.deadline import DEADLINE_POLL_INTERVAL, DeadlineExceeded, current_deadline
+from src.api.router import percentile
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', '1') == '1'
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', '8'))
+USER_MAX_IN_FLIGHT = int(os.getenv('USER_MAX_IN_FLIGHT', '2'))
+THERAPIST_WEIGHT = float(os.getenv('THERAPIST_WEIGHT', '3'))
+
+# Queue-wait samples kept per user for percentiles
+WAIT_SAMPLES = 200
+SERVICE_EWMA_ALPHA = 0.2
+
+
+def call_cost(text):
+    """Scheduling cost of one call: estimated prompt tokens of the text"""
+    return max(1, len(text) // 4)
+
+
+class _Waiter:
+    __slots__ = ('user_id', 'start', 'enqueued_at', 'cap')
+
+    def __init__(self, user_id, start, enqueued_at, cap):
+        self.user_id = user_id
+        self.start = start
+        self.enqueued_at = enqueued_at
+        self.cap = cap
+
+
+class UpstreamScheduler:
+    """Weighted fair queue of upstream calls with global and per-user caps"""
+
+    def __init__(self, concurrency=None, user_max_in_flight=None, clock=time.monotonic):
+        self.concurrency = concurrency or UPSTREAM_CONCURRENCY
+        self.user_max_in_flight = user_max_in_flight or USER_MAX_IN_FLIGHT
+        self.clock = clock
+        self._cond = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        with self._cond:
+            self.virtual_time = 0.0
+            self.service_time = None  # EWMA of seconds a slot is held
+            self.in_flight = 0
+            self.running = {}  # slot token -> start time, to notice a stalled upstream
+            self.user_in_flight = {}
+            self.queues = {}  # user_id -> deque of _Waiter
+            self.finish_tags = {}
+            self.waits = {}  # user_id -> deque of seconds
+            self.wait_totals = {}  # user_id -> [count, total seconds, max seconds]
+
+    def _next_waiter(self):
+        """Eligible queue head with the smallest start tag"""
+        best = None
+        for user_id, queue in self.queues.items():
+            if self.user_in_flight.get(user_id, 0) >= queue[0].cap:
+                continue
+            if best is None or queue[0].start < best.start:
+                best = queue[0]
+        return best
+
+    def acquire(self, user_id, weight=1.0, cost=1, max_in_flight=None):
+        """Block until the call may run; returns the queue wait in seconds
+
+        max_in_flight overrides the per-user cap for this call (chunks of one
+        long text run in parallel; fair ordering still applies). Under a request
+        deadline the wait is abandoned with DeadlineExceeded once it is cancelled.
+        """
+        deadline = current_deadline.get()
+        with self._cond:
+            start = max(self.virtual_time, self.finish_tags.get(user_id, 0.0))
+            self.finish_tags[user_id] = start + cost / weight
+            waiter = _Waiter(user_id, start, self.clock(), max_in_flight or self.user_max_in_flight)
+            self.queues.setdefault(user_id, deque()).append(waiter)
+
+            while self.in_flight >= self.concurrency or self._next_waiter() is not waiter:
+                if deadline is not None:
+                    try:
+                        deadline.check()
+                    except DeadlineExceeded:
+                        self._leave_queue(waiter)
+                        raise
+                self._cond.wait(DEADLINE_POLL_INTERVAL if deadline is not None else None)
+
+            queue = self.queues[user_id]
+            queue.popleft()
+            if not queue:
+                del self.queues[user_id]
+            self.virtual_time = max(self.virtual_time, start)
+            self.in_flight += 1
+            self.user_in_flight[user_id] = self.user_in_flight.get(user_id, 0) + 1
+
+            waited = self.clock() - waiter.enqueued_at
+            self.waits.setdefault(user_id, deque(maxlen=WAIT_SAMPLES)).append(waited)
+            totals = self.wait_totals.setdefault(user_id, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += waited
+            totals[2] = max(totals[2], waited)
+            # Another waiter may have become the eligible head
+            self._cond.notify_all()
+            return waited
+
+    def _leave_queue(self, waiter):
+        queue = self.queues[waiter.user_id]
+        queue.remove(waiter)
+        if not queue:
+            del self.queues[waiter.user_id]
+            if waiter.user_id not in self.user_in_flight:
+                self.finish_tags.pop(waiter.user_id, None)
+        # The next waiter may now be the eligible head
+        self._cond.notify_all()
+
+    def release(self, user_id):
+        with self._cond:
+            self.in_flight -= 1
+            remaining = self.user_in_flight[user_id] - 1
+            if remaining:
+                self.user_in_flight[user_id] = remaining
+            else:
+                del self.user_in_flight[user_id]
+                if user_id not in self.queues:
+                    # Idle users keep no state; finish tags below virtual time are irrelevant
+                    self.finish_tags.pop(user_id, None)
+            self._cond.notify_all()
+
+    def observe_service(self, seconds):
+        with self._cond:
+            previous = self.service_time
+            self.service_time = seconds if previous is None else previous + SERVICE_EWMA_ALPHA * (seconds - previous)
+
+    def load(self, user_id):
+        """(calls queued, in flight, user's queued, user's in flight, service time estimate)
+
+        The service time estimate is the EWMA of completed calls, or the age of
+        the oldest running call when that is larger (a stalled upstream
+        completes nothing, so the EWMA alone would not move).
+        """
+        with self._cond:
+            service = self.service_time
+            if self.running:
+                oldest = self.clock() - min(self.running.values())
+                service = oldest if service is None else max(service, oldest)
+            return (
+                sum(len(queue) for queue in self.queues.values()),
+                self.in_flight,
+                len(self.queues.get(user_id, ())),
+                self.user_in_flight.get(user_id, 0),
+                service,
+            )
+
+    @contextmanager
+    def slot(self, user_id, weight=1.0, cost=1, max_in_flight=None):
+        """Hold one upstream slot for user_id for the duration of the block"""
+        if not SCHEDULER_ENABLED:
+            yield 0.0
+            return
+        waited = self.acquire(user_id, weight, cost, max_in_flight)
+        token = object()
+        started = self.clock()
+        with self._cond:
+            self.running[token] = started
+        try:
+            yield waited
+        finally:
+            with self._cond:
+                del self.running[token]
+            self.observe_service(self.clock() - started)
+            self.release(user_id)
+
+    def snapshot(self, user_ids=None):
+        """Queue state and per-user wait metrics (optionally only user_ids)"""
+        with self._cond:
+            users = {}
+            for user_id, (count, total, longest) in sorted(self.wait_totals.items()):
+                if user_ids is not None and user_id not in user_ids:
+                    continue
+                samples = list(self.waits[user_id])
+                users[user_id] = {
+                    'calls': count,
+                    'in_flight': self.user_in_flight.get(user_id, 0),
+                    'queued': len(self.queues.get(user_id, ())),
+                    'wait_avg_ms': round(total / count * 1000, 1),
+                    'wait_p50_ms': round(percentile(samples, 0.5) * 1000, 1),
+                    'wait_p95_ms': round(percentile(samples, 0.95) * 1000, 1),
+                    'wait_max_ms': round(longest * 1000, 1),
+                }
+            return {
+                'enabled': SCHEDULER_ENABLED,
+                'concurrency': self.concurrency,
+                'user_max_in_flight': self.user_max_in_flight,
+                'in_flight': self.in_flight,
+                'service_ms': round(self.service_time * 1000, 1) if self.service_time is not None else None,
+                'queued': sum(len(queue) for queue in self.queues.values()),
+                'users': users,
+            }
+
+
+upstream_scheduler = UpstreamScheduler()
@@ -0,0 +1,108 @@
+"""
+Per-analysis ledger of upstream token usage and latency.
+
+An LLM-bound route opens a UsageMeter when the request starts and runs the
+client under metered(meter). Every successful YandexGPT call then adds its
+model URI, the usage block of the response (inputTextTokens /
+completionTokens) and its duration to the meter in the context variable.
+Long-text chunks share their request's meter across threads. Cascade
+escalations and chunks make several calls per analysis: tokens, calls and
+upstream time are summed, and model_uri is that of the last call (the model
+of the stored answer). Calls and tokens are also kept per model, since a
+cascade spends tokens on the lite model before escalating. When the result
+is saved, the meter becomes one analysis_usage row plus one
+analysis_usage_models row per model in the same transaction, with the
+end-to-end time up to that point and the prompt version.
+
+Analyses made without an upstream call (fast mode, reused near-duplicates)
+get no row. Aggregates live in src/models/analytics.py;
+`flask --app app usage-report` prints latency percentiles per language,
+tokens per character and cost per day, pricing each model's tokens
+separately (prices per 1000 tokens from PRICE_PER_1K_TOKENS /
+LITE_PRICE_PER_1K_TOKENS).
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.api.router import LITE_MODEL
+
+PRICE_PER_1K_TOKENS = float(os.getenv('PRICE_PER_1K_TOKENS', '1.2'))
+LITE_PRICE_PER_1K_TOKENS = float(os.getenv('LITE_PRICE_PER_1K_TOKENS', '0.2'))
+
+current_usage = contextvars.ContextVar('current_usage', default=None)
+
+
+class UsageMeter:
+    """Upstream calls, tokens and time of one analysis"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.upstream_seconds = 0.0
+        self.model_uri = None
+        self.by_model = {}  # model_uri -> [calls, prompt_tokens, completion_tokens]
+        self._lock = threading.Lock()
+
+    def add_call(self, model_uri, prompt_tokens, completion_tokens, seconds):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.upstream_seconds += seconds
+            self.model_uri = model_uri
+            totals = self.by_model.setdefault(model_uri, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += prompt_tokens
+            totals[2] += completion_tokens
+
+    def to_record(self, prompt_version):
+        """The ledger row, closing the end-to-end time now; None without upstream calls"""
+        from src.models.sql_models import AnalysisUsage, AnalysisUsageModel
+
+        with self._lock:
+            if not self.calls:
+                return None
+            return AnalysisUsage(
+                model_uri=self.model_uri,
+                prompt_version=prompt_version,
+                calls=self.calls,
+                prompt_tokens=self.prompt_tokens,
+                completion_tokens=self.completion_tokens,
+                upstream_ms=round(self.upstream_seconds * 1000),
+                total_ms=round((self.clock() - self.started) * 1000),
+                models=[
+                    AnalysisUsageModel(model_uri=model_uri, calls=calls, prompt_tokens=prompt_tokens,
+                                       completion_tokens=completion_tokens)
+                    for model_uri, (calls, prompt_tokens, completion_tokens) in self.by_model.items()
+                ]
+            )
+
+
+@contextmanager
+def metered(meter):
+    """Record the upstream calls made inside the block on meter"""
+    token = current_usage.set(meter)
+    try:
+        yield meter
+    finally:
+        current_usage.reset(token)
+
+
+def record_call(model_uri, prompt_tokens, completion_tokens, seconds):
+    """Called by the YandexGPT client after each successful completion"""
+    meter = current_usage.get()
+    if meter is not None:
+        meter.add_call(model_uri, prompt_tokens, completion_tokens, seconds)
+
+
+def price_per_1k(model_uri):
+    """Price of 1000 tokens on the model of gpt://<folder>/<model>[/<version>]"""
+    model = model_uri.split('/', 3)[-1].split('/')[0]
+    return LITE_PRICE_PER_1K_TOKENS if model == LITE_MODEL else PRICE_PER_1K_TOKENS
@@ -3,30 +3,148 @@ YandexGPT API client for mental health text analysis.
 Handles prompt assembly and API communication for both English and Russian.
 """
 
+import hashlib
 import json
 import os
 import sys
 import logging
+import threading
+import time
+from collections import Counter
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import requests
 from pydantic import ValidationError
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
 # Add project root to Python path for imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+from src.api import few_shot
+from src.api.deadline import DeadlineExceeded, call_timeout, check_deadline, current_deadline, raise_if_cancelled
 from src.api.models import AnalysisRequest, AnalysisResponse
+from src.api.router import FULL_MODEL, model_router
+from src.api.usage import record_call
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+PROMPTS_DIR = Path(__file__).parent.parent.parent / 'prompts'
+
+# Prompt files are immutable at runtime: read once per process, or once in
+# the gunicorn master before fork so workers share them copy-on-write
+_prompt_cache = {}
+
+def load_prompt(filename: str) -> str:
+    """Prompt file content from the process-wide cache."""
+    content = _prompt_cache.get(filename)
+    if content is None:
+        content = (PROMPTS_DIR / filename).read_text(encoding='utf-8').strip()
+        _prompt_cache[filename] = content
+        logger.debug(f"Loaded prompt file: {filename}")
+    return content
+
+def preload_prompts():
+    """Read every prompt file into the cache."""
+    for path in sorted(PROMPTS_DIR.glob('*.md')):
+        load_prompt(path.name)
+    return len(_prompt_cache)
+
+SYSTEM_MESSAGE = "You are a helpful assistant that always responds with valid JSON."
+
+# Recorded with every analysis in the usage ledger; derived from the prompt files unless set
+PROMPT_VERSION = os.getenv('PROMPT_VERSION')
+
+def prompt_version(language: str) -> str:
+    """Few-shot mode plus a short hash of the prompt files used for language."""
+    if PROMPT_VERSION:
+        return PROMPT_VERSION
+    digest = hashlib.blake2b(SYSTEM_MESSAGE.encode('utf-8'), digest_size=4)
+    for filename in (f"system_prompt_{language}.md", f"few_shot_examples_{language}.md"):
+        digest.update(load_prompt(filename).encode('utf-8'))
+    return f"{few_shot.FEW_SHOT_MODE}-{digest.hexdigest()}"
+
+# Packing mode (batch workloads): several short texts share one completion
+PACK_TOKEN_BUDGET = int(os.getenv('PACK_TOKEN_BUDGET', '1500'))
+PACK_MAX_ITEMS = int(os.getenv('PACK_MAX_ITEMS', '10'))
+# Estimated tokens for an item's number and separators in the packed prompt
+PACK_ITEM_OVERHEAD = 5
+
+PACK_INSTRUCTIONS = {
+    'ru': ('Проанализируй каждый из {count} пронумерованных текстов ниже отдельно. '
+           'Ответь JSON-массивом ровно из {count} объектов в том же порядке, по одному на текст: '
+           'в каждом поле "id" (номер текста) и те же поля, что и в одиночном анализе.'),
+    'en': ('Analyze each of the {count} numbered texts below separately. '
+           'Respond with a JSON array of exactly {count} objects in the same order, one per text: '
+           'each with an "id" field (the text number) and the same fields as a single analysis.'),
+}
+
+def iter_packs(items, token_budget: int = PACK_TOKEN_BUDGET, max_items: int = PACK_MAX_ITEMS):
+    """
+    Greedily group (key, text, language) items into packs for one completion each.
+    Yields (language, [items]); a pack holds one language and stays within the
+    token budget for its texts (a single longer text gets a pack of its own).
+    """
+    open_packs = {}
+    for item in items:
+        _, text, language = item
+        cost = few_shot.estimate_tokens(text) + PACK_ITEM_OVERHEAD
+        pack, tokens = open_packs.get(language, ([], 0))
+        if pack and (tokens + cost > token_budget or len(pack) >= max_items):
+            yield language, pack
+            pack, tokens = [], 0
+        pack.append(item)
+        open_packs[language] = (pack, tokens + cost)
+    for language, (pack, _) in open_packs.items():
+        if pack:
+            yield language, pack
+
+class _CancellableConnectionMixin:
+    """Registers the socket with the current deadline while waiting for the response"""
+
+    def getresponse(self, *args, **kwargs):
+        deadline = current_deadline.get()
+        sock = self.sock
+        if deadline is None or sock is None:
+            return super().getresponse(*args, **kwargs)
+        deadline.attach(sock)
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            deadline.detach(sock)
+
+class _CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+    pass
+
+class _CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+    pass
+
+class _CancellableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+class _CancellableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+class CancellableAdapter(HTTPAdapter):
+    """requests adapter whose in-flight calls are aborted when their deadline is cancelled"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CancellableHTTPConnectionPool,
+            'https': _CancellableHTTPSConnectionPool,
+        }
+
 class YandexGPTClient:
     """Client for interacting with YandexGPT API for text analysis."""
     
     def __init__(self):
         self.api_key = os.getenv('YANDEX_API_KEY')
         self.folder_id = os.getenv('YANDEX_FOLDER_ID')
-        self.api_url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+        self.api_url = os.getenv('YANDEX_API_URL', "https://llm.api.cloud.yandex.net/foundationModels/v1/completion")
+        self.timeout = float(os.getenv('YANDEX_API_TIMEOUT', '30'))
         
         # Validate environment variables
         if not self.api_key:
@@ -38,16 +156,36 @@ class YandexGPTClient:
             "Authorization": f"Api-Key {self.api_key}",
             "Content-Type": "application/json"
         }
+        # Keep-alive session: the TLS handshake is paid once per worker, not per request
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # In-flight calls are aborted when the request's deadline is cancelled
+        self.session.mount('https://', CancellableAdapter())
+        self.session.mount('http://', CancellableAdapter())
+        # Upstream calls, prompt tokens and analyzed texts, for cost reporting
+        self.usage = Counter()
+        self._usage_lock = threading.Lock()
         logger.info("YandexGPTClient initialized successfully")
     
+    def _record_usage(self, **counts):
+        with self._usage_lock:
+            self.usage.update(counts)
+    
+    def usage_per_text(self) -> Dict[str, float]:
+        """Upstream calls and prompt tokens per analyzed text so far."""
+        with self._usage_lock:
+            texts = self.usage['texts'] or 1
+            return {
+                'texts': self.usage['texts'],
+                'calls': self.usage['calls'],
+                'calls_per_text': self.usage['calls'] / texts,
+                'prompt_tokens_per_text': self.usage['prompt_tokens'] / texts
+            }
+    
     def _load_prompt_file(self, filename: str) -> str:
         """Load prompt content from file."""
         try:
-            filepath = os.path.join('prompts', filename)
-            with open(filepath, 'r', encoding='utf-8') as file:
-                content = file.read().strip()
-            logger.debug(f"Loaded prompt file: {filename}")
-            return content
+            return load_prompt(filename)
         except FileNotFoundError:
             error_msg = f"Prompt file not found: {filename}"
             logger.error(error_msg)
@@ -65,7 +203,11 @@ class YandexGPTClient:
             examples_file = f"few_shot_examples_{language}.md"
             
             system_prompt = self._load_prompt_file(system_prompt_file)
-            few_shot_examples = self._load_prompt_file(examples_file)
+            if few_shot.FEW_SHOT_MODE == 'dynamic':
+                # Only the examples closest to this text, within the token budget
+                few_shot_examples = few_shot.select_examples(text, language)
+            else:
+                few_shot_examples = self._load_prompt_file(examples_file)
             
             # Construct the complete prompt
             complete_prompt = f"""{system_prompt}
@@ -85,10 +227,39 @@ ASSISTANT RESPONSE (JSON ONLY):
             logger.error(error_msg)
             raise Exception(error_msg)
     
-    def _call_yandex_gpt(self, prompt: str) -> Dict[str, Any]:
+    def _build_packed_prompt(self, texts: List[str], language: str) -> str:
+        """Build one prompt asking for a JSON array with an analysis per numbered text."""
+        try:
+            system_prompt = self._load_prompt_file(f"system_prompt_{language}.md")
+            if few_shot.FEW_SHOT_MODE == 'dynamic':
+                few_shot_examples = few_shot.select_examples(' '.join(texts), language)
+            else:
+                few_shot_examples = self._load_prompt_file(f"few_shot_examples_{language}.md")
+            numbered = "\n\n".join(f"[{number}] {text}" for number, text in enumerate(texts, start=1))
+            
+            complete_prompt = f"""{system_prompt}
+
+{few_shot_examples}
+
+{PACK_INSTRUCTIONS[language].format(count=len(texts))}
+
+USER TEXTS TO ANALYZE:
+{numbered}
+
+ASSISTANT RESPONSE (JSON ARRAY ONLY):
+"""
+            logger.debug(f"Built packed prompt for {len(texts)} texts, length: {len(complete_prompt)}")
+            return complete_prompt
+            
+        except Exception as e:
+            error_msg = f"Failed to build prompt: {str(e)}"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+    
+    def _call_yandex_gpt(self, prompt: str, model: str = FULL_MODEL) -> Dict[str, Any]:
         """Make actual API call to YandexGPT."""
         payload = {
-            "modelUri": f"gpt://{self.folder_id}/yandexgpt",
+            "modelUri": f"gpt://{self.folder_id}/{model}",
             "completionOptions": {
                 "stream": False,
                 "temperature": 0.1,  # Low temperature for consistent JSON output
@@ -97,7 +268,7 @@ ASSISTANT RESPONSE (JSON ONLY):
             "messages": [
                 {
                     "role": "system",
-                    "text": "You are a helpful assistant that always responds with valid JSON."
+                    "text": SYSTEM_MESSAGE
                 },
                 {
                     "role": "user",
@@ -106,34 +277,176 @@ ASSISTANT RESPONSE (JSON ONLY):
             ]
         }
         
+        # The request's remaining budget, not a fixed 30s, bounds the wait
+        timeout = call_timeout(self.timeout)
+        started = time.perf_counter()
         try:
-            logger.info("Sending request to YandexGPT API")
-            response = requests.post(
+            logger.info(f"Sending request to YandexGPT API (model: {model})")
+            response = self.session.post(
                     self.api_url, 
-                    headers=self.headers, 
                     json=payload,
-                    timeout=30
+                    timeout=timeout
                 )
                     
             if response.status_code != 200:
                     error_text = response.text
-                    error_msg = f"YandexGPT API error {response.status}: {error_text}"
+                    error_msg = f"YandexGPT API error {response.status_code}: {error_text}"
                     logger.error(error_msg)
                     raise Exception(error_msg)
                     
             result = response.json()
+            elapsed = time.perf_counter() - started
+            model_router.observe_call(model, elapsed)
+            # Token counts arrive as strings; estimated when the block is missing
+            usage = result.get('result', {}).get('usage', {})
+            prompt_tokens = int(usage.get('inputTextTokens') or few_shot.estimate_tokens(prompt))
+            completion_tokens = int(usage.get('completionTokens') or 0)
+            self._record_usage(calls=1, prompt_tokens=prompt_tokens)
+            record_call(payload["modelUri"], prompt_tokens, completion_tokens, elapsed)
             logger.info("Successfully received response from YandexGPT API")
             return result
                     
         except requests.exceptions.RequestException as e:
+            model_router.observe_call(model, time.perf_counter() - started, ok=False)
+            raise_if_cancelled()
             error_msg = f"Network error calling YandexGPT: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
         except Exception as e:
+            model_router.observe_call(model, time.perf_counter() - started, ok=False)
             error_msg = f"Unexpected error calling YandexGPT: {str(e)}"
             logger.error(error_msg)
             raise Exception(error_msg)
     
+    def warm_up(self):
+        """Open the pooled TLS connection to the API host ahead of the first request."""
+        try:
+            self.session.head(self.api_url, timeout=5)
+            logger.info("YandexGPT connection warmed up")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"YandexGPT warm-up failed: {str(e)}")
+    
+    def _parse_json_response(self, api_response: Dict[str, Any]) -> Any:
+        """Extract the completion text and parse it as JSON."""
+        # Extract and clean the response text
+        response_text = api_response.get('result', {}).get('alternatives', [{}])[0].get('message', {}).get('text', '')
+        
+        if not response_text:
+            error_msg = "Empty response from YandexGPT"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        # Clean response - remove markdown code blocks if present
+        cleaned_response = response_text.strip().replace('```json', '').replace('```', '').strip()
+        logger.debug(f"Cleaned response received (length: {len(cleaned_response)} chars)")
+        
+        # Parse JSON response
+        try:
+            return json.loads(cleaned_response)
+        except json.JSONDecodeError as e:
+            error_msg = f"Failed to parse JSON response: {str(e)}\nResponse length: {len(response_text)} chars"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+    
+    def analyze_pack(self, texts: List[str], language: str = "ru") -> List[Optional[AnalysisResponse]]:
+        """
+        Analyze several texts with one completion.
+        
+        Returns:
+            One entry per text: the validated AnalysisResponse, or None when the
+            model's item for that text is missing or fails validation
+            
+        Raises:
+            Exception: If the API call fails or the response is not a JSON array
+        """
+        for text in texts:
+            AnalysisRequest(text=text, language=language)
+        logger.info(f"Starting packed analysis for {len(texts)} texts (language: {language})")
+        
+        response_data = self._parse_json_response(
+            self._call_yandex_gpt(self._build_packed_prompt(texts, language))
+        )
+        if isinstance(response_data, dict):
+            response_data = response_data.get('results', response_data.get('items'))
+        if not isinstance(response_data, list):
+            error_msg = "Packed response is not a JSON array"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        # Items are matched by "id"; by position only when the model dropped the ids
+        by_id = {}
+        for item in response_data:
+            if isinstance(item, dict):
+                try:
+                    by_id[int(item.get('id'))] = item
+                except (TypeError, ValueError):
+                    by_id[None] = item
+        results = []
+        for number in range(1, len(texts) + 1):
+            item = by_id.get(number)
+            if item is None and len(response_data) == len(texts) and None in by_id:
+                item = response_data[number - 1]
+            try:
+                results.append(AnalysisResponse(**item) if isinstance(item, dict) else None)
+            except ValidationError as e:
+                logger.warning(f"Packed item {number} failed validation: {str(e)}")
+                results.append(None)
+        
+        valid = sum(result is not None for result in results)
+        self._record_usage(texts=valid)
+        logger.info(f"Packed analysis completed: {valid}/{len(texts)} items valid")
+        return results
+    
+    def analyze_texts(self, texts: List[str], language: str = "ru", token_budget: int = PACK_TOKEN_BUDGET,
+                      max_items: int = PACK_MAX_ITEMS, before_call=None) -> List[Any]:
+        """
+        Packing mode for batch workloads: analyze many texts with as few completions as possible.
+        
+        Texts are packed up to the token budget; items that fail validation (or
+        whose whole pack failed) are re-run one by one with analyze_text.
+        
+        Args:
+            before_call: called before every upstream call (e.g. a rate limiter)
+            
+        Returns:
+            One entry per text: AnalysisResponse, or the Exception for that text
+        """
+        results = [None] * len(texts)
+        items = []
+        for position, text in enumerate(texts):
+            try:
+                AnalysisRequest(text=text, language=language)
+                items.append((position, text, language))
+            except ValidationError as e:
+                # Invalid texts fail on their own instead of failing a whole pack
+                results[position] = e
+        
+        for _, pack in iter_packs(items, token_budget, max_items):
+            pack_results = [None] * len(pack)
+            if len(pack) > 1:
+                try:
+                    if before_call:
+                        before_call()
+                    pack_results = self.analyze_pack([text for _, text, _ in pack], language)
+                except Exception as e:
+                    logger.warning(f"Packed call for {len(pack)} texts failed, retrying individually: {str(e)}")
+            
+            for (position, text, _), result in zip(pack, pack_results):
+                if result is None:
+                    try:
+                        if before_call:
+                            before_call()
+                        result = self.analyze_text(text, language)
+                    except Exception as e:
+                        result = e
+                results[position] = result
+        return results
+    
+    def _analyze_with_model(self, prompt: str, model: str) -> AnalysisResponse:
+        """One completion on one model, parsed and validated."""
+        response_data = self._parse_json_response(self._call_yandex_gpt(prompt, model))
+        return AnalysisResponse(**response_data)
+    
     def analyze_text(self, text: str, language: str = "ru") -> AnalysisResponse:
         """
         Main method to analyze text using YandexGPT.
@@ -150,41 +463,42 @@ ASSISTANT RESPONSE (JSON ONLY):
         """
         # Validate input parameters
         analysis_request = AnalysisRequest(text=text, language=language)
+        check_deadline()
         logger.info(f"Starting analysis for text (length: {len(text)} chars, language: {language})")
         
         try:
             # Build the complete prompt
             prompt = self._build_complete_prompt(analysis_request.text, analysis_request.language)
             
-            # Call YandexGPT API
-            api_response = self._call_yandex_gpt(prompt)
-            
-            # Extract and clean the response text
-            response_text = api_response.get('result', {}).get('alternatives', [{}])[0].get('message', {}).get('text', '')
-            
-            if not response_text:
-                error_msg = "Empty response from YandexGPT"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            
-            # Clean response - remove markdown code blocks if present
-            cleaned_response = response_text.strip().replace('```json', '').replace('```', '').strip()
-            logger.debug(f"Cleaned response received (length: {len(cleaned_response)} chars)")
-            
-            # Parse JSON response
-            try:
-                response_data = json.loads(cleaned_response)
-            except json.JSONDecodeError as e:
-                error_msg = f"Failed to parse JSON response: {str(e)}\nResponse length: {len(response_text)} chars"
-                logger.error(error_msg)
-                raise Exception(error_msg)
+            # Call YandexGPT API; with MODEL_ROUTING=cascade the lite model answers first
+            started = time.perf_counter()
+            route, models = model_router.plan(analysis_request.text)
+            analysis_response = None
+            for attempt, model in enumerate(models):
+                is_last = attempt == len(models) - 1
+                try:
+                    analysis_response = self._analyze_with_model(prompt, model)
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    if is_last:
+                        raise
+                    route = f"{route}->full:invalid"
+                    logger.warning(f"Escalating to {models[attempt + 1]} after {model} failed: {str(e)}")
+                    continue
+                if is_last or not model_router.should_escalate(analysis_response):
+                    break
+                route = f"{route}->full:low_confidence"
+                logger.info(f"Escalating to {models[attempt + 1]}: {model} confidence {analysis_response.confidence_score}")
+            model_router.record(route, time.perf_counter() - started)
             
-            # Validate response against our Pydantic model
-            analysis_response = AnalysisResponse(**response_data)
-            logger.info(f"Analysis completed successfully. Sentiment: {analysis_response.sentiment}, Confidence: {analysis_response.confidence_score}")
+            self._record_usage(texts=1)
+            logger.info(f"Analysis completed successfully. Sentiment: {analysis_response.sentiment}, Confidence: {analysis_response.confidence_score}, route: {route}")
             
             return analysis_response
             
+        except DeadlineExceeded:
+            raise
         except ValidationError as e:
             error_msg = f"Response validation failed: {str(e)}"
             logger.error(error_msg)
@@ -0,0 +1,119 @@
+"""
+Password hashing offloaded from request workers.
+Hashes are computed in a small dedicated process pool, so a login burst
+cannot monopolize the worker (and its GIL) that also serves /api/analyze.
+Concurrent hashing per client IP is capped, and the pending queue is bounded.
+The client IP is request.remote_addr, which create_app() takes from
+X-Forwarded-For behind TRUSTED_PROXY_HOPS proxies.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Werkzeug method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+# Hashing processes per worker; 0 hashes inline in the request thread
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+# Concurrent hash operations allowed per client IP
+PASSWORD_HASH_PER_IP = int(os.getenv('PASSWORD_HASH_PER_IP', '2'))
+# Queued + running hash operations per worker before shedding
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', str(max(PASSWORD_HASH_WORKERS, 1) * 8)))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+
+class HashingBusy(Exception):
+    """Raised when the per-IP cap or the pending queue limit is reached"""
+
+
+class PasswordHasher:
+    """Bounded process pool for generate/check password hash operations."""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 per_ip_limit=PASSWORD_HASH_PER_IP, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.per_ip_limit = per_ip_limit
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._pending = 0
+        self._per_ip = {}
+        self._method_prefix = None
+
+    def _get_pool(self):
+        """Create the pool lazily and again after a fork (gunicorn workers)"""
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    @contextmanager
+    def _slot(self, client_key):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashingBusy("Password hashing queue is full")
+            if client_key and self.per_ip_limit and self._per_ip.get(client_key, 0) >= self.per_ip_limit:
+                raise HashingBusy("Too many concurrent password operations from this client")
+            self._pending += 1
+            if client_key:
+                self._per_ip[client_key] = self._per_ip.get(client_key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if client_key:
+                    remaining = self._per_ip.get(client_key, 1) - 1
+                    if remaining:
+                        self._per_ip[client_key] = remaining
+                    else:
+                        self._per_ip.pop(client_key, None)
+
+    def _run(self, func, *args, client_key=None):
+        with self._slot(client_key):
+            if self.workers <= 0:
+                return func(*args)
+            future = self._get_pool().submit(func, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise HashingBusy("Password hashing timed out")
+
+    def hash(self, password, client_key=None):
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method, client_key=client_key)
+
+    def verify(self, password_hash, password, client_key=None):
+        """Check a password against a stored hash"""
+        return self._run(check_password_hash, password_hash, password, client_key=client_key)
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with other parameters than configured"""
+        if self._method_prefix is None:
+            # Expand short names ('scrypt') to werkzeug's full parameter string once
+            sample = self._run(generate_password_hash, 'sample', self.method)
+            self._method_prefix = sample.split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher()
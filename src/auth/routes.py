@@ -1,10 +1,23 @@
+import secrets
+
 from flask import Blueprint, request, jsonify
+from sqlalchemy import update
 from extensions import db
+from src.models.database import read_session
 from src.models.sql_models import User
-from src.auth.utils import generate_jwt_token
+from src.auth.hashing import HashingBusy
+from src.auth.utils import api_key_cache, generate_jwt_token, token_required
 
 auth_bp = Blueprint('auth', __name__)
 
+def hashing_busy_response(language):
+    """429 when the password hashing pool or per-IP cap is saturated"""
+    error_msg = 'Too many login attempts, try again shortly' if language == 'en' else 'Слишком много попыток входа, повторите позже'
+    response = jsonify({'error': error_msg})
+    response.status_code = 429
+    response.headers['Retry-After'] = '1'
+    return response
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """User registration endpoint"""
@@ -13,11 +26,14 @@ def register():
 
         language = data.get('language', 'ru')
         
-        # Check if user already exists
-        if User.query.filter_by(username=data['username']).first():
+        # Check if user already exists (read engine: no write lock while the password is hashed)
+        with read_session() as session:
+            username_taken = session.query(User.id).filter_by(username=data['username']).first()
+            email_taken = session.query(User.id).filter_by(email=data['email']).first()
+        if username_taken:
             error_msg = 'Username already exists' if language == 'en' else 'Имя пользователя уже существует'
             return jsonify({'error': error_msg}), 409
-        if User.query.filter_by(email=data['email']).first():
+        if email_taken:
             error_msg = 'Email already exists' if language == 'en' else 'Email уже существует'
             return jsonify({'error': error_msg}), 409
         
@@ -26,7 +42,7 @@ def register():
             username=data['username'],
             email=data['email']
         )
-        new_user.set_password(data['password'])
+        new_user.set_password(data['password'], client_key=request.remote_addr)
         
         db.session.add(new_user)
         db.session.commit()
@@ -40,6 +56,9 @@ def register():
             'user': new_user.to_dict()
         }), 201
         
+    except HashingBusy:
+        db.session.rollback()
+        return hashing_busy_response(language)
     except Exception as e:
         db.session.rollback()
         error_msg = 'Registration failed' if language == 'en' else 'Ошибка регистрации'
@@ -51,9 +70,16 @@ def login():
     try:
         data = request.get_json()
         language = data.get('language', 'ru')
-        user = User.query.filter_by(username=data['username']).first()
+        # Looked up on the read engine: the write lock is not held while the hash is verified
+        with read_session() as session:
+            user = session.query(User).filter_by(username=data['username'], deleted_at=None).first()
         
-        if user and user.check_password(data['password']):
+        if user and user.check_password(data['password'], client_key=request.remote_addr):
+            # Transparently upgrade hashes made with older parameters (hashed before the write)
+            if user.password_needs_rehash():
+                user.set_password(data['password'], client_key=request.remote_addr)
+                db.session.execute(update(User).where(User.id == user.id).values(password_hash=user.password_hash))
+                db.session.commit()
             token = generate_jwt_token(user.id)
             return jsonify({
                 'message': 'Login successful' if language == 'en' else 'Вход выполнен успешно',
@@ -64,6 +90,74 @@ def login():
             error_msg = 'Invalid username or password' if language == 'en' else 'Неверное имя пользователя или пароль'
             return jsonify({'error': error_msg}), 401
             
+    except HashingBusy:
+        db.session.rollback()
+        return hashing_busy_response(language)
     except Exception as e:
         error_msg = 'Login failed' if language == 'en' else 'Ошибка входа'
-        return jsonify({'error': error_msg, 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': error_msg, 'details': str(e)}), 500
+
+@auth_bp.route('/api-key', methods=['POST'])
+@token_required
+def regenerate_api_key(user_id):
+    """Issue a new API key; the old one stops working immediately in this worker"""
+    try:
+        user = db.session.get(User, user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+
+        user.api_key = secrets.token_urlsafe(32)
+        db.session.commit()
+        api_key_cache.invalidate_user(user_id)
+
+        return jsonify({'api_key': user.api_key})
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to regenerate API key', 'details': str(e)}), 500
+
+@auth_bp.route('/account', methods=['DELETE'])
+@token_required
+def delete_account(user_id):
+    """Delete the account with all analyses (password confirmation required)"""
+    from src.models.retention import (
+        ACCOUNT_DELETE_BUDGET, delete_account as delete_user_data, mark_account_deleted
+    )
+
+    data = request.get_json(silent=True) or {}
+    language = data.get('language', 'ru')
+    try:
+        with read_session() as session:
+            user = session.get(User, user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if not user.check_password(data.get('password', ''), client_key=request.remote_addr):
+            error_msg = 'Invalid password' if language == 'en' else 'Неверный пароль'
+            return jsonify({'error': error_msg}), 401
+
+        # Disabled first, so a timeout below leaves nothing usable behind
+        mark_account_deleted(user_id)
+        api_key_cache.invalidate_user(user_id)
+
+        # Batched set-based deletes: the user's analyses are never loaded into the session.
+        # Heavy accounts are finished by `flask purge-deleted-accounts`
+        deleted, finished = delete_user_data(user_id, budget=ACCOUNT_DELETE_BUDGET)
+        if not finished:
+            return jsonify({
+                'message': 'Account disabled, data deletion in progress' if language == 'en'
+                else 'Аккаунт отключён, данные удаляются',
+                'analyses_deleted': deleted
+            }), 202
+
+        return jsonify({
+            'message': 'Account deleted' if language == 'en' else 'Аккаунт удалён',
+            'analyses_deleted': deleted
+        })
+
+    except HashingBusy:
+        db.session.rollback()
+        return hashing_busy_response(language)
+    except Exception as e:
+        db.session.rollback()
+        error_msg = 'Failed to delete account' if language == 'en' else 'Не удалось удалить аккаунт'
+        return jsonify({'error': error_msg, 'details': str(e)}), 500
@@ -1,15 +1,20 @@
 import jwt
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-from flask import request, jsonify
+from flask import current_app, has_app_context, request, jsonify
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
-
-JWT_SECRET_KEY = os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 
+def get_jwt_secret():
+    """JWT secret from the app config, or the environment outside an app"""
+    if has_app_context() and current_app.config.get('JWT_SECRET'):
+        return current_app.config['JWT_SECRET']
+    return os.getenv('JWT_SECRET', 'your-secret-key-change-in-production')
+
 def generate_jwt_token(user_id):
     """Generate JWT token for user"""
     payload = {
@@ -17,22 +22,103 @@ def generate_jwt_token(user_id):
         'iat': datetime.now(timezone.utc),
         'sub': str(user_id)
     }
-    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return jwt.encode(payload, get_jwt_secret(), algorithm=JWT_ALGORITHM)
 
 def verify_jwt_token(token):
     """Verify JWT token and return user_id if valid"""
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, get_jwt_secret(), algorithms=[JWT_ALGORITHM])
         return int(payload['sub']) 
     except jwt.ExpiredSignatureError:
         return None  # Token expired
     except jwt.InvalidTokenError:
         return None  # Invalid token
     
+# ADD: API key authentication for machine clients
+API_KEY_HEADER = 'X-API-Key'
+API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', '60'))
+
+class ApiKeyCache:
+    """
+    Per-worker TTL cache mapping SHA-256 of an API key to a user id.
+    Plain keys are never kept in memory. Unknown keys are cached as misses
+    too, so a client hammering with a bad key does not hit the database.
+    Other workers see a regenerated key at most `ttl` seconds later.
+    """
+
+    def __init__(self, ttl=API_KEY_CACHE_TTL, max_entries=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = {}  # key hash -> (user_id or None, expires_at)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hash_key(api_key):
+        return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+    def get(self, api_key):
+        """Return (found, user_id) for a cached key"""
+        key_hash = self.hash_key(api_key)
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return False, None
+            if entry[1] < self.clock():
+                del self._entries[key_hash]
+                return False, None
+            return True, entry[0]
+
+    def set(self, api_key, user_id):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = self.clock()
+                self._entries = {k: v for k, v in self._entries.items() if v[1] >= now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[self.hash_key(api_key)] = (user_id, self.clock() + self.ttl)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached key of a user (e.g. after key regeneration)"""
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if v[0] != user_id}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+api_key_cache = ApiKeyCache()
+
+def verify_api_key(api_key):
+    """Resolve an API key to a user id (cached), or None if unknown"""
+    if not api_key:
+        return None
+
+    found, user_id = api_key_cache.get(api_key)
+    if found:
+        return user_id
+
+    from sqlalchemy import select
+    from src.models.database import read_engine
+    from src.models.sql_models import User
+    # Short-lived read connection: the request session would otherwise hold a pooled
+    # connection for the whole upstream call in cooperative (gevent) workers
+    with read_engine().connect() as conn:
+        user_id = conn.execute(select(User.id).where(User.api_key == api_key)).scalar()
+    api_key_cache.set(api_key, user_id)
+    return user_id
+
 def token_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         token = None
+
+        # Machine clients may authenticate with an API key instead of a JWT
+        if API_KEY_HEADER in request.headers and 'Authorization' not in request.headers:
+            user_id = verify_api_key(request.headers[API_KEY_HEADER])
+            if not user_id:
+                return jsonify({'error': 'Invalid API key'}), 401
+            return f(user_id, *args, **kwargs)
         
         # Check token in Authorization header
         if 'Authorization' in request.headers:
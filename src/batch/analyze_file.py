@@ -0,0 +1,288 @@
+"""
+Offline analysis of large text corpora (CSV/JSONL).
+Streams the input, runs analyses concurrently under a rate limit, writes
+results in batches and checkpoints progress so a crashed run resumes
+without re-paying for finished items.
+
+A batch is marked done in the checkpoint before the sink runs, so the sink
+can persist the checkpoint state in the same transaction as the results
+(analyze-file stores it in batch_checkpoints with each DB batch). A crash
+after the sink but before Checkpoint.save() then loses no progress: on
+resume the stored state and the indices already in the output file count
+as done, and nothing is analyzed or written twice.
+"""
+
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+def detect_format(path):
+    """Input format from file extension"""
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def iter_input(path, input_format=None, text_field='text', language_field='language', default_language='ru'):
+    """
+    Stream (index, text, language) tuples from a CSV or JSONL file.
+    Index is the record position and identifies items in the checkpoint.
+    """
+    input_format = input_format or detect_format(path)
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        if input_format == 'csv':
+            records = csv.DictReader(file)
+        else:
+            records = (json.loads(line) for line in file if line.strip())
+
+        for index, record in enumerate(records):
+            text = (record.get(text_field) or '').strip()
+            language = (record.get(language_field) or default_language).strip().lower()
+            yield index, text, language
+
+
+def count_input(path, input_format=None, **kwargs):
+    """Number of records in the input (one cheap streaming pass, for ETA)"""
+    return sum(1 for _ in iter_input(path, input_format, **kwargs))
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            self.sleep(wait_time)
+
+
+class Checkpoint:
+    """
+    Completed item indices, stored compactly as a contiguous watermark
+    plus the sparse set of indices finished beyond it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done_below = 0
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            self.done_below = state.get('done_below', 0)
+            self.done = set(state.get('done', []))
+
+    def merge(self, state):
+        """Add progress saved elsewhere, e.g. committed with the last DB batch"""
+        self.done_below = max(self.done_below, state.get('done_below', 0))
+        self.done = {index for index in self.done if index >= self.done_below}
+        self.mark_done(state.get('done', []))
+
+    def is_done(self, index):
+        return index < self.done_below or index in self.done
+
+    def mark_done(self, indices):
+        self.done.update(indices)
+        while self.done_below in self.done:
+            self.done.remove(self.done_below)
+            self.done_below += 1
+
+    @property
+    def completed(self):
+        return self.done_below + len(self.done)
+
+    def to_dict(self):
+        return {'done_below': self.done_below, 'done': sorted(self.done)}
+
+    def save(self):
+        """Atomically persist progress"""
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+        os.replace(temp_path, self.path)
+
+
+def scan_output(path):
+    """
+    Indices already in a JSONL output file, as a Checkpoint, and whether the
+    file ends mid-line (a write torn by a crash; that record is not counted).
+    """
+    written = Checkpoint(None)
+    if not os.path.exists(path):
+        return written, False
+    line = ''
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.endswith('\n'):
+                break
+            try:
+                written.mark_done([json.loads(line)['index']])
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"Skipping unreadable line in {path}")
+    return written, bool(line) and not line.endswith('\n')
+
+
+class Progress:
+    """Live throughput and ETA reporting"""
+
+    def __init__(self, total, already_done, echo, interval=1.0, clock=time.monotonic):
+        self.total = total
+        self.processed = 0
+        self.failed = 0
+        self.already_done = already_done
+        self.echo = echo
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.last_report = 0.0
+
+    def update(self, processed=0, failed=0, force=False):
+        self.processed += processed
+        self.failed += failed
+        now = self.clock()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.processed / elapsed
+        done = self.already_done + self.processed
+        message = f"{done}"
+        if self.total:
+            remaining = max(self.total - done - self.failed, 0)
+            eta = remaining / rate if rate else float('inf')
+            eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+            message += f"/{self.total} ({done / self.total:.1%}) | ETA {eta_text}"
+        self.echo(f"{message} | {rate:.2f} items/s | failed {self.failed}")
+
+
+class CorpusAnalyzer:
+    """
+    Runs analyses for an input stream and hands results to a sink in batches.
+
+    Args:
+        client: object with analyze_text(text, language) -> AnalysisResponse
+        sink: callable(list of (index, text, language, result_dict)) persisting a batch;
+            the checkpoint already includes the batch when it is called
+        checkpoint: Checkpoint with already finished items
+        concurrency: maximum analyses in flight
+        rate_limiter: RateLimiter for upstream calls (optional)
+        batch_size: results per sink call / checkpoint save
+        pack: send several short texts per completion (client.analyze_texts)
+    """
+
+    def __init__(self, client, sink, checkpoint, concurrency=4, rate_limiter=None, batch_size=50, progress=None,
+                 pack=False):
+        self.client = client
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = rate_limiter
+        self.batch_size = batch_size
+        self.progress = progress
+        self.pack = pack
+        self.errors = []
+
+    def _analyze(self, index, text, language):
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        return self.client.analyze_text(text=text, language=language).model_dump()
+
+    def _analyze_unit(self, unit):
+        """Results for a list of items: dicts, or the Exception of a failed item"""
+        if not self.pack:
+            index, text, language = unit[0]
+            return [self._analyze(index, text, language)]
+
+        language = unit[0][2]
+        results = self.client.analyze_texts(
+            [text for _, text, _ in unit], language,
+            before_call=self.rate_limiter.acquire if self.rate_limiter else None
+        )
+        return [result if isinstance(result, Exception) else result.model_dump() for result in results]
+
+    def _units(self, items):
+        """Work units: single items, or packs of same-language items"""
+        pending_items = (item for item in items if not self.checkpoint.is_done(item[0]))
+        if not self.pack:
+            return ([item] for item in pending_items)
+        from src.api.yandex_gpt import iter_packs
+        return (pack for _, pack in iter_packs(pending_items))
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        self.checkpoint.mark_done(index for index, _, _, _ in pending)
+        self.sink(pending)
+        self.checkpoint.save()
+        pending.clear()
+
+    def run(self, items):
+        """Process (index, text, language) items; returns (processed, failed)"""
+        pending = []
+        processed = failed = 0
+        in_flight = {}
+
+        def collect(done_futures):
+            nonlocal processed, failed
+            for future in done_futures:
+                unit = in_flight.pop(future)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [e] * len(unit)
+                for (index, text, language), result in zip(unit, results):
+                    if isinstance(result, Exception):
+                        failed += 1
+                        self.errors.append((index, str(result)))
+                        logger.error(f"Item {index} failed: {result}")
+                        if self.progress:
+                            self.progress.update(failed=1)
+                    else:
+                        pending.append((index, text, language, result))
+                        processed += 1
+                        if self.progress:
+                            self.progress.update(processed=1)
+            if len(pending) >= self.batch_size:
+                self._flush(pending)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for unit in self._units(items):
+                # Bounded submission window keeps memory flat for huge inputs
+                while len(in_flight) >= self.concurrency * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(self._analyze_unit, unit)] = unit
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        self._flush(pending)
+        if self.progress:
+            self.progress.update(force=True)
+        return processed, failed
@@ -0,0 +1,512 @@
+"""
+Flask CLI commands for database maintenance.
+Usage: flask --app app <command>
+"""
+
+import json
+import os
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, inspect, select, text
+
+from extensions import db
+
+
+def _add_missing_columns(table):
+    """ALTER TABLE ADD COLUMN for model columns missing in an existing database"""
+    # DDL runs on the session's connection: with the SQLite profile a second
+    # connection would wait on the write lock this session may already hold
+    conn = db.session.connection()
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        added.append(column.name)
+    db.session.commit()
+    return added
+
+
+def _backfill_usage_models():
+    """Per-model rows for usage recorded before the split existed, attributed to the row's model"""
+    from src.models.sql_models import AnalysisUsage, AnalysisUsageModel
+
+    usage = AnalysisUsage.__table__
+    usage_models = AnalysisUsageModel.__table__
+    columns = ['analysis_id', 'model_uri', 'calls', 'prompt_tokens', 'completion_tokens']
+    result = db.session.execute(usage_models.insert().from_select(
+        columns,
+        select(*(usage.c[name] for name in columns)).where(
+            ~select(usage_models.c.analysis_id).where(usage_models.c.analysis_id == usage.c.analysis_id).exists()
+        )
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def _ensure_schema(*tables):
+    """Create missing tables, plus indexes declared on the models that are missing in an existing database"""
+    conn = db.session.connection()
+    db.metadata.create_all(bind=conn)
+    for table in tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    db.session.commit()
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create database tables and indexes (run once per deploy, not at import)."""
+    from src.models import sql_models
+    from src.models.rollups import rebuild_rollups
+
+    _ensure_schema(*db.metadata.sorted_tables)
+    for table in db.metadata.sorted_tables:
+        added = _add_missing_columns(table)
+        if added:
+            click.echo(f"Added columns to {table.name}: {', '.join(added)}")
+            if table is sql_models.DailyRollup.__table__:
+                # New sum columns start out NULL: refill them from analysis_results
+                rebuild_rollups(db.session.connection())
+                db.session.commit()
+                click.echo("Rollups rebuilt for the new columns")
+    split = _backfill_usage_models()
+    if split:
+        click.echo(f"Added per-model usage rows for {split} analyses")
+    click.echo(f"✅ Database initialized: {len(db.metadata.tables)} tables")
+
+
+@click.command('backfill-tags')
+@click.option('--batch-size', default=500, show_default=True, help='Analyses per transaction')
+@with_appcontext
+def backfill_tags_command(batch_size):
+    """Migrate JSON emotions/skills/distortions into the normalized tag tables."""
+    from src.models.sql_models import AnalysisResult, analysis_tags, parse_tag_list
+
+    _ensure_schema(AnalysisResult.__table__, analysis_tags)
+
+    tagged_ids = select(analysis_tags.c.analysis_id)
+    tag_cache = {}
+    last_id = 0
+    migrated = 0
+
+    while True:
+        batch = (
+            AnalysisResult.query
+            .filter(AnalysisResult.id > last_id, AnalysisResult.id.not_in(tagged_ids))
+            .order_by(AnalysisResult.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+
+        for record in batch:
+            record.set_tags(
+                emotions=parse_tag_list(record.emotions),
+                skills=parse_tag_list(record.skills),
+                distortions=parse_tag_list(record.distortions),
+                cache=tag_cache
+            )
+        db.session.commit()
+
+        last_id = batch[-1].id
+        migrated += len(batch)
+        click.echo(f"Backfilled tags for {migrated} analyses...")
+
+    click.echo(f"✅ Tag backfill complete: {migrated} analyses migrated")
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute daily analytics rollups from analysis_results (backfill)."""
+    from src.models.rollups import rebuild_rollups
+    from src.models.sql_models import DailyRollup
+
+    _ensure_schema()
+    rebuild_rollups(db.session.connection())
+    db.session.commit()
+
+    buckets = db.session.query(DailyRollup).count()
+    click.echo(f"✅ Rollups rebuilt: {buckets} daily buckets")
+
+
+@click.command('backfill-text-length')
+@click.option('--batch-size', default=500, show_default=True, help='Analyses per transaction')
+@with_appcontext
+def backfill_text_length_command(batch_size):
+    """Add analysis_results.text_length and fill it by decrypting existing rows once."""
+    from src.models.sql_models import AnalysisResult
+
+    added = _add_missing_columns(AnalysisResult.__table__)
+    if added:
+        click.echo(f"Added columns: {', '.join(added)}")
+
+    last_id = 0
+    updated = 0
+    while True:
+        batch = (
+            AnalysisResult.query
+            .filter(AnalysisResult.id > last_id, AnalysisResult.text_length.is_(None))
+            .order_by(AnalysisResult.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+
+        for record in batch:
+            text_value = record.original_text
+            record.text_length = len(text_value) if text_value else 0
+        db.session.commit()
+
+        last_id = batch[-1].id
+        updated += len(batch)
+        click.echo(f"Computed text length for {updated} analyses...")
+
+    if updated:
+        # Updates are not rollup deltas: refill the text length sums
+        from src.models.rollups import rebuild_rollups
+        rebuild_rollups(db.session.connection())
+        db.session.commit()
+    click.echo(f"✅ Text length backfill complete: {updated} analyses updated")
+
+
+@click.command('backfill-signatures')
+@click.option('--batch-size', default=500, show_default=True, help='Analyses per transaction')
+@with_appcontext
+def backfill_signatures_command(batch_size):
+    """Add analysis_results.text_signature and compute near-duplicate signatures for existing rows."""
+    from src.api.dedup import reset, text_signature
+    from src.models.sql_models import AnalysisResult
+
+    added = _add_missing_columns(AnalysisResult.__table__)
+    if added:
+        click.echo(f"Added columns: {', '.join(added)}")
+
+    last_id = 0
+    updated = 0
+    while True:
+        batch = (
+            AnalysisResult.query
+            .filter(AnalysisResult.id > last_id, AnalysisResult.text_signature.is_(None))
+            .order_by(AnalysisResult.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+
+        for record in batch:
+            text_value = record.original_text
+            if text_value:
+                record.text_signature = text_signature(text_value)
+        db.session.commit()
+
+        last_id = batch[-1].id
+        updated += len(batch)
+        click.echo(f"Computed signatures for {updated} analyses...")
+
+    reset()
+    click.echo(f"✅ Signature backfill complete: {updated} analyses updated")
+
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Delete expired Idempotency-Key records (also done periodically by the app)."""
+    from src.api.idempotency import purge_expired
+
+    removed = purge_expired()
+    click.echo(f"✅ Removed {removed} expired idempotency keys")
+
+
+@click.command('delete-user')
+@click.argument('user_id', type=int)
+@click.option('--batch-size', type=int, help='Analyses per transaction (default PURGE_BATCH_SIZE)')
+@click.option('--pause', type=float, help='Seconds between batches (default PURGE_PAUSE)')
+@click.confirmation_option(prompt='Delete the user and all their analyses?')
+@with_appcontext
+def delete_user_command(user_id, batch_size, pause):
+    """Delete a user account with all analyses in batched set-based DELETEs."""
+    from src.models.retention import delete_account
+    from src.models.sql_models import User
+
+    if not db.session.get(User, user_id):
+        raise click.BadParameter(f"User {user_id} does not exist", param_hint='USER_ID')
+
+    deleted, _ = delete_account(user_id, batch_size=batch_size, pause=pause,
+                                progress=lambda done: click.echo(f"Deleted {done} analyses", err=True))
+    click.echo(f"✅ User {user_id} deleted with {deleted} analyses")
+
+
+@click.command('purge-deleted-accounts')
+@click.option('--batch-size', type=int, help='Analyses per transaction (default PURGE_BATCH_SIZE)')
+@click.option('--pause', type=float, help='Seconds between batches (default PURGE_PAUSE)')
+@with_appcontext
+def purge_deleted_accounts_command(batch_size, pause):
+    """Finish account deletions that did not complete within the request (run from cron)."""
+    from src.models.retention import purge_deleted_accounts
+
+    accounts, deleted = purge_deleted_accounts(batch_size=batch_size, pause=pause,
+                                               progress=lambda done: click.echo(f"Deleted {done} analyses", err=True))
+    click.echo(f"✅ Removed {accounts} deleted accounts with {deleted} analyses")
+
+
+@click.command('purge-analyses')
+@click.option('--older-than-days', 'days', type=int, help='Retention period (default RETENTION_DAYS)')
+@click.option('--batch-size', type=int, help='Analyses per transaction (default PURGE_BATCH_SIZE)')
+@click.option('--pause', type=float, help='Seconds between batches (default PURGE_PAUSE)')
+@with_appcontext
+def purge_analyses_command(days, batch_size, pause):
+    """Retention purge: delete analyses older than the retention period (run daily from cron)."""
+    from src.models.retention import RETENTION_DAYS, purge_old_analyses
+
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        raise click.UsageError("Retention is off: set RETENTION_DAYS or pass --older-than-days")
+
+    deleted, cutoff = purge_old_analyses(days, batch_size=batch_size, pause=pause,
+                                         progress=lambda done: click.echo(f"Deleted {done} analyses", err=True))
+    click.echo(f"✅ Removed {deleted} analyses created before {cutoff.date().isoformat()}")
+
+
+@click.command('usage-report')
+@click.option('--days', default=7, show_default=True, help='Report on the last N days')
+@click.option('--by', type=click.Choice(['language', 'prompt_version']), default='language', show_default=True,
+              help='Group latency and tokens by')
+@with_appcontext
+def usage_report_command(days, by):
+    """Upstream latency percentiles, tokens per character and cost per day from the usage ledger."""
+    from datetime import datetime, timedelta, timezone
+
+    from src.api.usage import price_per_1k
+    from src.models.analytics import usage_by_day, usage_percentiles, usage_totals
+
+    start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    totals = usage_totals(by=by, start=start)
+    if not totals:
+        click.echo(f"No analyses with usage data in the last {days} days")
+        return
+    total_ms = usage_percentiles('total_ms', by=by, start=start)
+    upstream_ms = usage_percentiles('upstream_ms', by=by, start=start)
+
+    click.echo(f"{by:<16} {'analyses':>8} {'calls':>6} {'p50 ms':>7} {'p99 ms':>7} "
+               f"{'upstream p50':>12} {'upstream p99':>12} {'tokens/char':>11}")
+    for key, row in sorted(totals.items()):
+        per_char = f"{row['tokens_per_char']:.2f}" if row['tokens_per_char'] is not None else '-'
+        click.echo(f"{key:<16} {row['analyses']:>8} {row['calls']:>6} {total_ms[key][0.5]:>7} {total_ms[key][0.99]:>7} "
+                   f"{upstream_ms[key][0.5]:>12} {upstream_ms[key][0.99]:>12} {per_char:>11}")
+
+    click.echo("")
+    click.echo(f"{'day':<10} {'calls':>8} {'prompt tokens':>13} {'completion tokens':>17} {'cost':>10}")
+    days_rows = {}
+    # Priced per model: the lite calls of a cascade are not billed at the full-model rate
+    for day, model_uri, calls, prompt_tokens, completion_tokens in usage_by_day(start=start):
+        row = days_rows.setdefault(day, [0, 0, 0, 0.0])
+        row[0] += calls
+        row[1] += prompt_tokens
+        row[2] += completion_tokens
+        row[3] += (prompt_tokens + completion_tokens) / 1000 * price_per_1k(model_uri)
+    for day, (calls, prompt_tokens, completion_tokens, cost) in days_rows.items():
+        click.echo(f"{day:<10} {calls:>8} {prompt_tokens:>13} {completion_tokens:>17} {cost:>10.2f}")
+    click.echo(f"✅ Total cost: {sum(row[3] for row in days_rows.values()):.2f}")
+
+
+@click.command('assign-client')
+@click.argument('therapist_id', type=int)
+@click.argument('client_id', type=int)
+@click.option('--remove', is_flag=True, help='Unlink the client instead')
+@with_appcontext
+def assign_client_command(therapist_id, client_id, remove):
+    """Link a client to a therapist; therapists may export only their clients."""
+    from src.models.sql_models import User, therapist_clients
+
+    therapist = db.session.get(User, therapist_id)
+    if not therapist or not therapist.is_therapist:
+        raise click.BadParameter(f"User {therapist_id} is not a therapist", param_hint='THERAPIST_ID')
+    if not db.session.get(User, client_id):
+        raise click.BadParameter(f"User {client_id} does not exist", param_hint='CLIENT_ID')
+
+    link = (therapist_clients.c.therapist_id == therapist_id) & (therapist_clients.c.client_id == client_id)
+    if remove:
+        db.session.execute(delete(therapist_clients).where(link))
+        db.session.commit()
+        click.echo(f"✅ User {client_id} is no longer a client of therapist {therapist_id}")
+        return
+    if db.session.execute(select(therapist_clients.c.client_id).where(link)).first() is None:
+        db.session.execute(therapist_clients.insert().values(therapist_id=therapist_id, client_id=client_id))
+        db.session.commit()
+    click.echo(f"✅ User {client_id} is a client of therapist {therapist_id}")
+
+
+@click.command('export-analyses')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='User to export (repeatable); all users if omitted')
+@click.option('--format', 'export_format', type=click.Choice(['ndjson', 'parquet']), default='ndjson', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True, allow_dash=True), default='-',
+              show_default=True, help="Output file ('-' for stdout)")
+@click.option('--include-text', is_flag=True, help='Decrypt and include original texts')
+@click.option('--start', help='Start date (ISO, inclusive)')
+@click.option('--end', help='End date (ISO, inclusive)')
+@click.option('--tag', help='Only analyses with this tag, e.g. distortion:catastrophizing')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per fetch/serialize chunk')
+@with_appcontext
+def export_analyses_command(user_ids, export_format, output, include_text, start, end, tag, chunk_size):
+    """Stream analyses to NDJSON or Parquet with constant memory."""
+    from src.api.export import build_export_query, parse_date, parse_tag_filter, stream_export
+    from src.models.database import read_engine
+
+    try:
+        stmt = build_export_query(
+            user_ids=user_ids or None,
+            start=parse_date(start),
+            end=parse_date(end, end_of_day=True),
+            tag=parse_tag_filter(tag),
+            include_text=include_text
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    written = 0
+    with click.open_file(output, 'wb') as stream:
+        for chunk in stream_export(read_engine(), stmt, export_format, chunk_size=chunk_size):
+            stream.write(chunk)
+            written += len(chunk)
+
+    if output != '-':
+        click.echo(f"✅ Export written to {output} ({written} bytes)")
+
+
+@click.command('analyze-file')
+@click.argument('input_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--input-format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension')
+@click.option('--text-field', default='text', show_default=True, help='Column/key holding the text')
+@click.option('--language', 'default_language', type=click.Choice(['ru', 'en']), default='ru', show_default=True,
+              help="Language for records without a 'language' field")
+@click.option('--user-id', type=int, help='Store results as AnalysisResult rows of this user')
+@click.option('--output', type=click.Path(dir_okay=False), help='Append results to this JSONL file')
+@click.option('--concurrency', default=4, show_default=True, help='Analyses in flight')
+@click.option('--rate', default=5.0, show_default=True, help='Upstream calls per second (0 = unlimited)')
+@click.option('--batch-size', default=50, show_default=True, help='Results per DB commit / checkpoint')
+@click.option('--checkpoint', 'checkpoint_path', type=click.Path(dir_okay=False),
+              help='Progress file (default: <input>.checkpoint)')
+@click.option('--pack', is_flag=True, help='Analyze several short texts per upstream call (PACK_TOKEN_BUDGET)')
+@click.option('--restart', is_flag=True,
+              help='Discard saved progress (checkpoint file and stored state) and analyze everything again')
+@with_appcontext
+def analyze_file_command(input_path, input_format, text_field, default_language, user_id, output,
+                         concurrency, rate, batch_size, checkpoint_path, pack, restart):
+    """Analyze a CSV/JSONL corpus concurrently; safe to re-run after a crash."""
+    from src.api.dedup import text_signature
+    from src.api.yandex_gpt import get_yandex_gpt_client
+    from src.batch.analyze_file import (
+        Checkpoint, CorpusAnalyzer, Progress, RateLimiter, count_input, iter_input, scan_output
+    )
+    from src.models.database import read_session
+    from src.models.sql_models import AnalysisResult, BatchCheckpoint, User
+
+    if user_id is None and not output:
+        raise click.UsageError("Specify --user-id and/or --output for the results")
+    if user_id is not None and not db.session.get(User, user_id):
+        raise click.BadParameter(f"User {user_id} does not exist", param_hint='--user-id')
+
+    read_options = {'text_field': text_field, 'default_language': default_language}
+    checkpoint_path = checkpoint_path or f"{input_path}.checkpoint"
+    checkpoint_key = os.path.abspath(checkpoint_path)
+    if user_id is not None:
+        _ensure_schema(BatchCheckpoint.__table__)
+    if restart:
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if inspect(db.session.connection()).has_table(BatchCheckpoint.__tablename__):
+            db.session.execute(delete(BatchCheckpoint).where(BatchCheckpoint.key == checkpoint_key))
+        db.session.commit()
+    checkpoint = Checkpoint(checkpoint_path)
+    # A crash between a sink write and Checkpoint.save() leaves the file behind:
+    # the DB batch committed its own copy of the state, the output its lines
+    if user_id is not None:
+        with read_session() as session:
+            stored = session.get(BatchCheckpoint, checkpoint_key)
+            if stored is not None:
+                checkpoint.merge(json.loads(stored.state))
+    written, torn = scan_output(output) if output else (Checkpoint(None), False)
+    if restart:
+        # Lines of the previous run stay in the output; new results are appended after them
+        written = Checkpoint(None)
+    if user_id is None:
+        checkpoint.merge(written.to_dict())
+    total = count_input(input_path, input_format, **read_options)
+    click.echo(f"Input: {total} records, {checkpoint.completed} already done")
+
+    output_file = open(output, 'a', encoding='utf-8') if output else None
+    if torn:
+        output_file.write('\n')
+    tag_cache = {}
+
+    def sink(batch):
+        """Persist one batch: output lines, then the DB insert with the checkpoint state"""
+        if output_file:
+            # Items already written but not in the DB are re-analyzed, not re-written
+            output_file.write(''.join(
+                json.dumps({'index': index, 'language': language, **result}, ensure_ascii=False) + '\n'
+                for index, _, language, result in batch if not written.is_done(index)
+            ))
+            output_file.flush()
+        if user_id is not None:
+            db.session.add_all([
+                AnalysisResult.from_response(user_id, text, language, result, tag_cache=tag_cache,
+                                             text_signature=text_signature(text))
+                for _, text, language, result in batch
+            ])
+            db.session.merge(BatchCheckpoint(key=checkpoint_key, state=json.dumps(checkpoint.to_dict())))
+            db.session.commit()
+
+    client = get_yandex_gpt_client()
+    analyzer = CorpusAnalyzer(
+        client=client,
+        sink=sink,
+        checkpoint=checkpoint,
+        concurrency=concurrency,
+        rate_limiter=RateLimiter(rate) if rate else None,
+        batch_size=batch_size,
+        progress=Progress(total, checkpoint.completed, echo=lambda message: click.echo(message, err=True)),
+        pack=pack
+    )
+    try:
+        processed, failed = analyzer.run(iter_input(input_path, input_format, **read_options))
+    finally:
+        if output_file:
+            output_file.close()
+
+    if user_id is not None and not failed:
+        # Nothing left to resume: the checkpoint file alone now decides what a re-run skips
+        db.session.execute(delete(BatchCheckpoint).where(BatchCheckpoint.key == checkpoint_key))
+        db.session.commit()
+
+    click.echo(f"✅ Analyzed {processed} records, {failed} failed (re-run to retry failures)")
+    if hasattr(client, 'usage_per_text'):
+        usage = client.usage_per_text()
+        click.echo(f"Upstream calls: {usage['calls']} ({usage['calls_per_text']:.2f} per text), "
+                   f"prompt tokens per text: {usage['prompt_tokens_per_text']:.0f}")
+
+
+def register_commands(app):
+    """Attach maintenance commands to the Flask CLI"""
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(backfill_tags_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(backfill_text_length_command)
+    app.cli.add_command(backfill_signatures_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(delete_user_command)
+    app.cli.add_command(purge_analyses_command)
+    app.cli.add_command(purge_deleted_accounts_command)
+    app.cli.add_command(usage_report_command)
+    app.cli.add_command(assign_client_command)
+    app.cli.add_command(export_analyses_command)
+    app.cli.add_command(analyze_file_command)
@@ -3,10 +3,18 @@ import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
 import sqlalchemy as sa
+import math
 import os
-import json
+import sys
 from pathlib import Path
 
+# Add project root to Python path for imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.dashboard import queries
+from src.dashboard.cache import QueryCache
+from src.models.database import install_sqlite_profile, sqlite_engine_options, sqlite_profile_enabled
+
 # 🔐 Basic authentication for dashboard
 DASHBOARD_PASSWORD = os.getenv('DASHBOARD_PASSWORD', 'mindanalyzer123')
 
@@ -94,7 +102,11 @@ TRANSLATIONS = {
         "none_detected": "None detected",
         "database_error": "Database error:",
         "no_data": "No data found for selected filters",
-        "user_filter": "User:"
+        "user_filter": "User:",
+        "page": "Page:",
+        "page_size": "Rows per page:",
+        "page_of": "Page {page} of {pages} ({total} records)",
+        "detail_unavailable": "Cannot decrypt record:"
     },
     "ru": {
         "title": "🧠 MindAnalyzer Панель Специалиста",
@@ -130,7 +142,11 @@ TRANSLATIONS = {
         "none_detected": "Не обнаружено",
         "database_error": "Ошибка базы данных:",
         "no_data": "Нет данных для выбранных фильтров",
-        "user_filter": "Пользователь:"
+        "user_filter": "Пользователь:",
+        "page": "Страница:",
+        "page_size": "Строк на странице:",
+        "page_of": "Страница {page} из {pages} (записей: {total})",
+        "detail_unavailable": "Не удалось расшифровать запись:"
     }
 }
 
@@ -142,16 +158,6 @@ def get_translation(key):
     """Get translation for current language"""
     return TRANSLATIONS[st.session_state.language].get(key, key)
 
-def parse_json_column(json_str, default):
-    """Safely parse JSON column with error handling"""
-    try:
-        if json_str and json_str != '[]':
-            data = json.loads(json_str)
-            return ', '.join(data) if isinstance(data, list) else default
-        return default
-    except json.JSONDecodeError:
-        return default
-
 def get_database_path():
     """Get database path from environment variable or use default development path"""
     env_path = os.getenv('DATABASE_URL')
@@ -185,10 +191,31 @@ st.session_state.language = 'ru' if language == "Русский" else 'en'
 def get_db_engine():
     """Create and cache database engine"""
     db_path = get_database_path()
+    if sqlite_profile_enabled(db_path):
+        # Read-only WAL connections never block the API's writers
+        return install_sqlite_profile(sa.create_engine(db_path, **sqlite_engine_options()), read_only=True)
     return sa.create_engine(db_path)
 
 engine = get_db_engine()
 
+# Query cache shared by all dashboard sessions
+@st.cache_resource
+def get_query_cache():
+    """Create the process-wide dashboard query cache"""
+    return QueryCache(
+        max_bytes=int(os.getenv('DASHBOARD_CACHE_MB', '64')) * 1024 * 1024,
+        ttl=int(os.getenv('DASHBOARD_CACHE_TTL', '300')),
+        persist_dir=os.getenv('DASHBOARD_CACHE_DIR') or None
+    )
+
+query_cache = get_query_cache()
+
+def cached(name, filters, compute):
+    """Read a query result through the shared cache, keyed by filters and data version"""
+    if data_version is None:
+        return compute()
+    return query_cache.get_or_compute(name, filters, data_version, compute)
+
 # Page header
 st.title(get_translation("title"))
 st.markdown(get_translation("subtitle"))
@@ -205,49 +232,39 @@ selected_sentiment = st.sidebar.selectbox(get_translation("sentiment"), sentimen
 
 # User selection filter
 try:
-    with engine.connect() as conn:
-        users_df = pd.read_sql("SELECT id, username FROM users", conn)
+    data_version = queries.data_version(engine)
+    users_df = cached('users', (), lambda: queries.fetch_users(engine))
     
     user_options = ["All Users"] + [f"{row['id']} - {row['username']}" for _, row in users_df.iterrows()]
     selected_user = st.sidebar.selectbox(get_translation("user_filter"), user_options)
     
-except Exception as e:
+except Exception:
     warning_msg = "Не удалось загрузить список пользователей" if st.session_state.language == 'ru' else "Could not load users list"
     st.sidebar.warning(warning_msg)
     selected_user = "All Users"
+    data_version = None
 
 # Data loading
-try:
-    query = sa.text("""
-        SELECT id, original_text, sentiment, confidence_score, emotions, skills, distortions, created_at
-        FROM analysis_results 
-        WHERE DATE(created_at) BETWEEN :start_date AND :end_date
-    """)
-    
-    params = {'start_date': date_range[0], 'end_date': date_range[1]}
-    
-    if selected_user != "All Users":
-        user_id = int(selected_user.split(" - ")[0])
-        query = sa.text(str(query) + " AND user_id = :user_id")
-        params['user_id'] = user_id
+if selected_user != "All Users":
+    filter_user_id = int(selected_user.split(" - ")[0])
+else:
+    filter_user_id = None
+
+filters = queries.build_filters(
+    date_range[0],
+    date_range[1] if len(date_range) > 1 else date_range[0],
+    user_id=filter_user_id,
+    sentiment=selected_sentiment if selected_sentiment != get_translation('all') else None
+)
 
-    if selected_sentiment != get_translation('all'):
-        query = sa.text(str(query) + " AND sentiment = :sentiment")
-        params['sentiment'] = selected_sentiment
+try:
+    summary = cached('sentiment_summary', filters, lambda: queries.sentiment_summary(engine, filters))
+    metrics = queries.overview_metrics(summary)
 
-    with engine.connect() as conn:
-        df = pd.read_sql(query, conn, params=params)
-    
-    if df.empty:
+    if metrics['total'] == 0:
         st.warning(get_translation("no_data"))
         st.stop()
-    
-    # Parse JSON columns
-    df['emotions'] = df['emotions'].apply(lambda x: parse_json_column(x, get_translation('none_detected')))
-    df['skills'] = df['skills'].apply(lambda x: parse_json_column(x, get_translation('none_detected')))
-    df['distortions'] = df['distortions'].apply(lambda x: parse_json_column(x, get_translation('none_detected')))
-    df['created_at'] = pd.to_datetime(df['created_at'])
-    
+
 except Exception as e:
     error_msg = f"{get_translation('database_error')} {e}"
     st.error(error_msg)
@@ -258,28 +275,24 @@ st.header(get_translation("overview"))
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    st.metric(get_translation("total_records"), len(df))
+    st.metric(get_translation("total_records"), metrics['total'])
 with col2:
-    positive_count = len(df[df['sentiment'] == 'positive'])
-    st.metric(get_translation("positive_sentiments"), positive_count)
+    st.metric(get_translation("positive_sentiments"), metrics['positive'])
 with col3:
-    avg_confidence = df['confidence_score'].mean()
-    st.metric(get_translation("avg_confidence"), f"{avg_confidence:.1%}")
+    st.metric(get_translation("avg_confidence"), f"{metrics['avg_confidence']:.1%}")
 with col4:
-    avg_text_length = df['original_text'].str.len().mean()
-    st.metric(get_translation("avg_text_length"), f"{avg_text_length:.0f} chars")
+    st.metric(get_translation("avg_text_length"), f"{metrics['avg_text_length']:.0f} chars")
 
 # Visualizations
 st.header(get_translation("visualizations"))
 viz_col1, viz_col2 = st.columns(2)
 
 with viz_col1:
-    sentiment_counts = df['sentiment'].value_counts()
     fig_sentiment = px.pie(
-        values=sentiment_counts.values,
-        names=sentiment_counts.index,
+        values=summary['count'],
+        names=summary['sentiment'],
         title=get_translation("sentiment_distribution"),
-        color=sentiment_counts.index,
+        color=summary['sentiment'],
         color_discrete_map={
             'positive': '#2E8B57',
             'negative': '#DC143C', 
@@ -290,13 +303,9 @@ with viz_col1:
     st.plotly_chart(fig_sentiment, use_container_width=True)
 
 with viz_col2:
-    all_emotions = []
-    for emotions_str in df['emotions']:
-        if emotions_str != get_translation('none_detected'):
-            all_emotions.extend([e.strip() for e in emotions_str.split(',')])
+    emotion_counts = cached('emotion_counts', filters, lambda: queries.emotion_counts(engine, filters, limit=10))
     
-    if all_emotions:
-        emotion_counts = pd.Series(all_emotions).value_counts().head(10)
+    if not emotion_counts.empty:
         fig_emotions = px.bar(
             x=emotion_counts.values,
             y=emotion_counts.index,
@@ -310,46 +319,68 @@ with viz_col2:
 
 # Timeline chart
 st.subheader(get_translation("timeline"))
-df['date'] = df['created_at'].dt.date
-timeline_data = df['date'].value_counts().sort_index()
+timeline_data = cached('timeline', filters, lambda: queries.timeline(engine, filters))
 fig_timeline = px.line(
-    x=timeline_data.index,
-    y=timeline_data.values,
+    x=timeline_data['date'],
+    y=timeline_data['count'],
     title=get_translation("timeline"),
     labels={'x': get_translation("date"), 'y': get_translation("requests")}
 )
 st.plotly_chart(fig_timeline, use_container_width=True)
 
-# Data table
+# Data table (paged server-side)
 st.header(get_translation("records"))
+page_col1, page_col2 = st.columns(2)
+with page_col2:
+    page_size = st.selectbox(get_translation("page_size"), [25, 50, 100], index=1)
+page_count = max(math.ceil(metrics['total'] / page_size), 1)
+with page_col1:
+    page = int(st.number_input(get_translation("page"), min_value=1, max_value=page_count, value=1, step=1))
+
+page_filters = filters + (page, page_size)
+df = queries.format_json_columns(
+    cached('records_page', page_filters, lambda: queries.fetch_records_page(engine, filters, page, page_size)).copy(),
+    get_translation('none_detected')
+)
+
 st.dataframe(
     df[['created_at', 'sentiment', 'confidence_score', 'emotions', 'skills', 'distortions']],
     use_container_width=True,
     hide_index=True
 )
+st.caption(get_translation("page_of").format(page=page, pages=page_count, total=metrics['total']))
 
-# Detailed view
+# Detailed view (single row fetched and decrypted on demand)
 st.header(get_translation("detailed_view"))
 selected_id = st.selectbox(get_translation("select_record"), df['id'])
 
 if selected_id:
-    selected_record = df[df['id'] == selected_id].iloc[0]
-    
-    st.subheader(get_translation("original_text"))
-    st.write(selected_record['original_text'])
-    
-    col_a, col_b, col_c = st.columns(3)
-    with col_a:
-        st.metric("Sentiment" if st.session_state.language == 'en' else "Настроение", selected_record['sentiment'])
-    with col_b:
-        st.metric("Confidence" if st.session_state.language == 'en' else "Уверенность", f"{selected_record['confidence_score']:.1%}")
-    with col_c:
-        st.metric("Date" if st.session_state.language == 'en' else "Дата", selected_record['created_at'].strftime("%Y-%m-%d %H:%M"))
-    
-    st.subheader(get_translation("analysis_results"))
-    st.write(f"**{get_translation('emotions')}** {selected_record['emotions']}")
-    st.write(f"**{get_translation('skills')}** {selected_record['skills']}")
-    st.write(f"**{get_translation('distortions')}** {selected_record['distortions']}")
+    try:
+        selected_record = queries.fetch_record_detail(engine, int(selected_id))
+    except ValueError as e:
+        st.error(f"{get_translation('detail_unavailable')} {e}")
+        selected_record = None
+
+    def format_tags(values):
+        return ', '.join(values) if values else get_translation('none_detected')
+
+    if selected_record:
+        st.subheader(get_translation("original_text"))
+        st.write(selected_record['original_text'])
+        
+        col_a, col_b, col_c = st.columns(3)
+        with col_a:
+            st.metric("Sentiment" if st.session_state.language == 'en' else "Настроение", selected_record['sentiment'])
+        with col_b:
+            st.metric("Confidence" if st.session_state.language == 'en' else "Уверенность", f"{selected_record['confidence_score']:.1%}")
+        with col_c:
+            created_at = pd.to_datetime(selected_record['created_at'])
+            st.metric("Date" if st.session_state.language == 'en' else "Дата", created_at.strftime("%Y-%m-%d %H:%M"))
+        
+        st.subheader(get_translation("analysis_results"))
+        st.write(f"**{get_translation('emotions')}** {format_tags(selected_record['emotions'])}")
+        st.write(f"**{get_translation('skills')}** {format_tags(selected_record['skills'])}")
+        st.write(f"**{get_translation('distortions')}** {format_tags(selected_record['distortions'])}")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,213 @@
+"""
+Shared query cache for the specialist dashboard.
+One instance serves all Streamlit sessions (via st.cache_resource):
+- entries are keyed by query name + filter tuple
+- each entry remembers the data version it was computed for, so a new
+  analysis or a deletion (both advance the data_version counter)
+  invalidates it, persisted snapshots included, on next access
+- memory is bounded (LRU by estimated bytes) and entries expire after a TTL
+- DataFrame/Series entries can persist to Parquet so a restart starts warm
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_METADATA_KEY = b'dashboard_cache'
+
+
+def estimate_size(value):
+    """Approximate in-memory size of a cached value in bytes"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class QueryCache:
+    """Thread-safe LRU cache with version invalidation, TTL and a byte budget."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300, persist_dir=None, clock=time.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist_dir = persist_dir
+        self.clock = clock
+
+        self._entries = OrderedDict()  # key -> (version, created_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            self._load_persisted()
+
+    @staticmethod
+    def make_key(name, filters):
+        return repr((name, tuple(filters)))
+
+    def get(self, name, filters, version):
+        """Return cached value or None if missing, stale or expired"""
+        key = self.make_key(name, filters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry_version, created_at, value, _ = entry
+            if entry_version != version or self.clock() - created_at > self.ttl:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, name, filters, version, value):
+        """Store a value, evicting least recently used entries over budget"""
+        key = self.make_key(name, filters)
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        created_at = self.clock()
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (version, created_at, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+        if self.persist_dir and isinstance(value, (pd.DataFrame, pd.Series)):
+            self._persist(key, version, created_at, value)
+
+    def get_or_compute(self, name, filters, version, compute):
+        """
+        Return cached value or compute it once.
+        Concurrent sessions asking for the same key wait for a single computation.
+        """
+        value = self.get(name, filters, version)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        key = self.make_key(name, filters)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            value = self.get(name, filters, version)
+            if value is not None:
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = compute()
+            self.put(name, filters, version, value)
+
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        """Remove an entry; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[3]
+        if self.persist_dir:
+            try:
+                os.remove(self._persist_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _persist_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.persist_dir, f"{digest}.parquet")
+
+    def _persist(self, key, version, created_at, value):
+        """Write a frame to Parquet with cache metadata in the schema"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        is_series = isinstance(value, pd.Series)
+        frame = value.to_frame(name=value.name if value.name is not None else 'value') if is_series else value
+        metadata = json.dumps({
+            'key': key,
+            'version': repr(version),
+            'created_at': created_at,
+            'series': is_series
+        })
+        try:
+            table = pa.Table.from_pandas(frame)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), _METADATA_KEY: metadata})
+            pq.write_table(table, self._persist_path(key))
+        except Exception as e:
+            logger.warning(f"Could not persist dashboard cache entry: {e}")
+
+    def _load_persisted(self):
+        """Warm the cache from Parquet files left by a previous process"""
+        import pyarrow.parquet as pq
+
+        for filename in os.listdir(self.persist_dir):
+            if not filename.endswith('.parquet'):
+                continue
+            path = os.path.join(self.persist_dir, filename)
+            try:
+                table = pq.read_table(path)
+                metadata = json.loads(table.schema.metadata[_METADATA_KEY])
+                if self.clock() - metadata['created_at'] > self.ttl:
+                    os.remove(path)
+                    continue
+                value = table.to_pandas()
+                if metadata['series']:
+                    value = value.iloc[:, 0]
+                size = estimate_size(value)
+                self._entries[metadata['key']] = (_PersistedVersion(metadata['version']), metadata['created_at'], value, size)
+                self._bytes += size
+            except Exception as e:
+                logger.warning(f"Skipping unreadable dashboard cache file {filename}: {e}")
+
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+
+
+class _PersistedVersion:
+    """Version loaded from disk; equal to any live version with the same repr"""
+
+    def __init__(self, version_repr):
+        self.version_repr = version_repr
+
+    def __eq__(self, other):
+        return repr(other) == self.version_repr or (
+            isinstance(other, _PersistedVersion) and other.version_repr == self.version_repr
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.version_repr)
@@ -0,0 +1,174 @@
+"""
+Aggregation queries for the specialist dashboard.
+Metrics, sentiment split, timeline and top emotions are read from the daily
+rollups (src/models/rollups.py), so their cost follows the number of days and
+users in range, not the number of analyses. Only the records table reads
+analysis_results, one page at a time. Encrypted original_text is never
+fetched for charts or the records table; the detail view decrypts a single
+row on demand.
+"""
+
+import json
+from datetime import timedelta
+
+import pandas as pd
+import sqlalchemy as sa
+
+RECORD_COLUMNS = ['id', 'created_at', 'sentiment', 'confidence_score', 'emotions', 'skills', 'distortions']
+
+
+def build_filters(start_date, end_date, user_id=None, sentiment=None):
+    """Normalize sidebar selections into a hashable filter tuple"""
+    return (start_date, end_date, user_id, sentiment)
+
+
+def data_version(engine):
+    """
+    Cheap fingerprint of the data used for cache invalidation.
+    A single primary-key read of the data_version counter, which every
+    analysis insert or delete, user insert or delete, retention batch and
+    rollup rebuild advances (src/models/rollups.py).
+    """
+    with engine.connect() as conn:
+        return conn.execute(sa.text("SELECT version FROM data_version WHERE id = 1")).scalar() or 0
+
+
+def fetch_users(engine):
+    """Users for the sidebar filter"""
+    with engine.connect() as conn:
+        return pd.read_sql(sa.text("SELECT id, username FROM users ORDER BY id"), conn)
+
+
+def _where_clause(filters):
+    """
+    Build WHERE clause and params for a filter tuple.
+    Uses a half-open created_at range so the created_at index can be used.
+    """
+    start_date, end_date, user_id, sentiment = filters
+    conditions = ["created_at >= :start_ts", "created_at < :end_ts"]
+    params = {
+        'start_ts': str(start_date),
+        'end_ts': str(end_date + timedelta(days=1))
+    }
+    if user_id is not None:
+        conditions.append("user_id = :user_id")
+        params['user_id'] = user_id
+    if sentiment is not None:
+        conditions.append("sentiment = :sentiment")
+        params['sentiment'] = sentiment
+    return " AND ".join(conditions), params
+
+
+def _rollup_filters(filters):
+    """Map a filter tuple onto the daily rollup key (inclusive day range)"""
+    start_date, end_date, user_id, sentiment = filters
+    return {'start_day': start_date, 'end_day': end_date, 'user_id': user_id, 'sentiment': sentiment}
+
+
+def sentiment_summary(engine, filters):
+    """
+    Per-sentiment counts and sums from daily_rollups.
+
+    Returns:
+        DataFrame with sentiment, count, confidence_sum, text_length_sum, text_length_count
+    """
+    from sqlalchemy.orm import Session
+    from src.models.analytics import rollup_sentiment_sums
+
+    with Session(engine) as session:
+        rows = rollup_sentiment_sums(session, **_rollup_filters(filters))
+    return pd.DataFrame(rows, columns=['sentiment', 'count', 'confidence_sum', 'text_length_sum', 'text_length_count'])
+
+
+def overview_metrics(summary):
+    """Derive overview metrics from the sentiment summary frame"""
+    total = int(summary['count'].sum())
+    if not total:
+        return {'total': 0, 'positive': 0, 'avg_confidence': 0.0, 'avg_text_length': 0.0}
+
+    positive = summary.loc[summary['sentiment'] == 'positive', 'count'].sum()
+    return {
+        'total': total,
+        'positive': int(positive),
+        'avg_confidence': float(summary['confidence_sum'].sum()) / total,
+        'avg_text_length': float(summary['text_length_sum'].fillna(0).sum()) / max(int(summary['text_length_count'].sum()), 1)
+    }
+
+
+def timeline(engine, filters):
+    """Requests per day from daily_rollups as a DataFrame with date and count"""
+    from sqlalchemy.orm import Session
+    from src.models.analytics import rollup_timeline
+
+    with Session(engine) as session:
+        rows = rollup_timeline(session, **_rollup_filters(filters))
+    return pd.DataFrame(rows, columns=['date', 'count'])
+
+
+def _load_json_list(value):
+    try:
+        data = json.loads(value) if value else []
+    except (TypeError, json.JSONDecodeError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def json_list_column(series):
+    """
+    Parse a JSON list column into a Series of Python lists.
+    Joins all values into one JSON document so the C parser runs once;
+    falls back to per-row parsing when a value is malformed.
+    """
+    try:
+        parsed = json.loads('[' + ','.join(series.fillna('[]').replace('', '[]')) + ']')
+        if all(isinstance(value, list) for value in parsed):
+            return pd.Series(parsed, index=series.index, dtype=object)
+    except (TypeError, ValueError):
+        pass
+    return series.map(_load_json_list)
+
+
+def emotion_counts(engine, filters, limit=10):
+    """Top emotions from daily_tag_rollups, as a Series of counts indexed by emotion"""
+    from sqlalchemy.orm import Session
+    from src.models.analytics import rollup_top_tags
+
+    with Session(engine) as session:
+        rows = rollup_top_tags('emotion', limit, session, **_rollup_filters(filters))
+    return pd.Series(dict(rows), dtype='int64')
+
+
+def fetch_records_page(engine, filters, page, page_size):
+    """One page of records for the table view, newest first, without the encrypted text"""
+    where, params = _where_clause(filters)
+    query = sa.text(f"""
+        SELECT {', '.join(RECORD_COLUMNS)}
+        FROM analysis_results
+        WHERE {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT :limit OFFSET :offset
+    """)
+    params.update({'limit': page_size, 'offset': max(page - 1, 0) * page_size})
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn, params=params, parse_dates=['created_at'])
+
+
+def format_json_columns(df, none_label, columns=('emotions', 'skills', 'distortions')):
+    """Render JSON list columns as comma-separated strings for display"""
+    for column in columns:
+        joined = json_list_column(df[column]).str.join(', ')
+        df[column] = joined.where(joined != '', none_label)
+    return df
+
+
+def fetch_record_detail(engine, record_id):
+    """
+    Load and decrypt a single analysis through the shared model layer.
+    Imported lazily: the models need ENCRYPTION_KEY, the charts do not.
+    """
+    from sqlalchemy.orm import Session
+    from src.models.sql_models import AnalysisResult
+
+    with Session(engine) as session:
+        record = session.get(AnalysisResult, record_id)
+        return record.to_dict() if record else None
@@ -0,0 +1,240 @@
+"""
+SQL aggregate queries over the normalized tag store, daily rollups and the
+usage ledger. All counting happens in the database - no JSON parsing in Python.
+"""
+
+from sqlalchemy import func, select
+
+from extensions import db
+from src.models.sql_models import (
+    AnalysisResult, AnalysisUsage, AnalysisUsageModel, DailyRollup, DailyTagRollup, Tag, analysis_tags
+)
+
+
+def _filter_analyses(stmt, start=None, end=None, user_id=None):
+    """Apply common date range and user filters to a statement joined with analyses"""
+    if start is not None:
+        stmt = stmt.where(AnalysisResult.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(AnalysisResult.created_at < end)
+    if user_id is not None:
+        stmt = stmt.where(AnalysisResult.user_id == user_id)
+    return stmt
+
+
+def tag_counts(kind, start=None, end=None, user_id=None, limit=None):
+    """
+    Count analyses per tag of the given kind.
+
+    Returns:
+        list of (tag name, analyses count) ordered by count descending
+    """
+    count = func.count(analysis_tags.c.analysis_id).label('count')
+    stmt = (
+        select(Tag.name, count)
+        .join(analysis_tags, analysis_tags.c.tag_id == Tag.id)
+        .join(AnalysisResult, AnalysisResult.id == analysis_tags.c.analysis_id)
+        .where(Tag.kind == kind)
+        .group_by(Tag.name)
+        .order_by(count.desc(), Tag.name)
+    )
+    stmt = _filter_analyses(stmt, start, end, user_id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return [(name, total) for name, total in db.session.execute(stmt)]
+
+
+def count_users_with_tag(kind, name, start=None, end=None):
+    """Count distinct users having at least one analysis with the given tag"""
+    stmt = (
+        select(func.count(func.distinct(AnalysisResult.user_id)))
+        .select_from(Tag)
+        .join(analysis_tags, analysis_tags.c.tag_id == Tag.id)
+        .join(AnalysisResult, AnalysisResult.id == analysis_tags.c.analysis_id)
+        .where(Tag.kind == kind, Tag.name == Tag.normalize(name))
+    )
+    stmt = _filter_analyses(stmt, start, end)
+    return db.session.execute(stmt).scalar() or 0
+
+
+def analyses_with_tag(kind, name, start=None, end=None, user_id=None):
+    """Query of AnalysisResult rows linked to the given tag"""
+    stmt = (
+        select(AnalysisResult)
+        .join(analysis_tags, analysis_tags.c.analysis_id == AnalysisResult.id)
+        .join(Tag, Tag.id == analysis_tags.c.tag_id)
+        .where(Tag.kind == kind, Tag.name == Tag.normalize(name))
+        .order_by(AnalysisResult.created_at.desc())
+    )
+    return _filter_analyses(stmt, start, end, user_id)
+
+
+def _filter_rollups(stmt, model, start_day=None, end_day=None, user_id=None, sentiment=None, language=None):
+    """Apply dashboard filters to a rollup statement (inclusive day range)"""
+    if start_day is not None:
+        stmt = stmt.where(model.day >= start_day)
+    if end_day is not None:
+        stmt = stmt.where(model.day <= end_day)
+    if user_id is not None:
+        stmt = stmt.where(model.user_id == user_id)
+    if sentiment is not None:
+        stmt = stmt.where(model.sentiment == sentiment)
+    if language is not None:
+        stmt = stmt.where(model.language == language)
+    return stmt
+
+
+def rollup_sentiment_sums(session=None, **filters):
+    """
+    Per-sentiment sums from daily rollups, largest count first.
+
+    Returns:
+        list of (sentiment, count, confidence_sum, text_length_sum, text_length_count)
+    """
+    count = func.sum(DailyRollup.analyses_count)
+    stmt = select(
+        DailyRollup.sentiment,
+        count,
+        func.sum(DailyRollup.confidence_sum),
+        func.sum(DailyRollup.text_length_sum),
+        func.sum(DailyRollup.text_length_count)
+    ).group_by(DailyRollup.sentiment).order_by(count.desc(), DailyRollup.sentiment)
+    stmt = _filter_rollups(stmt, DailyRollup, **filters)
+    return [
+        (sentiment, int(total or 0), confidence_sum or 0.0, int(length_sum or 0), int(length_count or 0))
+        for sentiment, total, confidence_sum, length_sum, length_count in (session or db.session).execute(stmt)
+    ]
+
+
+def rollup_summary(session=None, **filters):
+    """
+    Overview metrics from daily rollups.
+
+    Returns:
+        dict with total, per-sentiment counts, average confidence and average text length
+    """
+    rows = rollup_sentiment_sums(session, **filters)
+    by_sentiment = {sentiment: count for sentiment, count, _, _, _ in rows}
+    total = sum(by_sentiment.values())
+    length_count = sum(row[4] for row in rows)
+    return {
+        'total': total,
+        'by_sentiment': by_sentiment,
+        'avg_confidence': sum(row[2] for row in rows) / total if total else None,
+        'avg_text_length': sum(row[3] for row in rows) / length_count if length_count else None
+    }
+
+
+def rollup_timeline(session=None, **filters):
+    """Analyses per day from daily rollups, as (day, count) ordered by day"""
+    stmt = select(
+        DailyRollup.day, func.sum(DailyRollup.analyses_count)
+    ).group_by(DailyRollup.day).order_by(DailyRollup.day)
+    stmt = _filter_rollups(stmt, DailyRollup, **filters)
+    return [(day, int(count)) for day, count in (session or db.session).execute(stmt)]
+
+
+def rollup_top_tags(kind, limit=10, session=None, **filters):
+    """Most frequent tags of one kind from daily tag rollups"""
+    count = func.sum(DailyTagRollup.analyses_count).label('count')
+    stmt = (
+        select(DailyTagRollup.tag_name, count)
+        .where(DailyTagRollup.tag_kind == kind)
+        .group_by(DailyTagRollup.tag_name)
+        .order_by(count.desc(), DailyTagRollup.tag_name)
+        .limit(limit)
+    )
+    stmt = _filter_rollups(stmt, DailyTagRollup, **filters)
+    return [(name, int(total)) for name, total in (session or db.session).execute(stmt)]
+
+
+# Grouping keys of the usage aggregates
+USAGE_KEYS = {
+    'language': AnalysisResult.language,
+    'prompt_version': AnalysisUsage.prompt_version,
+}
+
+
+def _filter_usage(stmt, start=None, end=None):
+    """Join usage rows with their analyses and apply the date range"""
+    return _filter_analyses(stmt.join(AnalysisResult, AnalysisResult.id == AnalysisUsage.analysis_id), start, end)
+
+
+def usage_totals(by='language', start=None, end=None, session=None):
+    """
+    Upstream usage per language (or prompt version) from the usage ledger.
+
+    Returns:
+        dict key -> analyses, calls, token sums, analyzed characters and tokens per character
+    """
+    key = USAGE_KEYS[by]
+    stmt = _filter_usage(select(
+        key,
+        func.count(AnalysisUsage.analysis_id),
+        func.sum(AnalysisUsage.calls),
+        func.sum(AnalysisUsage.prompt_tokens),
+        func.sum(AnalysisUsage.completion_tokens),
+        func.sum(AnalysisResult.text_length)
+    ).select_from(AnalysisUsage), start, end).group_by(key)
+
+    totals = {}
+    for value, analyses, calls, prompt_tokens, completion_tokens, chars in (session or db.session).execute(stmt):
+        prompt_tokens, completion_tokens, chars = int(prompt_tokens or 0), int(completion_tokens or 0), int(chars or 0)
+        totals[value] = {
+            'analyses': int(analyses),
+            'calls': int(calls or 0),
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'chars': chars,
+            'tokens_per_char': (prompt_tokens + completion_tokens) / chars if chars else None
+        }
+    return totals
+
+
+def usage_percentiles(column, fractions=(0.5, 0.99), by='language', start=None, end=None, session=None):
+    """
+    Percentiles of a usage ledger column ('total_ms', 'upstream_ms', ...) per language (or prompt version).
+
+    Each value is read with ORDER BY ... OFFSET in the database, so no rows are loaded.
+
+    Returns:
+        dict key -> {fraction: value}
+    """
+    session = session or db.session
+    key = USAGE_KEYS[by]
+    values = getattr(AnalysisUsage, column)
+    counts = session.execute(_filter_usage(
+        select(key, func.count(AnalysisUsage.analysis_id)).select_from(AnalysisUsage), start, end
+    ).group_by(key)).all()
+
+    percentiles = {}
+    for value, count in counts:
+        ordered = _filter_usage(select(values).select_from(AnalysisUsage), start, end).where(key == value).order_by(values)
+        percentiles[value] = {
+            fraction: session.execute(ordered.offset(min(count - 1, int(count * fraction))).limit(1)).scalar()
+            for fraction in fractions
+        }
+    return percentiles
+
+
+def usage_by_day(start=None, end=None, session=None):
+    """
+    Calls and tokens per day and model from the per-model split of the ledger.
+
+    Returns:
+        list of (day, model_uri, calls, prompt tokens, completion tokens)
+    """
+    day = func.date(AnalysisResult.created_at)
+    stmt = _filter_analyses(select(
+        day,
+        AnalysisUsageModel.model_uri,
+        func.sum(AnalysisUsageModel.calls),
+        func.sum(AnalysisUsageModel.prompt_tokens),
+        func.sum(AnalysisUsageModel.completion_tokens)
+    ).select_from(AnalysisUsageModel).join(AnalysisResult, AnalysisResult.id == AnalysisUsageModel.analysis_id),
+        start, end
+    ).group_by(day, AnalysisUsageModel.model_uri).order_by(day, AnalysisUsageModel.model_uri)
+    return [
+        (str(row_day), model_uri, int(calls or 0), int(prompt_tokens or 0), int(completion_tokens or 0))
+        for row_day, model_uri, calls, prompt_tokens, completion_tokens in (session or db.session).execute(stmt)
+    ]
@@ -0,0 +1,171 @@
+"""
+SQLite production profile.
+
+For file-backed SQLite (small deployments) every connection gets WAL
+journaling, a busy timeout, synchronous=NORMAL and memory-mapped reads.
+Writes and reads use separate engines:
+- the write engine (db.engine) starts every transaction with BEGIN IMMEDIATE,
+  so a read-then-write transaction waits for the write lock up front instead
+  of failing with "database is locked" when it upgrades
+- the read engine (bind 'read') is query-only and uses deferred
+  transactions, so under WAL readers never block writers or each other
+A db.session transaction therefore holds the write lock from its first
+statement, so db.session is only for transactions that write. Lookups that
+precede slow work (password hashing, upstream calls) go through
+read_session() / read_engine(), and the write transaction starts after it.
+
+Under gevent workers (gunicorn.conf.py) a sqlite3 call blocks the whole
+event loop. Statements take milliseconds, but waiting for the write lock
+in sqlite's busy handler can take up to SQLITE_BUSY_TIMEOUT_MS, and every
+request of the worker would stall with it. Once gevent has patched time,
+write connections therefore get busy_timeout=0, and BEGIN IMMEDIATE polls
+the lock every SQLITE_LOCK_POLL_MS with time.sleep(), which switches to
+other greenlets, until the same timeout. The remaining blocking is one
+statement at a time; long writes (big batches, VACUUM) belong in the CLI.
+
+Other databases are left untouched; read_engine() is then just db.engine.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+READ_BIND = 'read'
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', '256'))
+# Connections kept per process; each gunicorn worker has its own pool
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '5'))
+SQLITE_MAX_OVERFLOW = int(os.getenv('SQLITE_MAX_OVERFLOW', '10'))
+SQLITE_LOCK_POLL_MS = int(os.getenv('SQLITE_LOCK_POLL_MS', '5'))
+
+
+def sqlite_pragmas(read_only=False):
+    """PRAGMA statements applied to every new connection"""
+    pragmas = {
+        'journal_mode': 'WAL',
+        'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+        'synchronous': 'NORMAL',
+        'mmap_size': SQLITE_MMAP_MB * 1024 * 1024,
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+    }
+    if read_only:
+        pragmas['query_only'] = 'ON'
+    return pragmas
+
+
+def is_sqlite_file(uri):
+    """True for an on-disk SQLite URI (not in-memory)"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_profile_enabled(uri):
+    return os.getenv('SQLITE_PROFILE', '1') == '1' and is_sqlite_file(uri)
+
+
+def sqlite_engine_options():
+    """create_engine() keyword arguments for a multi-process SQLite deployment"""
+    return {
+        'pool_size': SQLITE_POOL_SIZE,
+        'max_overflow': SQLITE_MAX_OVERFLOW,
+        # A worker waits for a pooled connection no longer than for the write lock
+        'pool_timeout': max(SQLITE_BUSY_TIMEOUT_MS / 1000, 1),
+        'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000, 'check_same_thread': False},
+    }
+
+
+def gevent_patched():
+    """True once gevent has monkey-patched time.sleep (gevent workers)"""
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('time'))
+
+
+def begin_cooperatively(connection, statement):
+    """Wait for the write lock with time.sleep() instead of sqlite's busy handler"""
+    dbapi_connection = connection.connection.dbapi_connection
+    deadline = time.monotonic() + SQLITE_BUSY_TIMEOUT_MS / 1000
+    while time.monotonic() < deadline:
+        try:
+            dbapi_connection.execute(statement)
+            return
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+        time.sleep(SQLITE_LOCK_POLL_MS / 1000)
+    # Last attempt through SQLAlchemy, so a timeout raises its usual OperationalError
+    connection.exec_driver_sql(statement)
+
+
+def install_sqlite_profile(engine, read_only=False):
+    """Apply pragmas on connect and take over transaction begin from pysqlite"""
+    pragmas = sqlite_pragmas(read_only)
+    begin_statement = 'BEGIN' if read_only else 'BEGIN IMMEDIATE'
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        # Autocommit at the driver level; SQLAlchemy emits BEGIN itself below
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        if not read_only and gevent_patched():
+            cursor.execute('PRAGMA busy_timeout=0')
+            connection_record.info['cooperative_lock'] = True
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        if connection.connection.info.get('cooperative_lock'):
+            begin_cooperatively(connection, begin_statement)
+        else:
+            connection.exec_driver_sql(begin_statement)
+
+    return engine
+
+
+def configure_database(app):
+    """Engine options and the read bind; call before db.init_app(app)"""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not sqlite_profile_enabled(uri):
+        return False
+
+    options = dict(sqlite_engine_options(), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds.setdefault(READ_BIND, dict(options, url=uri))
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['sqlite_profile'] = True
+    return True
+
+
+def install_database_profile(app):
+    """Attach the SQLite listeners to the app's engines; call after db.init_app(app)"""
+    if not app.extensions.get('sqlite_profile'):
+        return
+    from extensions import db
+
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            install_sqlite_profile(engine, read_only=bind_key == READ_BIND)
+
+
+def read_engine():
+    """Engine for read-only work (exports, statistics, lookups)"""
+    from extensions import db
+
+    return db.engines.get(READ_BIND) or db.engine
+
+
+@contextmanager
+def read_session():
+    """Short-lived ORM session on the read engine"""
+    with Session(read_engine()) as session:
+        yield session
@@ -0,0 +1,156 @@
+"""
+Set-based deletion of analyses: account deletion and the retention purge.
+
+Neither path loads AnalysisResult objects. Ids are selected
+PURGE_BATCH_SIZE at a time and removed, with their tag links and usage
+ledger rows, by DELETE ... WHERE id IN (...). Each batch is one short
+transaction, with PURGE_PAUSE seconds in between, so a purge of millions
+of rows neither holds the write lock for long nor grows the session.
+Bulk deletes bypass the flush hooks of src/models/rollups.py, so the
+rollups are cleaned up, and data_version bumped, here:
+- account deletion: the user's rollups, idempotency keys (which hold
+  stored analysis responses) and therapist/client links are deleted by
+  user_id, and the user row goes last. All of this runs in the same
+  transaction as the check that no analyses are left. Nothing relies on
+  ON DELETE CASCADE: SQLite enforces it only with foreign_keys=ON (the
+  SQLite profile), and databases created before the CASCADE clauses were
+  declared lack them
+- retention: the cutoff is aligned to a UTC day, and the rollup buckets of
+  the purged days are dropped, so dashboards agree with the stored rows
+  (as after rebuild-rollups)
+
+DELETE /api/auth/account must answer within the worker timeout, so the
+account is first marked deleted (deleted_at set, API key revoked, login
+refused) in its own transaction, and the request then deletes for at most
+ACCOUNT_DELETE_BUDGET seconds. Whatever is left is finished by
+purge_deleted_accounts() (flask purge-deleted-accounts, run from cron); a
+crash midway only leaves a marked account for that command to finish.
+
+Stale ids left in the per-process near-duplicate indexes are harmless:
+dedup.is_reusable() re-checks every hit against the stored row.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select, update
+
+from extensions import db
+from src.models.rollups import bump_data_version
+from src.models.sql_models import (
+    AnalysisResult, AnalysisUsage, AnalysisUsageModel, DailyRollup, DailyTagRollup, IdempotencyKey, User, analysis_tags,
+    therapist_clients
+)
+
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '0'))  # 0 keeps analyses forever
+PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', '1000'))
+PURGE_PAUSE = float(os.getenv('PURGE_PAUSE', '0.05'))
+# Seconds DELETE /api/auth/account spends deleting before leaving the rest to the CLI
+ACCOUNT_DELETE_BUDGET = float(os.getenv('ACCOUNT_DELETE_BUDGET', '10'))
+
+
+def _delete_in_batches(condition, batch_size=None, pause=None, finish=None, progress=None, budget=None):
+    """
+    Delete analyses matching condition batch by batch; finish() runs with the last (empty) check.
+
+    Returns (analyses removed, finished). With a budget in seconds, stops after
+    the batch that exhausts it and returns finished=False without calling finish().
+    """
+    batch_size = batch_size or PURGE_BATCH_SIZE
+    pause = PURGE_PAUSE if pause is None else pause
+    deadline = time.monotonic() + budget if budget is not None else None
+    analyses = AnalysisResult.__table__
+    usage = AnalysisUsage.__table__
+    usage_models = AnalysisUsageModel.__table__
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            select(analyses.c.id).where(condition).order_by(analyses.c.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            if finish is not None:
+                finish()
+                bump_data_version(db.session.connection())
+            db.session.commit()
+            return deleted, True
+
+        db.session.execute(delete(analysis_tags).where(analysis_tags.c.analysis_id.in_(ids)))
+        db.session.execute(delete(usage_models).where(usage_models.c.analysis_id.in_(ids)))
+        db.session.execute(delete(usage).where(usage.c.analysis_id.in_(ids)))
+        db.session.execute(delete(analyses).where(analyses.c.id.in_(ids)))
+        bump_data_version(db.session.connection())
+        db.session.commit()
+        deleted += len(ids)
+        if progress is not None:
+            progress(deleted)
+        if deadline is not None and time.monotonic() >= deadline:
+            return deleted, False
+        if len(ids) == batch_size and pause:
+            time.sleep(pause)
+
+
+def mark_account_deleted(user_id):
+    """Disable an account ahead of the purge: login is refused and the API key revoked"""
+    users = User.__table__
+    db.session.execute(update(users).where(users.c.id == user_id).values(
+        deleted_at=datetime.now(timezone.utc).replace(tzinfo=None), api_key=None
+    ))
+    db.session.commit()
+
+
+def delete_account(user_id, batch_size=None, pause=None, progress=None, budget=None):
+    """
+    Delete a user with all their data.
+
+    Returns (analyses removed, finished); see _delete_in_batches for the budget.
+    """
+    def delete_user():
+        for table in (DailyTagRollup.__table__, DailyRollup.__table__, IdempotencyKey.__table__):
+            db.session.execute(delete(table).where(table.c.user_id == user_id))
+        db.session.execute(delete(therapist_clients).where(
+            (therapist_clients.c.therapist_id == user_id) | (therapist_clients.c.client_id == user_id)
+        ))
+        users = User.__table__
+        db.session.execute(delete(users).where(users.c.id == user_id))
+
+    return _delete_in_batches(AnalysisResult.__table__.c.user_id == user_id,
+                              batch_size, pause, finish=delete_user, progress=progress, budget=budget)
+
+
+def purge_deleted_accounts(batch_size=None, pause=None, progress=None):
+    """Finish every account marked deleted; returns (accounts removed, analyses removed)"""
+    user_ids = db.session.execute(
+        select(User.id).where(User.deleted_at.is_not(None)).order_by(User.id)
+    ).scalars().all()
+    db.session.commit()
+    deleted = 0
+    for user_id in user_ids:
+        removed, _ = delete_account(user_id, batch_size, pause, progress)
+        deleted += removed
+    return len(user_ids), deleted
+
+
+def retention_cutoff(days, now=None):
+    """Start of the UTC day `days` days ago (naive UTC, like created_at)"""
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    return datetime.combine((now - timedelta(days=days)).date(), datetime.min.time())
+
+
+def purge_old_analyses(days=None, now=None, batch_size=None, pause=None, progress=None):
+    """Delete analyses (and their rollup buckets) older than the retention period
+
+    Returns (analyses removed, cutoff); nothing is removed while retention is off.
+    """
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return 0, None
+    cutoff = retention_cutoff(days, now)
+
+    def drop_rollups():
+        for table in (DailyTagRollup.__table__, DailyRollup.__table__):
+            db.session.execute(delete(table).where(table.c.day < cutoff.date()))
+
+    deleted, _ = _delete_in_batches(AnalysisResult.__table__.c.created_at < cutoff,
+                                    batch_size, pause, finish=drop_rollups, progress=progress)
+    return deleted, cutoff
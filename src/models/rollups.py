@@ -0,0 +1,193 @@
+"""
+Incremental maintenance of daily analytics rollups.
+Every flush that inserts or deletes AnalysisResult rows applies +1/-1 deltas
+to daily_rollups and daily_tag_rollups in the same transaction. Alongside the
+count, daily_rollups carries confidence and text length sums so the dashboard
+overview never reads analysis_results.
+
+The same flush (and any insert or delete of a user) bumps the single
+data_version row. Bulk paths that bypass the hooks (src/models/retention.py,
+rebuild_rollups) bump it themselves, so the dashboard can tell that data
+changed, deletions included, from one primary-key read.
+"""
+
+from collections import defaultdict
+from itertools import chain
+
+from sqlalchemy import and_, delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from src.models.sql_models import (
+    AnalysisResult, DailyRollup, DailyTagRollup, DataVersion, Tag, User, analysis_tags, parse_tag_list
+)
+
+ROLLUP_KEY = ('day', 'user_id', 'language', 'sentiment')
+TAG_ROLLUP_KEY = ROLLUP_KEY + ('tag_kind', 'tag_name')
+ROLLUP_SUMS = ('analyses_count', 'confidence_sum', 'text_length_sum', 'text_length_count')
+
+_PENDING_DELETES = 'rollup_pending_deletes'
+
+
+def _rollup_key(record):
+    created_at = record.created_at
+    return (created_at.date(), record.user_id, record.language, record.sentiment)
+
+
+def _record_tags(record):
+    """Distinct (kind, name) pairs of a record, normalized like the tag store"""
+    tags = set()
+    for kind, column in (('emotion', record.emotions), ('skill', record.skills), ('distortion', record.distortions)):
+        for name in parse_tag_list(column):
+            tag_name = Tag.normalize(name)
+            if tag_name:
+                tags.add((kind, tag_name))
+    return tags
+
+
+def _record_sums(record):
+    """Per-record contribution to the ROLLUP_SUMS columns"""
+    text_length = record.text_length
+    return (1, record.confidence_score or 0.0, text_length or 0, int(text_length is not None))
+
+
+def _add_sums(delta, sums, sign):
+    for index, value in enumerate(sums):
+        delta[index] += sign * value
+
+
+def _collect_deltas(records, sign, deltas, tag_deltas):
+    for record in records:
+        key = _rollup_key(record)
+        _add_sums(deltas[key], _record_sums(record), sign)
+        for tag in _record_tags(record):
+            tag_deltas[key + tag] += sign
+
+
+def _upsert(connection, table, key_columns, values, increments):
+    """Add increments to a rollup row, creating it if missing"""
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: table.c[name] + stmt.excluded[name] for name in increments}
+        )
+        connection.execute(stmt)
+        return
+
+    key_filter = and_(*(table.c[name] == values[name] for name in key_columns))
+    result = connection.execute(
+        update(table).where(key_filter).values(
+            **{name: table.c[name] + values[name] for name in increments}
+        )
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**values))
+
+
+def bump_data_version(connection):
+    """Advance the change counter read by the dashboard cache"""
+    _upsert(connection, DataVersion.__table__, ('id',), {'id': 1, 'version': 1}, ('version',))
+
+
+def apply_deltas(connection, deltas, tag_deltas):
+    """Apply aggregated count/confidence/text length deltas to the rollup tables"""
+    rollups = DailyRollup.__table__
+    tag_rollups = DailyTagRollup.__table__
+
+    for key, sums in deltas.items():
+        count = sums[0]
+        if count == 0:
+            continue
+        values = dict(zip(ROLLUP_KEY, key), **dict(zip(ROLLUP_SUMS, sums)))
+        _upsert(connection, rollups, ROLLUP_KEY, values, ROLLUP_SUMS)
+        if count < 0:
+            _drop_if_empty(connection, rollups, ROLLUP_KEY, key)
+
+    for key, count in tag_deltas.items():
+        if count == 0:
+            continue
+        values = dict(zip(TAG_ROLLUP_KEY, key), analyses_count=count)
+        _upsert(connection, tag_rollups, TAG_ROLLUP_KEY, values, ('analyses_count',))
+        if count < 0:
+            _drop_if_empty(connection, tag_rollups, TAG_ROLLUP_KEY, key)
+
+
+def _drop_if_empty(connection, table, key_columns, key):
+    """Remove a bucket emptied by deletions"""
+    key_filter = and_(*(table.c[name] == value for name, value in zip(key_columns, key)))
+    connection.execute(delete(table).where(key_filter, table.c.analyses_count <= 0))
+
+
+@event.listens_for(Session, 'before_flush')
+def _capture_deleted_analyses(session, flush_context, instances):
+    """Read deleted rows before the flush removes them"""
+    deleted = [obj for obj in session.deleted if isinstance(obj, AnalysisResult)]
+    if deleted:
+        session.info.setdefault(_PENDING_DELETES, []).extend(
+            (_rollup_key(record), _record_tags(record), _record_sums(record))
+            for record in deleted
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_rollups(session, flush_context):
+    """Apply rollup deltas for inserted and deleted analyses"""
+    deltas = defaultdict(lambda: [0, 0.0, 0, 0])
+    tag_deltas = defaultdict(int)
+
+    inserted = [obj for obj in session.new if isinstance(obj, AnalysisResult)]
+    _collect_deltas(inserted, 1, deltas, tag_deltas)
+
+    for key, tags, sums in session.info.pop(_PENDING_DELETES, []):
+        _add_sums(deltas[key], sums, -1)
+        for tag in tags:
+            tag_deltas[key + tag] -= 1
+
+    if deltas or tag_deltas:
+        apply_deltas(session.connection(), deltas, tag_deltas)
+    if deltas or tag_deltas or any(isinstance(obj, User) for obj in chain(session.new, session.deleted)):
+        bump_data_version(session.connection())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_deletes(session):
+    session.info.pop(_PENDING_DELETES, None)
+
+
+def rebuild_rollups(connection):
+    """Recompute both rollup tables from scratch with set-based INSERT ... SELECT"""
+    rollups = DailyRollup.__table__
+    tag_rollups = DailyTagRollup.__table__
+    analyses = AnalysisResult.__table__
+    tags = Tag.__table__
+    day = func.date(analyses.c.created_at)
+
+    connection.execute(delete(tag_rollups))
+    connection.execute(delete(rollups))
+    bump_data_version(connection)
+
+    connection.execute(rollups.insert().from_select(
+        list(ROLLUP_KEY + ROLLUP_SUMS),
+        select(
+            day, analyses.c.user_id, analyses.c.language, analyses.c.sentiment,
+            func.count(analyses.c.id), func.sum(analyses.c.confidence_score),
+            func.coalesce(func.sum(analyses.c.text_length), 0), func.count(analyses.c.text_length)
+        ).group_by(day, analyses.c.user_id, analyses.c.language, analyses.c.sentiment)
+    ))
+
+    connection.execute(tag_rollups.insert().from_select(
+        list(TAG_ROLLUP_KEY) + ['analyses_count'],
+        select(
+            day, analyses.c.user_id, analyses.c.language, analyses.c.sentiment,
+            tags.c.kind, tags.c.name, func.count(analyses.c.id)
+        ).select_from(analyses)
+        .join(analysis_tags, analysis_tags.c.analysis_id == analyses.c.id)
+        .join(tags, tags.c.id == analysis_tags.c.tag_id)
+        .group_by(day, analyses.c.user_id, analyses.c.language, analyses.c.sentiment,
+                  tags.c.kind, tags.c.name)
+    ))
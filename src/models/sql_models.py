@@ -1,40 +1,60 @@
+import json
 import os
 import secrets
 from datetime import datetime, timezone
 from cryptography.fernet import Fernet
 
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
 
 from extensions import db
+from src.auth.hashing import password_hasher
 
-# ADD: Encryption key (use from .env in production!)
-ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
-if not ENCRYPTION_KEY:
-    raise ValueError("ENCRYPTION_KEY environment variable is required")
+_cipher_suite = None
 
-cipher_suite = Fernet(ENCRYPTION_KEY)
+def get_cipher():
+    """Fernet cipher, built on first use from ENCRYPTION_KEY (use from .env in production!)"""
+    global _cipher_suite
+    if _cipher_suite is None:
+        encryption_key = os.getenv('ENCRYPTION_KEY')
+        if not encryption_key:
+            raise ValueError("ENCRYPTION_KEY environment variable is required")
+        _cipher_suite = Fernet(encryption_key)
+    return _cipher_suite
+
+def decrypt_text(token):
+    """Decrypt a stored text token, tolerating corrupted values"""
+    if not token:
+        return None
+    cipher_suite = get_cipher()
+    try:
+        return cipher_suite.decrypt(token).decode('utf-8')
+    except Exception:
+        return "[Decryption Error]"
+
+def decrypt_texts(tokens):
+    """Decrypt a batch of stored text tokens"""
+    return [decrypt_text(token) for token in tokens]
 
 # ADD: Mixin for text encryption
 class EncryptedTextMixin:
     _original_text = db.Column('original_text', db.LargeBinary)
+    # Plaintext length, stored so metrics never need to decrypt
+    text_length = db.Column(db.Integer)
     
     @property
     def original_text(self):
         """Decrypt text when accessing property"""
-        if self._original_text:
-            try:
-                return cipher_suite.decrypt(self._original_text).decode('utf-8')
-            except Exception:
-                return "[Decryption Error]"
-        return None
+        return decrypt_text(self._original_text)
 
     @original_text.setter
     def original_text(self, value):
         """Encrypt text before saving to database"""
         if value:
-            self._original_text = cipher_suite.encrypt(value.encode('utf-8'))
+            self._original_text = get_cipher().encrypt(value.encode('utf-8'))
+            self.text_length = len(value)
         else:
             self._original_text = None
+            self.text_length = 0
 
 # ADD: User model for authentication
 class User(db.Model):
@@ -47,17 +67,25 @@ class User(db.Model):
     api_key = db.Column(db.String(100), unique=True, default=lambda: secrets.token_urlsafe(32))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_therapist = db.Column(db.Boolean, default=False)
+    # Set by DELETE /api/auth/account; the data is purged in batches after (src/models/retention.py)
+    deleted_at = db.Column(db.DateTime)
+    
+    # ADD: Relationship with analyses (one-to-many); deleting a user leaves the
+    # analyses to the database (ON DELETE CASCADE) instead of loading them all
+    analyses = db.relationship('AnalysisResult', backref='user', lazy=True, cascade='all, delete-orphan',
+                               passive_deletes=True)
     
-    # ADD: Relationship with analyses (one-to-many)
-    analyses = db.relationship('AnalysisResult', backref='user', lazy=True, cascade='all, delete-orphan')
+    def set_password(self, password, client_key=None):
+        """Hash password before saving (in the hashing process pool)"""
+        self.password_hash = password_hasher.hash(password, client_key=client_key)
     
-    def set_password(self, password):
-        """Hash password before saving"""
-        self.password_hash = generate_password_hash(password)
+    def check_password(self, password, client_key=None):
+        """Check password against hash (in the hashing process pool)"""
+        return password_hasher.verify(self.password_hash, password, client_key=client_key)
     
-    def check_password(self, password):
-        """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
+    def password_needs_rehash(self):
+        """True if the stored hash predates the configured hash parameters"""
+        return password_hasher.needs_rehash(self.password_hash)
     
     def to_dict(self):
         """Return user data as dictionary"""
@@ -70,35 +98,247 @@ class User(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# ADD: Explicit therapist -> client links; cohort export is limited to them
+therapist_clients = db.Table(
+    'therapist_clients',
+    db.Column('therapist_id', db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('client_id', db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_therapist_clients_client_id', 'client_id')
+)
+
+# ADD: Normalized tag store for emotions, skills and distortions
+TAG_KINDS = ('emotion', 'skill', 'distortion')
+
+analysis_tags = db.Table(
+    'analysis_tags',
+    db.Column('analysis_id', db.Integer, db.ForeignKey('analysis_results.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    # Tag-first index serves "which analyses have tag X" lookups and counts
+    db.Index('ix_analysis_tags_tag_id_analysis_id', 'tag_id', 'analysis_id')
+)
+
+def parse_tag_list(json_str):
+    """Parse a JSON tag column, tolerating broken values"""
+    try:
+        data = json.loads(json_str) if json_str else []
+    except (TypeError, json.JSONDecodeError):
+        return []
+    return data if isinstance(data, list) else []
+
+class Tag(db.Model):
+    __tablename__ = 'tags'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'name', name='uq_tags_kind_name'),
+    )
+
+    def __repr__(self):
+        return f'<Tag {self.kind}:{self.name}>'
+
+    @staticmethod
+    def normalize(name):
+        """Normalize tag name: collapse whitespace and lowercase"""
+        return ' '.join(str(name).split()).lower()[:100]
+
+    @classmethod
+    def get_or_create_many(cls, kind, names, cache=None):
+        """Resolve tag names of one kind to Tag rows, creating missing ones"""
+        if kind not in TAG_KINDS:
+            raise ValueError(f"Unknown tag kind: {kind}")
+
+        normalized = []
+        for name in names:
+            tag_name = cls.normalize(name)
+            if tag_name and tag_name not in normalized:
+                normalized.append(tag_name)
+
+        cache = cache if cache is not None else {}
+        missing = [name for name in normalized if (kind, name) not in cache]
+        if missing:
+            for tag in cls.query.filter(cls.kind == kind, cls.name.in_(missing)):
+                cache[(kind, tag.name)] = tag
+
+        for name in normalized:
+            if (kind, name) in cache:
+                continue
+            # Another worker may insert the same tag concurrently
+            try:
+                with db.session.begin_nested():
+                    tag = cls(kind=kind, name=name)
+                    db.session.add(tag)
+            except IntegrityError:
+                tag = cls.query.filter_by(kind=kind, name=name).one()
+            cache[(kind, name)] = tag
+
+        return [cache[(kind, name)] for name in normalized]
+
 class AnalysisResult(db.Model, EncryptedTextMixin):  # ADD: Inherit encryption mixin
     __tablename__ = 'analysis_results'
     
     id = db.Column(db.Integer, primary_key=True)
        # ADD: Relationship with user
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     language = db.Column(db.String(2), nullable=False)
     sentiment = db.Column(db.String(20), nullable=False)
     confidence_score = db.Column(db.Float, nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     emotions = db.Column(db.Text, default='[]')
     skills = db.Column(db.Text, default='[]')
     distortions = db.Column(db.Text, default='[]')
+    # MinHash of the text for near-duplicate reuse (src/api/dedup.py); no decryption needed
+    text_signature = db.Column(db.LargeBinary)
+
+    # ADD: Normalized tags, written alongside the JSON columns
+    tags = db.relationship('Tag', secondary=analysis_tags, lazy=True)
+    # Upstream tokens and latency of LLM analyses (src/api/usage.py)
+    usage = db.relationship('AnalysisUsage', uselist=False, lazy=True, cascade='all, delete-orphan',
+                            passive_deletes=True)
 
     def __repr__(self):
         return f'<AnalysisResult {self.id}: {self.sentiment}>'
 
+    @classmethod
+    def from_response(cls, user_id, text, language, result_dict, tag_cache=None, text_signature=None):
+        """Build a record (with tags) from an AnalysisResponse dict"""
+        record = cls(
+            user_id=user_id,
+            original_text=text,
+            language=language,
+            text_signature=text_signature,
+            sentiment=result_dict['sentiment'],
+            confidence_score=result_dict['confidence_score'],
+            emotions=json.dumps(result_dict['entities']['emotions']),
+            skills=json.dumps(result_dict['entities']['skills']),
+            distortions=json.dumps(result_dict['distortions'])
+        )
+        record.set_tags(
+            emotions=result_dict['entities']['emotions'],
+            skills=result_dict['entities']['skills'],
+            distortions=result_dict['distortions'],
+            cache=tag_cache
+        )
+        return record
+
+    def set_tags(self, emotions=(), skills=(), distortions=(), cache=None):
+        """Replace linked tags with the given emotions, skills and distortions"""
+        tags = []
+        for kind, names in (('emotion', emotions), ('skill', skills), ('distortion', distortions)):
+            tags.extend(Tag.get_or_create_many(kind, names or [], cache=cache))
+        self.tags = tags
+
+    def to_response(self):
+        """AnalysisResponse-shaped dict of the stored result (without decrypting the text)"""
+        return {
+            'sentiment': self.sentiment,
+            'entities': {
+                'emotions': json.loads(self.emotions),
+                'skills': json.loads(self.skills)
+            },
+            'distortions': json.loads(self.distortions),
+            'confidence_score': self.confidence_score
+        }
+
     def to_dict(self):
-        import json
         return {
             'id': self.id,
             'original_text': self.original_text,
             'language': self.language,
             'sentiment': self.sentiment,
             'confidence_score': self.confidence_score,
+            'text_length': self.text_length,
             'emotions': json.loads(self.emotions),
             'skills': json.loads(self.skills),
             'distortions': json.loads(self.distortions),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             # ADD: User ID for convenience
             'user_id': self.user_id
-        }
\ No newline at end of file
+        }
+
+# ADD: Daily rollups, maintained incrementally by src/models/rollups.py
+class DailyRollup(db.Model):
+    __tablename__ = 'daily_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    language = db.Column(db.String(2), primary_key=True)
+    sentiment = db.Column(db.String(20), primary_key=True)
+    analyses_count = db.Column(db.Integer, nullable=False, default=0)
+    confidence_sum = db.Column(db.Float, nullable=False, default=0.0)
+    # Only rows with a known text_length contribute (see backfill-text-length)
+    text_length_sum = db.Column(db.Integer, nullable=False, default=0)
+    text_length_count = db.Column(db.Integer, nullable=False, default=0)
+
+# ADD: Single-row change counter bumped with every rollup change; the
+# dashboard polls it to invalidate its cache (src/dashboard/queries.py)
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyTagRollup(db.Model):
+    __tablename__ = 'daily_tag_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    language = db.Column(db.String(2), primary_key=True)
+    sentiment = db.Column(db.String(20), primary_key=True)
+    tag_kind = db.Column(db.String(20), primary_key=True)
+    tag_name = db.Column(db.String(100), primary_key=True)
+    analyses_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_daily_tag_rollups_kind_day', 'tag_kind', 'day'),
+    )
+
+# ADD: Idempotency-Key replays of /api/analyze (src/api/idempotency.py)
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    # Keyed hashes: neither the client's key nor the request text is stored
+    key_hash = db.Column(db.LargeBinary(16), primary_key=True)
+    request_hash = db.Column(db.LargeBinary(16), nullable=False)
+    status_code = db.Column(db.SmallInteger)  # NULL while the first request is in progress
+    response = db.Column(db.Text)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+# ADD: analyze-file progress, committed with each DB batch (src/batch/analyze_file.py)
+class BatchCheckpoint(db.Model):
+    __tablename__ = 'batch_checkpoints'
+
+    key = db.Column(db.String(512), primary_key=True)  # absolute path of the checkpoint file
+    state = db.Column(db.Text, nullable=False)  # Checkpoint.to_dict() as JSON
+
+# ADD: Token usage and latency ledger, one row per LLM analysis (src/api/usage.py)
+class AnalysisUsage(db.Model):
+    __tablename__ = 'analysis_usage'
+
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis_results.id', ondelete='CASCADE'), primary_key=True)
+    model_uri = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.String(40), nullable=False)
+    calls = db.Column(db.SmallInteger, nullable=False, default=1)
+    prompt_tokens = db.Column(db.Integer, nullable=False)
+    completion_tokens = db.Column(db.Integer, nullable=False)
+    upstream_ms = db.Column(db.Integer, nullable=False)  # summed over calls (chunks may overlap)
+    total_ms = db.Column(db.Integer, nullable=False)     # request start until the result is saved
+
+    # Calls and tokens per model: a cascade bills lite and full-model tokens at different prices
+    models = db.relationship('AnalysisUsageModel', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+class AnalysisUsageModel(db.Model):
+    __tablename__ = 'analysis_usage_models'
+
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analysis_usage.analysis_id', ondelete='CASCADE'),
+                            primary_key=True)
+    model_uri = db.Column(db.String(100), primary_key=True)
+    calls = db.Column(db.SmallInteger, nullable=False, default=1)
+    prompt_tokens = db.Column(db.Integer, nullable=False)
+    completion_tokens = db.Column(db.Integer, nullable=False)
+
+# Register incremental rollup maintenance on session flushes
+from src.models import rollups  # noqa: E402,F401
@@ -0,0 +1,85 @@
+"""
+Process warm-up for gunicorn (hooks in gunicorn.conf.py).
+
+preload() runs once in the master before workers are forked. It builds the
+immutable state (prompt texts, compiled pydantic validators, translations,
+fast-classifier lexicons, the few-shot index) and freezes the GC, so workers
+share those pages copy-on-write.
+
+warm_worker() runs in each worker before it accepts requests. It pays the
+per-process cold costs: the first DB connection of each engine (the
+write engine and the 'read' bind), the cipher and the TLS connection to
+YandexGPT. Every step is best-effort: a failure is logged and the worker
+boots anyway, paying that cost on its first request instead.
+"""
+
+import gc
+import logging
+import time
+
+from sqlalchemy import text
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+def _build_immutable_state():
+    """Import validators and read prompts; a no-op when already done"""
+    import src.api.models  # noqa: F401 - compiles pydantic validators
+    import src.api.routes  # noqa: F401 - translations and error handlers
+    from src.api import few_shot
+    from src.api.fast_classifier import preload as preload_lexicons
+    from src.api.yandex_gpt import preload_prompts
+
+    preload_lexicons()
+    count = preload_prompts()
+    if few_shot.FEW_SHOT_MODE == 'dynamic':
+        few_shot.preload()
+    return count
+
+
+def preload():
+    """Build shared immutable state in the master process"""
+    started = time.perf_counter()
+    prompt_count = _build_immutable_state()
+
+    # Objects allocated so far live for the whole process: move them out of
+    # GC tracking so collections in workers do not dirty the shared pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded {prompt_count} prompts, froze {gc.get_freeze_count()} objects "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+def warm_worker(app):
+    """Prime per-process resources before the worker serves its first request"""
+    started = time.perf_counter()
+    _build_immutable_state()
+
+    try:
+        with app.app_context():
+            # Never share pooled connections inherited from the master
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+            for engine in db.engines.values():
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT 1'))
+    except Exception as e:
+        logger.warning(f"Database warm-up failed: {e}")
+
+    from src.models.sql_models import get_cipher
+    from src.api.yandex_gpt import get_yandex_gpt_client
+
+    try:
+        get_cipher()
+    except Exception as e:
+        logger.warning(f"Cipher warm-up skipped: {e}")
+
+    try:
+        get_yandex_gpt_client().warm_up()
+    except Exception as e:
+        # Network/TLS errors included: warm-up must never kill the worker on boot
+        logger.warning(f"YandexGPT warm-up skipped: {e}")
+
+    logger.info(f"Worker warmed up in {(time.perf_counter() - started) * 1000:.0f}ms")
@@ -29,7 +29,9 @@ const translations = {
         'sessionExpired': 'Session expired. Please login again.',
         'fillAllFields': 'Please fill all fields',
         'fillUsernamePassword': 'Please fill username and password',
-        'validEmail': 'Please enter a valid email'
+        'validEmail': 'Please enter a valid email',
+        'serverBusy': 'The service is busy. Please try again in a minute.',
+        'retrying': 'The service is busy, retrying in {seconds} s...'
     },
     'ru': {
         'subtitle': 'Исследуйте свои эмоции и когнитивные паттерны',
@@ -56,6 +58,8 @@ const translations = {
         'authLoading': 'Обработка...',
         'networkError': 'Проблемы с соединением. Проверьте интернет.',
         'sessionExpired': 'Сессия истекла. Пожалуйста, войдите снова.',
+        'serverBusy': 'Сервис перегружен. Попробуйте через минуту.',
+        'retrying': 'Сервис перегружен, повтор через {seconds} с...',
         'fillAllFields': 'Пожалуйста, заполните все поля',
         'fillUsernamePassword': 'Пожалуйста, заполните имя пользователя и пароль',
         'validEmail': 'Пожалуйста, введите корректный email'
@@ -155,6 +159,26 @@ function setAuthButtonLoading(button, isLoading) {
     }
 }
 
+// 503 + Retry-After from admission control (or 409 while a request with the
+// same Idempotency-Key is still running): wait at least Retry-After,
+// doubling per attempt, with jitter so shed clients do not return together
+const MAX_BUSY_RETRIES = 3;
+const MAX_BUSY_DELAY_SECONDS = 60;
+
+function busyRetryDelay(response, attempt) {
+    const retryAfter = parseInt(response.headers.get('Retry-After'), 10);
+    const base = Math.max(Number.isNaN(retryAfter) ? 1 : retryAfter, 2 ** attempt);
+    return Math.min(MAX_BUSY_DELAY_SECONDS, base * (1 + Math.random() * 0.3));
+}
+
+// crypto.randomUUID is only available on https (and localhost)
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+}
+
 class ApiClient {
     constructor() {
         this.baseUrl = '';
@@ -163,15 +187,31 @@ class ApiClient {
     async request(endpoint, options = {}) {
         const lang = document.getElementById('language').value;
         const t = translations[lang];
+        const { onRetry, ...fetchOptions } = options;
         
         try {
-            const response = await fetch(endpoint, {
-                ...options,
-                headers: {
-                    'Content-Type': 'application/json',
-                    ...options.headers,
-                },
-            });
+            let response;
+            for (let attempt = 0; ; attempt++) {
+                response = await fetch(endpoint, {
+                    ...fetchOptions,
+                    headers: {
+                        'Content-Type': 'application/json',
+                        ...fetchOptions.headers,
+                    },
+                });
+                const busy = response.status === 503 || response.status === 409;
+                if (!busy || !response.headers.has('Retry-After')) {
+                    break;
+                }
+                if (attempt >= MAX_BUSY_RETRIES) {
+                    throw new Error(t.serverBusy);
+                }
+                const delay = busyRetryDelay(response, attempt);
+                if (onRetry) {
+                    onRetry(Math.ceil(delay));
+                }
+                await new Promise(resolve => setTimeout(resolve, delay * 1000));
+            }
 
             if (!response.ok) {
                 if (response.status === 401) {
@@ -374,12 +414,17 @@ document.getElementById('analysisForm').addEventListener('submit', async (e) =>
     
     try {
         const formData = new FormData(form);
+        // One key per submission: every retry of it is answered by the same analysis
         const data = await apiClient.authenticatedRequest('/api/analyze', {
             method: 'POST', 
+            headers: { 'Idempotency-Key': newIdempotencyKey() },
             body: JSON.stringify({
                 text: formData.get('text'),
                 language: lang
-            })
+            }),
+            onRetry: seconds => {
+                resultDiv.innerHTML = `<div class="loading">${t.retrying.replace('{seconds}', seconds)}</div>`;
+            }
         }); 
         
         resultDiv.innerHTML = `
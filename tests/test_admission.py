@@ -0,0 +1,152 @@
+"""
+Tests for admission control: wait prediction from scheduler load, shedding
+in a gevent worker and the 503 + Retry-After response of /api/analyze.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api import admission
+from src.api.admission import AdmissionController
+from src.api.models import AnalysisResponse, Entities
+from src.api.scheduler import UpstreamScheduler
+from src.models.sql_models import User
+
+TEXT = "Deadlines keep piling up and I cannot sleep, everything feels like too much."
+
+# One gevent worker process: requests queued by other greenlets are visible to the admission check
+GEVENT_WORKER = """
+from gevent import monkey
+monkey.patch_all()
+
+import json
+import sys
+import time
+
+import gevent
+
+sys.path.insert(0, sys.argv[1])
+from src.api.admission import AdmissionController
+from src.api.scheduler import UpstreamScheduler
+
+scheduler = UpstreamScheduler(concurrency=2, user_max_in_flight=2)
+controller = AdmissionController(scheduler, wait_budget=0.05, max_queued=64)
+
+def call(user_id):
+    with scheduler.slot(user_id):
+        time.sleep(0.1)
+
+# Completed calls give the service time estimate
+gevent.joinall([gevent.spawn(call, 'bulk') for _ in range(2)])
+backlog = [gevent.spawn(call, 'bulk') for _ in range(6)]
+gevent.sleep(0.01)
+under_load = controller.check('new')
+gevent.joinall(backlog)
+print(json.dumps({'under_load': under_load, 'idle': controller.check('new')}))
+"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def busy_scheduler(clock, held):
+    """Scheduler with `held` calls of one user in flight and a 2s service EWMA"""
+    scheduler = UpstreamScheduler(concurrency=2, user_max_in_flight=2, clock=clock)
+    scheduler.observe_service(2.0)
+    for _ in range(held):
+        scheduler.acquire('bulk')
+    return scheduler
+
+
+def test_predicted_wait_from_load():
+    clock = FakeClock()
+    controller = AdmissionController(busy_scheduler(clock, held=2), wait_budget=1.5, max_queued=10)
+
+    # Both slots busy: a new call waits half a service time on average
+    assert controller.predicted_wait('other') == 1.0
+    # The bulk user is at their own cap as well
+    assert controller.predicted_wait('bulk') == 1.0
+    assert controller.check('other') is None
+
+    # Nothing completes for 5s: the oldest running call's age takes over
+    controller.scheduler.running[object()] = 0.0
+    clock.now = 5.0
+    assert controller.predicted_wait('other') == 2.5
+    assert controller.check('other') == 3
+    assert controller.snapshot()['rejected'] == 1
+    print("✅ Wait prediction test passed")
+
+
+def test_idle_scheduler_admits_without_latency_data():
+    controller = AdmissionController(UpstreamScheduler(concurrency=2), wait_budget=0.0, max_queued=10)
+    assert controller.predicted_wait('anyone') == 0.0
+    assert controller.check('anyone') is None
+    print("✅ Idle admission test passed")
+
+
+class TestShedding:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username="admission_user", email="admission_user@example.com")
+        self.user.set_password("safe_test_password_123")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def teardown_method(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, **payload):
+        return self.client.post('/api/analyze',
+            headers={'X-API-Key': self.user.api_key},
+            json=dict(text=TEXT, language='en', **payload)
+        )
+
+    def test_overloaded_analyze_returns_503_but_fast_mode_is_served(self):
+        controller = AdmissionController(busy_scheduler(FakeClock(), held=2), wait_budget=0.5, max_queued=10)
+        fake = type('FakeClient', (), {'analyze_text': lambda self, text, language: AnalysisResponse(
+            sentiment="negative", entities=Entities(emotions=[], skills=[]), distortions=[], confidence_score=0.8)})()
+
+        with patch.object(admission, 'admission_controller', controller), \
+                patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            response = self.post()
+            assert response.status_code == 503
+            assert response.headers['Retry-After'] == '1'
+            assert json.loads(response.data)['retry_after'] == 1
+
+            # Cheap work is never shed
+            assert self.post(mode='fast').status_code == 200
+            assert self.client.get('/api/analyses', headers={'X-API-Key': self.user.api_key}).status_code == 200
+        print("✅ Load shedding test passed")
+
+
+def test_gevent_worker_sheds_under_load():
+    """With gevent workers the check sees the queue of its own process"""
+    pytest.importorskip('gevent')
+    output = subprocess.run([sys.executable, '-c', GEVENT_WORKER, str(Path(__file__).parent.parent)],
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result['under_load'] == 1
+    assert result['idle'] is None
+    print("✅ Gevent admission test passed")
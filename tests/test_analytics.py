@@ -0,0 +1,210 @@
+"""
+Tests for the normalized tag store, daily rollups and SQL aggregates.
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.models.sql_models import AnalysisResult, DailyRollup, DailyTagRollup, Tag, User
+from src.models.analytics import (
+    tag_counts, count_users_with_tag, analyses_with_tag,
+    rollup_summary, rollup_timeline, rollup_top_tags
+)
+from src.auth.utils import generate_jwt_token
+
+
+def make_result(sentiment="negative", emotions=None, skills=None, distortions=None, confidence=0.9):
+    """Build an AnalysisResponse-shaped dict"""
+    return {
+        'sentiment': sentiment,
+        'entities': {'emotions': emotions or [], 'skills': skills or []},
+        'distortions': distortions or [],
+        'confidence_score': confidence
+    }
+
+
+class AnalyticsTestBase:
+    """Fresh database with two users per test"""
+
+    def setup_method(self):
+        """Setup before each test method"""
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.users = []
+        for index in range(2):
+            user = User(username=f"tag_user_{index}", email=f"tag{index}@example.com")
+            user.set_password("safe_test_password_123")
+            db.session.add(user)
+            self.users.append(user)
+        db.session.commit()
+
+    def teardown_method(self):
+        """Cleanup after each test method"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_analysis(self, user, result, created_at=None):
+        record = AnalysisResult.from_response(
+            user_id=user.id,
+            text="Test journal entry for tag store",
+            language="en",
+            result_dict=result
+        )
+        if created_at:
+            record.created_at = created_at
+        db.session.add(record)
+        db.session.commit()
+        return record
+
+
+class TestTagStore(AnalyticsTestBase):
+    """Normalized tag store tests"""
+
+    def test_tags_written_at_insert(self):
+        """Tags are normalized and deduplicated when an analysis is saved"""
+        record = self.add_analysis(self.users[0], make_result(
+            emotions=["Anxiety", " anxiety ", "guilt"],
+            skills=["Time  Management"],
+            distortions=["catastrophizing"]
+        ))
+
+        names = sorted((tag.kind, tag.name) for tag in record.tags)
+        assert names == [
+            ('distortion', 'catastrophizing'),
+            ('emotion', 'anxiety'),
+            ('emotion', 'guilt'),
+            ('skill', 'time management'),
+        ]
+        # JSON columns stay untouched for existing consumers
+        assert json.loads(record.emotions) == ["Anxiety", " anxiety ", "guilt"]
+
+        self.add_analysis(self.users[1], make_result(emotions=["anxiety"]))
+        assert Tag.query.filter_by(kind='emotion', name='anxiety').count() == 1
+        print("✅ Tags written at insert test passed")
+
+    def test_sql_aggregates(self):
+        """Tag counts and distinct-user counts respect filters"""
+        now = datetime.now(timezone.utc)
+        self.add_analysis(self.users[0], make_result(emotions=["anxiety", "fear"], distortions=["catastrophizing"]))
+        self.add_analysis(self.users[0], make_result(emotions=["anxiety"], distortions=["catastrophizing"]))
+        self.add_analysis(self.users[1], make_result(emotions=["joy"], distortions=["catastrophizing"]),
+                          created_at=now - timedelta(days=60))
+
+        assert tag_counts('emotion') == [('anxiety', 2), ('fear', 1), ('joy', 1)]
+        assert tag_counts('emotion', limit=1) == [('anxiety', 2)]
+        assert tag_counts('emotion', user_id=self.users[1].id) == [('joy', 1)]
+
+        last_month = now - timedelta(days=30)
+        assert count_users_with_tag('distortion', 'Catastrophizing') == 2
+        assert count_users_with_tag('distortion', 'catastrophizing', start=last_month) == 1
+
+        rows = db.session.execute(analyses_with_tag('emotion', 'joy')).scalars().all()
+        assert [row.user_id for row in rows] == [self.users[1].id]
+        print("✅ SQL aggregates test passed")
+
+    def test_backfill_command(self):
+        """Legacy rows with only JSON columns get linked by the migration command"""
+        legacy = AnalysisResult(
+            user_id=self.users[0].id,
+            original_text="Legacy entry before tag tables",
+            language="ru",
+            sentiment="negative",
+            confidence_score=0.8,
+            emotions=json.dumps(["тревога"]),
+            skills=json.dumps([]),
+            distortions="not json"
+        )
+        db.session.add(legacy)
+        db.session.commit()
+        assert legacy.tags == []
+
+        result = app.test_cli_runner().invoke(args=['backfill-tags', '--batch-size', '1'])
+        assert result.exit_code == 0, result.output
+
+        db.session.expire_all()
+        assert [(tag.kind, tag.name) for tag in legacy.tags] == [('emotion', 'тревога')]
+        print("✅ Backfill command test passed")
+
+
+class TestRollups(AnalyticsTestBase):
+    """Daily rollup maintenance tests"""
+
+    def rollup_rows(self):
+        rows = DailyRollup.query.order_by(DailyRollup.user_id, DailyRollup.sentiment).all()
+        return [(row.user_id, row.sentiment, row.analyses_count, round(row.confidence_sum, 4)) for row in rows]
+
+    def tag_rollup_rows(self):
+        rows = DailyTagRollup.query.order_by(DailyTagRollup.tag_kind, DailyTagRollup.tag_name).all()
+        return [(row.tag_kind, row.tag_name, row.analyses_count) for row in rows]
+
+    def test_incremental_insert_and_delete(self):
+        """Rollups follow inserts and deletes without a rebuild"""
+        first = self.add_analysis(self.users[0], make_result(emotions=["anxiety"], confidence=0.8))
+        self.add_analysis(self.users[0], make_result(emotions=["Anxiety", "fear"], confidence=0.6))
+        self.add_analysis(self.users[1], make_result(sentiment="positive", emotions=["joy"], confidence=1.0))
+
+        assert self.rollup_rows() == [
+            (self.users[0].id, 'negative', 2, 1.4),
+            (self.users[1].id, 'positive', 1, 1.0),
+        ]
+        assert self.tag_rollup_rows() == [('emotion', 'anxiety', 2), ('emotion', 'fear', 1), ('emotion', 'joy', 1)]
+
+        summary = rollup_summary()
+        assert summary['total'] == 3
+        assert summary['by_sentiment'] == {'negative': 2, 'positive': 1}
+        assert abs(summary['avg_confidence'] - 0.8) < 1e-9
+        assert summary['avg_text_length'] == len("Test journal entry for tag store")
+        assert rollup_top_tags('emotion', limit=1) == [('anxiety', 2)]
+
+        db.session.delete(first)
+        db.session.commit()
+        assert self.rollup_rows()[0] == (self.users[0].id, 'negative', 1, 0.6)
+
+        db.session.delete(AnalysisResult.query.filter_by(user_id=self.users[1].id).one())
+        db.session.commit()
+        assert self.rollup_rows() == [(self.users[0].id, 'negative', 1, 0.6)]
+        assert self.tag_rollup_rows() == [('emotion', 'anxiety', 1), ('emotion', 'fear', 1)]
+        print("✅ Incremental rollup test passed")
+
+    def test_rebuild_matches_incremental(self):
+        """The rebuild command reproduces incrementally maintained rollups"""
+        now = datetime.now(timezone.utc)
+        self.add_analysis(self.users[0], make_result(emotions=["anxiety"], distortions=["labeling"]))
+        self.add_analysis(self.users[1], make_result(sentiment="mixed", skills=["planning"]),
+                          created_at=now - timedelta(days=3))
+        expected = (self.rollup_rows(), self.tag_rollup_rows())
+
+        result = app.test_cli_runner().invoke(args=['rebuild-rollups'])
+        assert result.exit_code == 0, result.output
+        db.session.expire_all()
+        assert (self.rollup_rows(), self.tag_rollup_rows()) == expected
+
+        timeline = rollup_timeline(start_day=(now - timedelta(days=7)).date())
+        assert [count for _, count in timeline] == [1, 1]
+        print("✅ Rollup rebuild test passed")
+
+    def test_stats_endpoint(self):
+        """Stats API reads the current user's rollups"""
+        self.add_analysis(self.users[0], make_result(emotions=["anxiety"], distortions=["labeling"]))
+        self.add_analysis(self.users[1], make_result(sentiment="positive", emotions=["joy"]))
+
+        client = app.test_client()
+        token = generate_jwt_token(self.users[0].id)
+        response = client.get('/api/stats?days=7', headers={'Authorization': f'Bearer {token}'})
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['summary']['total'] == 1
+        assert data['top_emotions'] == [{'name': 'anxiety', 'count': 1}]
+        assert data['top_distortions'] == [{'name': 'labeling', 'count': 1}]
+        print("✅ Stats endpoint test passed")
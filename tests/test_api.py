@@ -9,11 +9,13 @@ import sys
 import os
 from pathlib import Path
 
+from werkzeug.security import generate_password_hash
+
 # Add project root to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app import app, db
-from src.models.sql_models import User
+from src.models.sql_models import AnalysisResult, User
 
 
 class TestAPI:
@@ -139,6 +141,73 @@ class TestAPI:
         assert 'error' in data
         print("✅ Protected endpoint with invalid token test passed")
 
+    def test_protected_endpoint_with_api_key(self):
+        """Test accessing protected endpoint with X-API-Key header"""
+        response = self.client.get('/api/profile',
+            headers={'X-API-Key': self.test_user.api_key}
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['username'] == 'test_user_001'
+        print("✅ Protected endpoint with API key test passed")
+    
+    def test_analyze_fast_mode(self):
+        """mode=fast answers locally and saves the analysis"""
+        response = self.client.post('/api/analyze',
+            headers={'X-API-Key': self.test_user.api_key},
+            json={'text': 'I always fail, everyone will think I am useless', 'language': 'en', 'mode': 'fast'}
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['sentiment'] == 'negative'
+        assert 'labeling' in data['distortions']
+        assert AnalysisResult.query.filter_by(user_id=self.test_user.id).count() == 1
+        print("✅ Fast mode analysis test passed")
+
+    def test_protected_endpoint_with_invalid_api_key(self):
+        """Test accessing protected endpoint with unknown API key"""
+        response = self.client.get('/api/profile',
+            headers={'X-API-Key': 'invalid_api_key_123'}
+        )
+        
+        assert response.status_code == 401
+        data = json.loads(response.data)
+        assert 'error' in data
+        print("✅ Protected endpoint with invalid API key test passed")
+    
+    def test_api_key_regeneration_invalidates_old_key(self):
+        """Test that a regenerated API key replaces the cached old one"""
+        old_key = self.test_user.api_key
+        assert self.client.get('/api/profile', headers={'X-API-Key': old_key}).status_code == 200
+        
+        response = self.client.post('/api/auth/api-key', headers={'X-API-Key': old_key})
+        assert response.status_code == 200
+        new_key = json.loads(response.data)['api_key']
+        assert new_key != old_key
+        
+        assert self.client.get('/api/profile', headers={'X-API-Key': old_key}).status_code == 401
+        assert self.client.get('/api/profile', headers={'X-API-Key': new_key}).status_code == 200
+        print("✅ API key regeneration test passed")
+    
+    def test_login_upgrades_legacy_password_hash(self):
+        """Test that login rehashes passwords stored with older parameters"""
+        self.test_user.password_hash = generate_password_hash("safe_test_password_123", method="pbkdf2:sha256:1000")
+        db.session.commit()
+        
+        response = self.client.post('/api/auth/login', json={
+            'username': 'test_user_001',
+            'password': 'safe_test_password_123'
+        })
+        assert response.status_code == 200
+        
+        db.session.refresh(self.test_user)
+        assert not self.test_user.password_hash.startswith('pbkdf2:sha256:1000$')
+        assert not self.test_user.password_needs_rehash()
+        assert self.test_user.check_password("safe_test_password_123")
+        print("✅ Legacy password hash upgrade test passed")
+
 
 def run_all_tests():
     """Run all tests sequentially"""
@@ -157,6 +226,11 @@ def run_all_tests():
         test_instance.test_protected_endpoint_with_valid_token()
         test_instance.test_protected_endpoint_without_token()
         test_instance.test_protected_endpoint_with_invalid_token()
+        test_instance.test_protected_endpoint_with_api_key()
+        test_instance.test_analyze_fast_mode()
+        test_instance.test_protected_endpoint_with_invalid_api_key()
+        test_instance.test_api_key_regeneration_invalidates_old_key()
+        test_instance.test_login_upgrades_legacy_password_hash()
         
         test_instance.teardown_method()
         
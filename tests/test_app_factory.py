@@ -0,0 +1,101 @@
+"""
+Tests for the application factory: importing the app is side-effect free,
+heavy dependencies load lazily and the schema is created by `flask init-db`.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, inspect, text
+
+ROOT = Path(__file__).parent.parent
+
+# Add project root to Python path
+sys.path.append(str(ROOT))
+
+from app import create_app
+from extensions import db
+
+
+def test_import_has_no_side_effects(tmp_path):
+    """Importing app needs no ENCRYPTION_KEY, touches no DB and defers heavy modules"""
+    db_path = tmp_path / 'absent.db'
+    env = {key: value for key, value in os.environ.items() if key != 'ENCRYPTION_KEY'}
+    env['DATABASE_URL'] = f"sqlite:///{db_path}"
+    check = (
+        "import sys, app\n"
+        "print(','.join(m for m in ('pyarrow', 'requests', 'src.api.yandex_gpt') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', check], cwd=ROOT, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
+    assert not db_path.exists()
+    print("✅ Side-effect free import test passed")
+
+
+def test_factory_builds_independent_apps(tmp_path):
+    """Each create_app call gets its own config and registered routes"""
+    first = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'first.db'}", 'TESTING': True})
+    second = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'second.db'}", 'JWT_SECRET': 'other'})
+
+    assert first.config['SQLALCHEMY_DATABASE_URI'] != second.config['SQLALCHEMY_DATABASE_URI']
+    assert second.config['JWT_SECRET'] == 'other'
+    assert {'/api/analyze', '/api/auth/login'} <= {rule.rule for rule in first.url_map.iter_rules()}
+    print("✅ Factory test passed")
+
+
+def test_init_db_command_creates_schema(tmp_path):
+    """Schema creation is an explicit CLI step"""
+    db_path = tmp_path / 'init.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}"})
+
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    tables = set(inspect(engine).get_table_names())
+    engine.dispose()
+    assert {'users', 'analysis_results', 'tags', 'daily_rollups'} <= tables
+    with app.app_context():
+        db.engine.dispose()
+    print("✅ init-db command test passed")
+
+
+def test_init_db_fills_new_rollup_columns(tmp_path):
+    """Columns added to daily_rollups by init-db are filled from analysis_results"""
+    db_path = tmp_path / 'upgrade.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}"})
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['init-db']).exit_code == 0
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, email, password_hash) VALUES (1, 'u', 'u@example.com', 'x')"))
+        conn.execute(text("""
+            INSERT INTO analysis_results (user_id, language, sentiment, confidence_score, text_length, created_at)
+            VALUES (1, 'en', 'neutral', 0.5, 42, '2025-01-01 10:00:00')
+        """))
+        # Rollup table as created before the text length sums existed
+        conn.execute(text("DROP TABLE daily_rollups"))
+        conn.execute(text("""
+            CREATE TABLE daily_rollups (
+                day DATE, user_id INTEGER, language VARCHAR(2), sentiment VARCHAR(20),
+                analyses_count INTEGER NOT NULL, confidence_sum FLOAT NOT NULL,
+                PRIMARY KEY (day, user_id, language, sentiment)
+            )
+        """))
+
+    result = runner.invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    assert 'text_length_sum' in result.output
+
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT analyses_count, text_length_sum, text_length_count FROM daily_rollups")).one()
+    engine.dispose()
+    assert tuple(row) == (1, 42, 1)
+    with app.app_context():
+        db.engine.dispose()
+    print("✅ init-db rollup column upgrade test passed")
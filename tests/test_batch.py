@@ -0,0 +1,290 @@
+"""
+Tests for offline corpus analysis: rate limiting, checkpoints and resume.
+"""
+
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api.models import AnalysisResponse, Entities
+from src.api.yandex_gpt import YandexGPTClient
+from src.batch.analyze_file import Checkpoint, CorpusAnalyzer, RateLimiter, iter_input, scan_output
+from src.models.sql_models import AnalysisResult, BatchCheckpoint, User
+
+
+class FakeClient:
+    """Stands in for YandexGPTClient; fails on texts listed in fail_on"""
+
+    def __init__(self, fail_on=()):
+        self.fail_on = set(fail_on)
+        self.calls = []
+
+    def analyze_text(self, text, language="ru"):
+        self.calls.append(text)
+        if text in self.fail_on:
+            raise Exception("Upstream error")
+        return AnalysisResponse(
+            sentiment="neutral",
+            entities=Entities(emotions=["calm"], skills=[]),
+            distortions=[],
+            confidence_score=0.8
+        )
+
+
+class FakeUpstream:
+    """Stands in for the YandexGPT HTTP session; packed item 2 comes back invalid once"""
+
+    def __init__(self):
+        self.prompts = []
+        self.invalid_sent = False
+
+    def post(self, url, **kwargs):
+        prompt = kwargs['json']['messages'][1]['text']
+        self.prompts.append(prompt)
+        result = {"sentiment": "neutral", "entities": {"emotions": [], "skills": []},
+                  "distortions": [], "confidence_score": 0.8}
+        if "USER TEXTS TO ANALYZE" in prompt:
+            count = prompt.count("\n[")
+            items = [dict(result, id=number) for number in range(1, count + 1)]
+            if not self.invalid_sent:
+                items[1]['confidence_score'] = 1.5
+                self.invalid_sent = True
+            text = json.dumps(items)
+        else:
+            text = json.dumps(result)
+        return FakeResponse({"result": {"alternatives": [{"message": {"text": text}}]}})
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+def write_jsonl(path, count):
+    with open(path, 'w', encoding='utf-8') as file:
+        for index in range(count):
+            file.write(json.dumps({'text': f"Journal entry number {index}", 'language': 'en'}) + '\n')
+
+
+def test_checkpoint_watermark(tmp_path):
+    """Checkpoint stores a watermark plus sparse indices and survives reload"""
+    checkpoint = Checkpoint(str(tmp_path / 'progress.json'))
+    checkpoint.mark_done([0, 1, 3, 5])
+    assert checkpoint.done_below == 2 and checkpoint.done == {3, 5}
+    checkpoint.mark_done([2])
+    assert checkpoint.done_below == 4 and checkpoint.done == {5}
+    checkpoint.save()
+
+    reloaded = Checkpoint(str(tmp_path / 'progress.json'))
+    assert reloaded.is_done(3) and reloaded.is_done(5) and not reloaded.is_done(4)
+    assert reloaded.completed == 5
+    print("✅ Checkpoint watermark test passed")
+
+
+def test_scan_output_skips_torn_line(tmp_path):
+    """Indices already in the output count as done; a line torn by a crash does not"""
+    output_path = tmp_path / 'results.jsonl'
+    output_path.write_text('{"index": 0}\n{"index": 2}\n{"index": 1}\n{"ind', encoding='utf-8')
+    written, torn = scan_output(str(output_path))
+    assert written.done_below == 3 and torn
+    assert scan_output(str(tmp_path / 'missing.jsonl'))[0].completed == 0
+    print("✅ Output scan test passed")
+
+
+def test_rate_limiter_spacing():
+    """Token bucket sleeps once the burst is used up"""
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(rate=2, burst=1, clock=lambda: now[0], sleep=sleep)
+    for _ in range(3):
+        limiter.acquire()
+    assert [round(value, 3) for value in sleeps] == [0.5, 0.5]
+    print("✅ Rate limiter test passed")
+
+
+def test_resume_skips_finished_items(tmp_path):
+    """A second run only pays for items that failed the first time"""
+    input_path = tmp_path / 'corpus.jsonl'
+    write_jsonl(input_path, 10)
+    stored = []
+
+    checkpoint = Checkpoint(str(tmp_path / 'corpus.checkpoint'))
+    first_client = FakeClient(fail_on={"Journal entry number 4", "Journal entry number 7"})
+    analyzer = CorpusAnalyzer(first_client, stored.extend, checkpoint, concurrency=3, batch_size=3)
+    assert analyzer.run(iter_input(str(input_path))) == (8, 2)
+
+    resumed = Checkpoint(str(tmp_path / 'corpus.checkpoint'))
+    second_client = FakeClient()
+    analyzer = CorpusAnalyzer(second_client, stored.extend, resumed, concurrency=3, batch_size=3)
+    assert analyzer.run(iter_input(str(input_path))) == (2, 0)
+
+    assert sorted(second_client.calls) == ["Journal entry number 4", "Journal entry number 7"]
+    assert sorted(index for index, _, _, _ in stored) == list(range(10))
+    print("✅ Resume test passed")
+
+
+def test_packed_run_reruns_only_invalid_items(tmp_path, monkeypatch):
+    """Packing sends several texts per call and retries just the item that failed validation"""
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    input_path = tmp_path / 'corpus.jsonl'
+    write_jsonl(input_path, 10)
+    stored = []
+
+    client = YandexGPTClient()
+    upstream = FakeUpstream()
+    client.session = upstream
+    analyzer = CorpusAnalyzer(client, stored.extend, Checkpoint(None), concurrency=1, batch_size=4, pack=True)
+    assert analyzer.run(iter_input(str(input_path))) == (10, 0)
+
+    # One pack of 10 texts, plus a single-text retry for the invalid item
+    assert len(upstream.prompts) == 2
+    assert "[10] Journal entry number 9" in upstream.prompts[0]
+    assert "USER TEXT TO ANALYZE:\nJournal entry number 1" in upstream.prompts[1]
+    assert sorted(index for index, _, _, _ in stored) == list(range(10))
+
+    usage = client.usage_per_text()
+    assert usage['texts'] == 10 and usage['calls_per_text'] == 0.2
+    print("✅ Packed run test passed")
+
+
+class TestAnalyzeFileCommand:
+    """flask analyze-file end to end with a fake client"""
+
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(username="batch_user", email="batch@example.com")
+        self.user.set_password("safe_test_password_123")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def teardown_method(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_command_writes_db_and_output(self, tmp_path):
+        """Results land in the DB in batches and in the output file"""
+        input_path = tmp_path / 'corpus.jsonl'
+        output_path = tmp_path / 'results.jsonl'
+        write_jsonl(input_path, 7)
+
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=FakeClient()):
+            result = app.test_cli_runner().invoke(args=[
+                'analyze-file', str(input_path), '--user-id', str(self.user.id),
+                '--output', str(output_path), '--batch-size', '3', '--rate', '0'
+            ])
+        assert result.exit_code == 0, result.output
+
+        assert AnalysisResult.query.filter_by(user_id=self.user.id).count() == 7
+        lines = output_path.read_text(encoding='utf-8').splitlines()
+        assert sorted(json.loads(line)['index'] for line in lines) == list(range(7))
+        assert Checkpoint(f"{input_path}.checkpoint").done_below == 7
+        print("✅ analyze-file command test passed")
+
+    def test_crash_before_checkpoint_save_does_not_duplicate(self, tmp_path):
+        """Batches stored before a crash in Checkpoint.save() are neither re-analyzed nor re-inserted"""
+        input_path = tmp_path / 'corpus.jsonl'
+        output_path = tmp_path / 'results.jsonl'
+        write_jsonl(input_path, 10)
+        args = ['analyze-file', str(input_path), '--user-id', str(self.user.id), '--output', str(output_path),
+                '--batch-size', '3', '--rate', '0', '--concurrency', '1']
+        saves = []
+
+        def crash_on_second_save(checkpoint):
+            saves.append(checkpoint.completed)
+            if len(saves) == 2:
+                raise KeyboardInterrupt("killed")
+            original_save(checkpoint)
+
+        original_save = Checkpoint.save
+        first_client = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=first_client), \
+                patch.object(Checkpoint, 'save', crash_on_second_save):
+            result = app.test_cli_runner().invoke(args=args)
+        assert result.exit_code != 0
+        # The second batch was committed, the file checkpoint only has the first
+        first_batch, stored = saves
+        assert 0 < first_batch < stored < 10
+        assert AnalysisResult.query.filter_by(user_id=self.user.id).count() == stored
+        assert Checkpoint(f"{input_path}.checkpoint").completed == first_batch
+
+        second_client = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=second_client):
+            result = app.test_cli_runner().invoke(args=args)
+        assert result.exit_code == 0, result.output
+
+        assert len(second_client.calls) == 10 - stored
+        texts = [record.original_text for record in AnalysisResult.query.filter_by(user_id=self.user.id)]
+        assert sorted(texts) == [f"Journal entry number {index}" for index in range(10)]
+        lines = output_path.read_text(encoding='utf-8').splitlines()
+        assert sorted(json.loads(line)['index'] for line in lines) == list(range(10))
+        print("✅ analyze-file crash resume test passed")
+
+    def run_command(self, client, *args):
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=client):
+            return app.test_cli_runner().invoke(args=['analyze-file', *args])
+
+    def test_completed_run_clears_stored_state(self, tmp_path):
+        """A run without failures leaves no stored state behind the checkpoint file"""
+        input_path = tmp_path / 'corpus.jsonl'
+        checkpoint_path = tmp_path / 'corpus.jsonl.checkpoint'
+        write_jsonl(input_path, 5)
+        args = [str(input_path), '--user-id', str(self.user.id), '--batch-size', '2', '--rate', '0']
+
+        failing = FakeClient(fail_on={"Journal entry number 3"})
+        assert self.run_command(failing, *args).exit_code == 0
+        assert BatchCheckpoint.query.count() == 1
+
+        assert self.run_command(FakeClient(), *args).exit_code == 0
+        assert BatchCheckpoint.query.count() == 0
+
+        # Deleting the checkpoint file starts over
+        checkpoint_path.unlink()
+        client = FakeClient()
+        assert self.run_command(client, *args).exit_code == 0
+        assert len(client.calls) == 5
+        print("✅ Stored state cleanup test passed")
+
+    def test_restart_discards_progress(self, tmp_path):
+        """--restart ignores the checkpoint file and the stored state of an unfinished run"""
+        input_path = tmp_path / 'corpus.jsonl'
+        output_path = tmp_path / 'results.jsonl'
+        write_jsonl(input_path, 4)
+        args = [str(input_path), '--user-id', str(self.user.id), '--output', str(output_path),
+                '--batch-size', '2', '--rate', '0']
+
+        assert self.run_command(FakeClient(fail_on={"Journal entry number 1"}), *args).exit_code == 0
+        assert BatchCheckpoint.query.count() == 1
+
+        with open(input_path, 'w', encoding='utf-8') as file:
+            for index in range(4):
+                file.write(json.dumps({'text': f"Rewritten entry {index}", 'language': 'en'}) + '\n')
+        client = FakeClient()
+        result = self.run_command(client, *args, '--restart')
+        assert result.exit_code == 0, result.output
+
+        assert sorted(client.calls) == [f"Rewritten entry {index}" for index in range(4)]
+        assert BatchCheckpoint.query.count() == 0
+        # Results of the restarted run are appended to the output
+        lines = output_path.read_text(encoding='utf-8').splitlines()
+        assert len(lines) == 3 + 4
+        print("✅ analyze-file restart test passed")
@@ -0,0 +1,88 @@
+"""
+Tests for the shared dashboard query cache.
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.dashboard.cache import QueryCache, estimate_size
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_frame(rows=10):
+    return pd.DataFrame({'sentiment': ['positive'] * rows, 'count': range(rows)})
+
+
+def test_hit_and_version_invalidation():
+    """Same filters and version hit; a new version recomputes"""
+    cache = QueryCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return make_frame()
+
+    cache.get_or_compute('summary', ('2025-01-01', None), (10, '2025-01-01'), compute)
+    cache.get_or_compute('summary', ('2025-01-01', None), (10, '2025-01-01'), compute)
+    assert len(calls) == 1
+    assert cache.hits == 1
+
+    cache.get_or_compute('summary', ('2025-01-02', None), (10, '2025-01-01'), compute)
+    assert len(calls) == 2
+
+    cache.get_or_compute('summary', ('2025-01-01', None), (11, '2025-01-02'), compute)
+    assert len(calls) == 3
+    print("✅ Cache hit and invalidation test passed")
+
+
+def test_ttl_and_byte_budget():
+    """Entries expire after TTL and LRU entries are evicted over budget"""
+    clock = FakeClock()
+    frame_size = estimate_size(make_frame())
+    cache = QueryCache(max_bytes=frame_size * 2, ttl=60, clock=clock)
+
+    cache.put('a', (), 1, make_frame())
+    cache.put('b', (), 1, make_frame())
+    assert cache.get('a', (), 1) is not None  # a becomes most recently used
+    cache.put('c', (), 1, make_frame())
+
+    assert cache.get('b', (), 1) is None
+    assert cache.get('a', (), 1) is not None
+    assert cache.size_bytes <= frame_size * 2
+
+    clock.now += 61
+    assert cache.get('a', (), 1) is None
+    assert cache.get('c', (), 1) is None
+    assert len(cache) == 0
+    print("✅ Cache TTL and budget test passed")
+
+
+def test_parquet_persistence(tmp_path):
+    """A new cache instance starts warm from Parquet files"""
+    clock = FakeClock()
+    cache = QueryCache(ttl=60, persist_dir=str(tmp_path), clock=clock)
+    counts = pd.Series([3, 1], index=['anxiety', 'joy'], name='count')
+    cache.put('emotions', ('2025-01-01',), (5, '2025-01-01 10:00:00', 2), counts)
+    cache.put('summary', ('2025-01-01',), (5, '2025-01-01 10:00:00', 2), make_frame())
+
+    warm = QueryCache(ttl=60, persist_dir=str(tmp_path), clock=clock)
+    restored = warm.get('emotions', ('2025-01-01',), (5, '2025-01-01 10:00:00', 2))
+    assert restored.to_dict() == {'anxiety': 3, 'joy': 1}
+    assert warm.get('summary', ('2025-01-01',), (6, '2025-01-02 10:00:00', 2)) is None
+
+    clock.now += 61
+    expired = QueryCache(ttl=60, persist_dir=str(tmp_path), clock=clock)
+    assert len(expired) == 0
+    print("✅ Cache persistence test passed")
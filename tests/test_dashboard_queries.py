@@ -0,0 +1,173 @@
+"""
+Tests for dashboard aggregation queries.
+"""
+
+import sys
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+import sqlalchemy as sa
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.dashboard import queries
+
+
+def make_engine(tmp_path):
+    """
+    SQLite database with a handful of analysis rows.
+    Rows go through the model layer so the flush hooks fill the rollups
+    the charts read from.
+    """
+    from sqlalchemy.orm import Session
+    from extensions import db
+    from src.models.sql_models import AnalysisResult, User
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'dashboard.db'}")
+    db.metadata.create_all(engine)
+    now = datetime.combine(date.today(), time(12, 0))
+    rows = [
+        (1, 'x' * 40, 'positive', 0.9, now - timedelta(hours=2), '["joy", "pride"]'),
+        (1, 'x' * 80, 'negative', 0.7, now - timedelta(hours=1), '["anxiety"]'),
+        (2, 'x' * 120, 'negative', 0.5, now - timedelta(days=1, hours=3), '["Anxiety ", "joy"]'),
+        (2, 'x' * 160, 'neutral', 0.8, now - timedelta(days=20, hours=3), '["fear"]'),
+        (2, None, 'mixed', 0.6, now, 'broken json'),
+    ]
+    with Session(engine) as session:
+        for user_id in (1, 2):
+            session.add(User(id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com",
+                             password_hash="x"))
+        session.flush()
+        for user_id, text, sentiment, confidence, created_at, emotions in rows:
+            record = AnalysisResult(user_id=user_id, language='en', sentiment=sentiment,
+                                    confidence_score=confidence, created_at=created_at, emotions=emotions)
+            if text:
+                record.original_text = text
+            session.add(record)
+        session.commit()
+    return engine
+
+
+def test_grouped_metrics_and_timeline(tmp_path):
+    """Overview, sentiment split and timeline come from the daily rollups"""
+    engine = make_engine(tmp_path)
+    today = date.today()
+    filters = queries.build_filters(today - timedelta(days=7), today)
+
+    summary = queries.sentiment_summary(engine, filters)
+    assert dict(zip(summary['sentiment'], summary['count'])) == {'negative': 2, 'positive': 1, 'mixed': 1}
+
+    metrics = queries.overview_metrics(summary)
+    assert metrics['total'] == 4
+    assert metrics['positive'] == 1
+    assert abs(metrics['avg_confidence'] - 0.675) < 1e-9
+    # Average over rows with a stored plaintext length, no text involved
+    assert metrics['avg_text_length'] == 80
+
+    # Served from daily_rollups: analysis_results is not read
+    with engine.begin() as conn:
+        conn.execute(sa.text("UPDATE analysis_results SET sentiment = 'neutral'"))
+    assert queries.sentiment_summary(engine, filters)['count'].sum() == 4
+    assert 'neutral' not in set(queries.sentiment_summary(engine, filters)['sentiment'])
+
+    timeline = queries.timeline(engine, filters)
+    assert timeline['count'].tolist() == [1, 3]
+
+    user_filters = queries.build_filters(today - timedelta(days=7), today, user_id=2, sentiment='negative')
+    assert queries.overview_metrics(queries.sentiment_summary(engine, user_filters))['total'] == 1
+    print("✅ Grouped metrics test passed")
+
+
+def test_emotion_counts_from_tag_rollups(tmp_path):
+    """Emotion counts come from the tag rollups, normalized like the tag store"""
+    engine = make_engine(tmp_path)
+    today = date.today()
+
+    counts = queries.emotion_counts(engine, queries.build_filters(today - timedelta(days=7), today))
+    assert counts.to_dict() == {'anxiety': 2, 'joy': 2, 'pride': 1}
+
+    user_counts = queries.emotion_counts(engine, queries.build_filters(today - timedelta(days=7), today, user_id=1))
+    assert user_counts.to_dict() == {'anxiety': 1, 'joy': 1, 'pride': 1}
+    print("✅ Emotion counts from tag rollups test passed")
+
+
+def test_data_version_changes_on_delete(tmp_path):
+    """Inserts, deletions (account deletion, retention) and rebuilds invalidate the cache"""
+    from sqlalchemy.orm import Session
+    from src.models.rollups import rebuild_rollups
+    from src.models.sql_models import AnalysisResult, User
+
+    engine = make_engine(tmp_path)
+    version = queries.data_version(engine)
+    assert version > 0
+    assert queries.data_version(engine) == version
+
+    with Session(engine) as session:
+        session.delete(session.get(AnalysisResult, 1))
+        session.commit()
+    after_delete = queries.data_version(engine)
+    assert after_delete != version
+
+    with Session(engine) as session:
+        session.add(User(id=3, username="user3", email="user3@example.com", password_hash="x"))
+        session.commit()
+        session.delete(session.get(User, 3))
+        session.commit()
+    after_users = queries.data_version(engine)
+    assert after_users != after_delete
+
+    with engine.begin() as conn:
+        rebuild_rollups(conn)
+    assert queries.data_version(engine) != after_users
+    print("✅ Data version on delete test passed")
+
+
+def test_records_paged_without_text(tmp_path):
+    """Table pages are limited server-side and never carry the encrypted text"""
+    engine = make_engine(tmp_path)
+    today = date.today()
+    filters = queries.build_filters(today - timedelta(days=30), today)
+
+    first = queries.fetch_records_page(engine, filters, page=1, page_size=2)
+    last = queries.fetch_records_page(engine, filters, page=3, page_size=2)
+    assert 'original_text' not in first.columns
+    assert len(first) == 2 and len(last) == 1
+    assert first['created_at'].is_monotonic_decreasing
+    assert last['sentiment'].iloc[0] == 'neutral'
+
+    formatted = queries.format_json_columns(first, 'None detected')
+    assert formatted.loc[formatted['sentiment'] == 'mixed', 'emotions'].iloc[0] == 'None detected'
+    print("✅ Paged records test passed")
+
+
+def test_record_detail_decrypts_single_row(tmp_path):
+    """Detail view goes through the model layer and decrypts one row"""
+    from sqlalchemy.orm import Session
+    from extensions import db
+    from src.models.sql_models import AnalysisResult, User
+
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username="dashboard_user", email="dash@example.com", password_hash="x")
+        session.add(user)
+        session.flush()
+        record = AnalysisResult(
+            user_id=user.id, original_text="Private diary entry", language="en",
+            sentiment="neutral", confidence_score=0.7, emotions='["calm"]'
+        )
+        session.add(record)
+        session.commit()
+        record_id = record.id
+
+    with engine.connect() as conn:
+        stored = conn.execute(sa.text("SELECT original_text, text_length FROM analysis_results")).one()
+    assert b"Private" not in stored[0]
+    assert stored[1] == len("Private diary entry")
+
+    detail = queries.fetch_record_detail(engine, record_id)
+    assert detail['original_text'] == "Private diary entry"
+    assert detail['emotions'] == ["calm"]
+    assert queries.fetch_record_detail(engine, record_id + 1) is None
+    print("✅ Record detail test passed")
@@ -0,0 +1,164 @@
+"""
+Tests for the SQLite production profile: pragmas, read/write engines.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import create_app
+from extensions import db
+from src.models.database import READ_BIND, is_sqlite_file, read_engine
+
+ROOT = Path(__file__).parent.parent
+
+# A writer waits for a lock held by another connection while a second greenlet
+# keeps ticking; the lock is released only by that greenlet
+GEVENT_LOCK_WAIT = """
+from gevent import monkey
+monkey.patch_all()
+
+import json
+import sqlite3
+import sys
+import time
+
+import gevent
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, sys.argv[1])
+from src.models.database import install_sqlite_profile, sqlite_engine_options
+
+path = sys.argv[2]
+engine = install_sqlite_profile(create_engine(f"sqlite:///{path}", **sqlite_engine_options()))
+with engine.begin() as conn:
+    conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY)'))
+
+holder = sqlite3.connect(path, isolation_level=None)
+holder.execute('BEGIN IMMEDIATE')
+ticks = []
+
+def write():
+    with engine.begin() as conn:
+        conn.execute(text('INSERT INTO items DEFAULT VALUES'))
+    return len(ticks)
+
+def tick():
+    for _ in range(20):
+        ticks.append(time.monotonic())
+        gevent.sleep(0.01)
+    holder.execute('COMMIT')
+
+writer = gevent.spawn(write)
+ticker = gevent.spawn(tick)
+gevent.joinall([writer, ticker])
+with engine.connect() as conn:
+    busy_timeout = conn.execute(text('PRAGMA busy_timeout')).scalar()
+    rows = conn.execute(text('SELECT count(*) FROM items')).scalar()
+print(json.dumps({'ticks_before_write': writer.value, 'busy_timeout': busy_timeout, 'rows': rows}))
+"""
+
+
+def test_is_sqlite_file():
+    """Only on-disk SQLite gets the profile"""
+    assert is_sqlite_file('sqlite:////tmp/app.db')
+    assert not is_sqlite_file('sqlite:///:memory:')
+    assert not is_sqlite_file('postgresql://user@localhost/app')
+    print("✅ SQLite URI detection test passed")
+
+
+def test_profile_pragmas_and_read_engine(tmp_path):
+    """Write engine runs WAL with a busy timeout; the read engine is query-only"""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'profile.db'}"})
+    with app.app_context():
+        assert READ_BIND in db.engines
+        with db.engine.connect() as conn:
+            assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY)'))
+            conn.commit()
+
+        with read_engine().connect() as conn:
+            assert conn.execute(text('SELECT count(*) FROM items')).scalar() == 0
+            with pytest.raises(OperationalError):
+                conn.execute(text('INSERT INTO items DEFAULT VALUES'))
+
+        for engine in db.engines.values():
+            engine.dispose()
+    print("✅ SQLite profile test passed")
+
+
+def test_profile_can_be_disabled(tmp_path, monkeypatch):
+    """SQLITE_PROFILE=0 keeps a single default engine"""
+    monkeypatch.setenv('SQLITE_PROFILE', '0')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'plain.db'}"})
+    with app.app_context():
+        assert READ_BIND not in db.engines
+        assert read_engine() is db.engine
+    print("✅ SQLite profile opt-out test passed")
+
+
+def test_password_check_runs_without_write_lock(tmp_path):
+    """Login and account deletion verify the password outside any write transaction"""
+    import sqlite3
+    from unittest.mock import patch
+
+    from src.auth.hashing import password_hasher
+    from src.models.sql_models import User
+
+    db_path = tmp_path / 'locks.db'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{db_path}", 'TESTING': True})
+    lock_free = []
+
+    def verify(password_hash, password, client_key=None):
+        # Another writer must be able to take the write lock while the hash is checked
+        other = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+            lock_free.append(True)
+        except sqlite3.OperationalError:
+            lock_free.append(False)
+        finally:
+            other.close()
+        return True
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='lock_user', email='lock_user@example.com', password_hash='stored-hash')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'X-API-Key': user.api_key}
+        db.session.remove()
+
+        client = app.test_client()
+        with patch.object(password_hasher, 'verify', side_effect=verify), \
+                patch.object(password_hasher, 'needs_rehash', return_value=False):
+            assert client.post('/api/auth/login', json={'username': 'lock_user', 'password': 'x'}).status_code == 200
+            assert client.delete('/api/auth/account', headers=headers, json={'password': 'x'}).status_code == 200
+
+        assert lock_free == [True, True]
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    print("✅ Password check without write lock test passed")
+
+
+def test_write_lock_wait_yields_under_gevent(tmp_path):
+    """Waiting for the write lock lets the worker's other greenlets run"""
+    output = subprocess.run([sys.executable, '-c', GEVENT_LOCK_WAIT, str(ROOT), str(tmp_path / 'gevent.db')],
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    # The write went through only after all 20 ticks released the lock
+    assert result == {'ticks_before_write': 20, 'busy_timeout': 0, 'rows': 1}
+    print("✅ Gevent write lock wait test passed")
@@ -0,0 +1,149 @@
+"""
+Tests for request deadlines: the remaining budget as upstream timeout,
+aborting in-flight calls, leaving the scheduler queue, 504 from the route.
+"""
+
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api.deadline import Deadline, DeadlineExceeded, cancellation_stats, current_deadline
+from src.api.scheduler import UpstreamScheduler
+from src.api.yandex_gpt import YandexGPTClient
+from src.models.sql_models import User
+
+TEXT = "Could not focus at work today, I keep worrying about the appointment tomorrow."
+UPSTREAM_DELAY = 3.0
+
+
+class SlowUpstream(BaseHTTPRequestHandler):
+    """Answers a valid completion after UPSTREAM_DELAY seconds"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(UPSTREAM_DELAY)
+        body = json.dumps({"result": {"alternatives": [{"message": {"text": json.dumps({
+            "sentiment": "negative", "entities": {"emotions": ["worry"], "skills": []},
+            "distortions": [], "confidence_score": 0.9})}}]}}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client aborted the call
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream_client(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowUpstream)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    monkeypatch.setenv('YANDEX_API_URL', f"http://127.0.0.1:{server.server_address[1]}/completion")
+    yield YandexGPTClient()
+    server.shutdown()
+    server.server_close()
+
+
+def analyze_under(client, deadline):
+    token = current_deadline.set(deadline)
+    started = time.perf_counter()
+    try:
+        with pytest.raises(DeadlineExceeded) as error:
+            client.analyze_text(TEXT, 'en')
+    finally:
+        current_deadline.reset(token)
+    return error.value.reason, time.perf_counter() - started
+
+
+def test_remaining_budget_bounds_the_upstream_call(upstream_client):
+    reason, elapsed = analyze_under(upstream_client, Deadline(1.0))
+
+    assert reason == 'deadline'
+    assert elapsed < 1.5 < UPSTREAM_DELAY
+    print("✅ Upstream timeout from deadline test passed")
+
+
+def test_cancel_aborts_in_flight_call(upstream_client):
+    deadline = Deadline(30.0)
+    before = cancellation_stats()['client_disconnected']
+    threading.Timer(0.2, deadline.cancel, args=('client_disconnected',)).start()
+
+    reason, elapsed = analyze_under(upstream_client, deadline)
+
+    assert reason == 'client_disconnected'
+    assert elapsed < 1.0
+    assert cancellation_stats()['client_disconnected'] == before + 1
+    print("✅ In-flight cancellation test passed")
+
+
+def test_queued_call_leaves_scheduler_on_deadline():
+    scheduler = UpstreamScheduler(concurrency=1)
+    scheduler.acquire('busy')
+
+    token = current_deadline.set(Deadline(0.3))
+    try:
+        with pytest.raises(DeadlineExceeded):
+            with scheduler.slot('waiting'):
+                pass
+    finally:
+        current_deadline.reset(token)
+
+    assert scheduler.snapshot()['queued'] == 0
+    scheduler.release('busy')
+    assert scheduler.acquire('waiting') < 0.1
+    print("✅ Scheduler deadline test passed")
+
+
+def test_client_gone_detects_closed_connection():
+    server_side, client_side = socket.socketpair()
+    deadline = Deadline(30.0, client_socket=server_side)
+    assert not deadline.client_gone()
+    client_side.close()
+    assert deadline.client_gone()
+    server_side.close()
+    print("✅ Client disconnect detection test passed")
+
+
+class TestDeadlineHeader:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username="deadline_user", email="deadline_user@example.com")
+        self.user.set_password("safe_test_password_123")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def teardown_method(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_exhausted_deadline_returns_504(self):
+        response = self.client.post('/api/analyze',
+            headers={'X-API-Key': self.user.api_key, 'X-Request-Timeout': '0'},
+            json={'text': TEXT, 'language': 'en'}
+        )
+        assert response.status_code == 504
+        assert json.loads(response.data)['reason'] == 'deadline'
+        print("✅ Deadline header test passed")
@@ -0,0 +1,112 @@
+"""
+Tests for near-duplicate reuse of analyses (MinHash/LSH in src/api/dedup.py).
+"""
+
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api import dedup
+from src.api.models import AnalysisResponse, Entities
+from src.models.sql_models import AnalysisResult, User
+
+ENTRY = ("Today I failed the presentation again. Everyone will think I am useless, "
+         "and I should have prepared much better instead of scrolling my phone all evening.")
+EDITED = ENTRY.replace("all evening", "all evening!").replace("Today", "today")
+OTHER = "Went for a long walk with my sister, we laughed a lot and I slept well afterwards."
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def analyze_text(self, text, language="ru"):
+        self.calls.append(text)
+        return AnalysisResponse(
+            sentiment="negative",
+            entities=Entities(emotions=["shame"], skills=["public speaking"]),
+            distortions=["mind_reading"],
+            confidence_score=0.9
+        )
+
+
+def test_signature_similarity():
+    """Small edits stay above the threshold, unrelated texts fall far below it"""
+    signature = dedup.text_signature(ENTRY)
+    assert len(signature) == dedup.NUM_PERMUTATIONS * 4
+    assert dedup.similarity(signature, dedup.text_signature(ENTRY)) == 1.0
+    assert dedup.similarity(signature, dedup.text_signature(EDITED)) >= dedup.DEDUP_THRESHOLD
+    assert dedup.similarity(signature, dedup.text_signature(OTHER)) < 0.3
+    print("✅ Signature similarity test passed")
+
+
+class TestReuse:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        dedup.reset()
+
+        self.users = []
+        for name in ("dedup_user_a", "dedup_user_b"):
+            user = User(username=name, email=f"{name}@example.com")
+            user.set_password("safe_test_password_123")
+            db.session.add(user)
+            self.users.append(user)
+        db.session.commit()
+
+    def teardown_method(self):
+        dedup.reset()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def analyze(self, user, text):
+        response = self.client.post('/api/analyze',
+            headers={'X-API-Key': user.api_key},
+            json={'text': text, 'language': 'en'}
+        )
+        assert response.status_code == 200
+        return json.loads(response.data)
+
+    def test_near_duplicate_reuses_analysis(self):
+        """An edited resubmission is answered from the stored analysis, once per user"""
+        fake = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            first = self.analyze(self.users[0], ENTRY)
+            second = self.analyze(self.users[0], EDITED)
+            other_user = self.analyze(self.users[1], EDITED)
+            different = self.analyze(self.users[0], OTHER)
+
+        assert fake.calls == [ENTRY, EDITED, OTHER]
+        assert first['reused'] is False
+        assert second['reused'] is True
+        assert second['distortions'] == first['distortions'] == ['mind_reading']
+        assert other_user['reused'] is False and different['reused'] is False
+
+        # The resubmission is still saved, with its own signature
+        records = AnalysisResult.query.filter_by(user_id=self.users[0].id).order_by(AnalysisResult.id).all()
+        assert len(records) == 3
+        assert second['reused_from'] == records[0].id
+        assert all(record.text_signature for record in records)
+        print("✅ Near-duplicate reuse test passed")
+
+    def test_index_survives_restart(self):
+        """A fresh index is rebuilt from stored signatures without decrypting texts"""
+        fake = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            self.analyze(self.users[0], ENTRY)
+            dedup.reset()
+            with patch('src.models.sql_models.decrypt_text', side_effect=AssertionError("text decrypted")):
+                reused = self.analyze(self.users[0], EDITED)
+
+        assert len(fake.calls) == 1
+        assert reused['reused'] is True
+        print("✅ Index rebuild test passed")
@@ -0,0 +1,137 @@
+"""
+Tests for streaming NDJSON/Parquet export (API and CLI).
+"""
+
+import io
+import json
+import sys
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.models.sql_models import AnalysisResult, User
+from src.auth.utils import generate_jwt_token
+
+
+class TestExport:
+    """Export endpoint and command tests"""
+
+    def setup_method(self):
+        """Setup before each test method"""
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.patient = User(username="export_patient", email="patient@example.com")
+        self.therapist = User(username="export_therapist", email="therapist@example.com", is_therapist=True)
+        for user in (self.patient, self.therapist):
+            user.set_password("safe_test_password_123")
+            db.session.add(user)
+        db.session.commit()
+
+        for index in range(5):
+            db.session.add(AnalysisResult.from_response(
+                user_id=self.patient.id,
+                text=f"Diary entry number {index}",
+                language="en",
+                result_dict={
+                    'sentiment': 'negative',
+                    'entities': {'emotions': ['anxiety'], 'skills': []},
+                    'distortions': ['catastrophizing'] if index % 2 == 0 else [],
+                    'confidence_score': 0.9
+                }
+            ))
+        db.session.commit()
+
+    def teardown_method(self):
+        """Cleanup after each test method"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {generate_jwt_token(user.id)}'}
+
+    def test_ndjson_export_excludes_text_by_default(self):
+        """NDJSON export streams one JSON object per line without text"""
+        response = self.client.get('/api/export?format=ndjson', headers=self.auth(self.patient))
+        assert response.status_code == 200
+        assert response.is_streamed
+
+        lines = [json.loads(line) for line in response.data.decode('utf-8').splitlines()]
+        assert len(lines) == 5
+        assert lines[0]['emotions'] == ['anxiety']
+        assert 'original_text' not in lines[0]
+        print("✅ NDJSON export test passed")
+
+    def test_parquet_export_with_text_and_tag_filter(self):
+        """Parquet export decrypts text and filters by tag"""
+        response = self.client.get(
+            '/api/export?format=parquet&include_text=true&tag=distortion:Catastrophizing',
+            headers=self.auth(self.patient)
+        )
+        assert response.status_code == 200
+
+        table = pq.read_table(io.BytesIO(response.data))
+        assert table.num_rows == 3
+        assert table.column('original_text').to_pylist()[0] == "Diary entry number 0"
+        print("✅ Parquet export test passed")
+
+    def link_client(self, *args):
+        result = app.test_cli_runner().invoke(args=['assign-client', str(self.therapist.id), str(self.patient.id), *args])
+        assert result.exit_code == 0, result.output
+
+    def test_cohort_export_requires_therapist(self):
+        """Only therapists may export other users"""
+        self.link_client()
+        query = f'/api/export?user_ids={self.patient.id},{self.therapist.id}'
+        assert self.client.get(query, headers=self.auth(self.patient)).status_code == 403
+
+        response = self.client.get(query, headers=self.auth(self.therapist))
+        assert response.status_code == 200
+        assert len(response.data.decode('utf-8').splitlines()) == 5
+
+        assert self.client.get('/api/export?format=csv', headers=self.auth(self.patient)).status_code == 400
+        print("✅ Cohort export permission test passed")
+
+    def test_cohort_export_rejects_foreign_users(self):
+        """A therapist cannot export users who are not linked as their clients"""
+        stranger = User(username="export_stranger", email="stranger@example.com")
+        stranger.set_password("safe_test_password_123")
+        db.session.add(stranger)
+        db.session.commit()
+
+        query = f'/api/export?include_text=true&user_ids={self.patient.id}'
+        response = self.client.get(query, headers=self.auth(self.therapist))
+        assert response.status_code == 403
+        assert str(self.patient.id) in json.loads(response.data)['details']
+
+        self.link_client()
+        mixed = f'{query},{stranger.id}'
+        response = self.client.get(mixed, headers=self.auth(self.therapist))
+        assert response.status_code == 403
+        assert json.loads(response.data)['details'] == f"Not your clients: {stranger.id}"
+        assert self.client.get(query, headers=self.auth(self.therapist)).status_code == 200
+
+        self.link_client('--remove')
+        assert self.client.get(query, headers=self.auth(self.therapist)).status_code == 403
+        print("✅ Foreign cohort export test passed")
+
+    def test_export_command(self, tmp_path):
+        """CLI export writes a Parquet file in small chunks"""
+        output = tmp_path / 'export.parquet'
+        result = app.test_cli_runner().invoke(args=[
+            'export-analyses', '--format', 'parquet', '--output', str(output), '--chunk-size', '2'
+        ])
+        assert result.exit_code == 0, result.output
+
+        parquet_file = pq.ParquetFile(output)
+        assert parquet_file.metadata.num_rows == 5
+        assert parquet_file.metadata.num_row_groups == 3
+        print("✅ Export command test passed")
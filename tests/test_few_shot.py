@@ -0,0 +1,65 @@
+"""
+Tests for retrieval-based few-shot selection (src/api/few_shot.py).
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api import few_shot
+from src.api.yandex_gpt import YandexGPTClient, load_prompt
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+
+
+def load_golden(language):
+    with open(DATA_DIR / f'golden_standard_{language}.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_selection_respects_k_budget_and_exclusions():
+    """Best match first; never the excluded case, never over k or the budget"""
+    index = few_shot.get_index('en')
+    case = load_golden('en')[3]
+
+    assert index.examples[index.select(case['input_text'], k=1, token_budget=10_000)[0]][0] == case['input_text']
+
+    selected = index.select(case['input_text'], k=3, token_budget=300, exclude_texts={case['input_text']})
+    assert 0 < len(selected) <= 3
+    assert all(index.examples[position][0] != case['input_text'] for position in selected)
+    assert sum(index.tokens[position] for position in selected) <= 300
+    print("✅ Few-shot selection test passed")
+
+
+def test_dynamic_prompt_uses_selected_examples(monkeypatch):
+    """FEW_SHOT_MODE=dynamic splices the selected examples instead of the static file"""
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    monkeypatch.setattr(few_shot, 'FEW_SHOT_MODE', 'dynamic')
+    text = "Failed my driving test today. I will never pass it and everyone thinks I am hopeless."
+
+    prompt = YandexGPTClient()._build_complete_prompt(text, 'en')
+
+    assert few_shot.select_examples(text, 'en') in prompt
+    assert load_prompt('few_shot_examples_en.md') not in prompt
+    assert prompt.rstrip().endswith("ASSISTANT RESPONSE (JSON ONLY):")
+    print("✅ Dynamic few-shot prompt test passed")
+
+
+def test_selection_latency():
+    """Top-k search over the in-memory index stays well under a millisecond"""
+    texts = [(case['input_text'], language) for language in ('ru', 'en') for case in load_golden(language)]
+    for language in ('ru', 'en'):
+        few_shot.get_index(language)
+
+    started = time.perf_counter()
+    for text, language in texts * 10:
+        few_shot.get_index(language).select(text, exclude_texts={text})
+    per_query_ms = (time.perf_counter() - started) * 1000 / (10 * len(texts))
+
+    assert per_query_ms < 1.0
+    print(f"✅ Few-shot selection latency test passed ({per_query_ms:.3f}ms per query)")
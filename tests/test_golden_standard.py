@@ -0,0 +1,140 @@
+"""
+Scoring of the fast local classifier (mode=fast).
+Accuracy is measured on data/fast_holdout_*.json, which the lexicons were
+not built from; thresholds are floors for the lexicons, not targets for the LLM.
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.fast_classifier import allowed_distortions, canonical_distortion, classify
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+
+
+NEUTRAL_TEXTS = {
+    'en': [
+        "I will figure out the bug tomorrow.",
+        "We should meet at five, the room is booked.",
+        "I always take the bus to work.",
+        "Nothing changed in the schedule this week.",
+        "At the end of the day we shipped the update.",
+        "I have to buy milk and bread.",
+        "I feel like pizza tonight.",
+        "The movie was about to start when we arrived.",
+        "Prices compared to last year are about the same.",
+        "He is taller than me and plays basketball.",
+        "I think I am going to the gym later.",
+    ],
+    'ru': [
+        "Будет понятно после обеда.",
+        "Поезд должен прийти в пять.",
+        "Я всегда езжу на работу на автобусе.",
+        "Ничего страшного, встречу перенесли.",
+        "Конец рабочего дня в шесть.",
+        "Он знает город лучше меня.",
+        "Совершенно новый ноутбук приехал сегодня.",
+        "Как будто вчера был понедельник.",
+        "Надо купить хлеба и молока.",
+    ],
+}
+
+
+def load_golden(language):
+    with open(DATA_DIR / f'golden_standard_{language}.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_holdout(language):
+    with open(DATA_DIR / f'fast_holdout_{language}.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def score(language):
+    """Sentiment accuracy, distortion precision/recall, emotion recall on the held-out set"""
+    cases = load_holdout(language)
+    correct = true_pos = false_pos = false_neg = emotions_found = emotions_expected = 0
+    for case in cases:
+        expected = case['expected_output']
+        result = classify(case['input_text'], language)
+
+        correct += result.sentiment == expected['sentiment']
+        expected_distortions = {canonical_distortion(label) for label in expected['distortions']}
+        found = set(result.distortions)
+        true_pos += len(expected_distortions & found)
+        false_pos += len(found - expected_distortions)
+        false_neg += len(expected_distortions - found)
+
+        expected_emotions = set(expected['entities']['emotions'])
+        emotions_found += len(expected_emotions & set(result.entities.emotions))
+        emotions_expected += len(expected_emotions)
+
+    return {
+        'sentiment_accuracy': correct / len(cases),
+        'distortion_precision': true_pos / max(true_pos + false_pos, 1),
+        'distortion_recall': true_pos / max(true_pos + false_neg, 1),
+        'emotion_recall': emotions_found / max(emotions_expected, 1),
+    }
+
+
+@pytest.mark.parametrize('language', ['ru', 'en'])
+def test_fast_classifier_holdout_scores(language):
+    """Scores on the held-out set stay above the recorded floor"""
+    scores = score(language)
+    print(f"{language}: " + ", ".join(f"{name}={value:.2f}" for name, value in scores.items()))
+
+    assert scores['sentiment_accuracy'] >= 0.45
+    assert scores['distortion_precision'] >= 0.8
+    assert scores['distortion_recall'] >= 0.5
+    assert scores['emotion_recall'] >= 0.3
+    print(f"✅ Held-out scores ({language}) test passed")
+
+
+@pytest.mark.parametrize('language', ['ru', 'en'])
+def test_fast_classifier_neutral_texts_have_no_distortions(language):
+    """Everyday sentences with words like "should", "always" or "конец" are not distortions"""
+    for text in NEUTRAL_TEXTS[language]:
+        assert classify(text, language).distortions == [], text
+    print(f"✅ Neutral texts ({language}) test passed")
+
+
+@pytest.mark.parametrize('language', ['ru', 'en'])
+def test_fast_classifier_labels_follow_prompt(language):
+    """Only distortion labels the system prompt allows are emitted"""
+    allowed = allowed_distortions(language)
+    assert allowed
+
+    for case in load_golden(language) + load_holdout(language):
+        assert set(classify(case['input_text'], language).distortions) <= allowed
+    print(f"✅ Prompt label vocabulary ({language}) test passed")
+
+
+def test_fast_classifier_negation():
+    """A negated positive word counts as negative"""
+    assert classify("I am happy with how the day went", 'en').sentiment == 'positive'
+    assert classify("I am not happy with how the day went", 'en').sentiment == 'negative'
+    assert classify("Я не рада, как прошел этот день", 'ru').sentiment == 'negative'
+    print("✅ Negation test passed")
+
+
+def test_fast_classifier_latency():
+    """Well under a millisecond per text once the lexicons are built"""
+    texts = [(case['input_text'], language) for language in ('ru', 'en') for case in load_golden(language)]
+    for text, language in texts:
+        classify(text, language)
+
+    started = time.perf_counter()
+    for _ in range(20):
+        for text, language in texts:
+            classify(text, language)
+    per_text_ms = (time.perf_counter() - started) * 1000 / (20 * len(texts))
+
+    assert per_text_ms < 1.0
+    print(f"✅ Fast classifier latency test passed ({per_text_ms:.3f}ms per text)")
@@ -0,0 +1,53 @@
+"""
+Tests for gunicorn.conf.py: serving mode selection and its validation.
+"""
+
+import multiprocessing
+import runpy
+from pathlib import Path
+
+import pytest
+
+CONFIG = str(Path(__file__).parent.parent / 'gunicorn.conf.py')
+
+
+def load_config(monkeypatch, **env):
+    # PRELOAD_APP=0: with preloading, gevent mode monkey-patches the test process
+    env.setdefault('PRELOAD_APP', '0')
+    for name in ('SERVING_MODE', 'SCHEDULER_ENABLED', 'ADMISSION_ENABLED', 'WEB_CONCURRENCY',
+                 'GUNICORN_WORKER_CONNECTIONS', 'TRUSTED_PROXY_HOPS'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONFIG)
+
+
+def test_gevent_workers_by_default(monkeypatch):
+    config = load_config(monkeypatch)
+    assert config['worker_class'] == 'gevent'
+    assert (config['workers'], config['worker_connections']) == (2, 500)
+
+    # Behind the Railway proxy the app trusts one X-Forwarded-For hop
+    assert config['raw_env'] == ['TRUSTED_PROXY_HOPS=1']
+
+    config = load_config(monkeypatch, WEB_CONCURRENCY='3', GUNICORN_WORKER_CONNECTIONS='100', TRUSTED_PROXY_HOPS='2')
+    assert (config['workers'], config['worker_connections']) == (3, 100)
+    assert config['raw_env'] == ['TRUSTED_PROXY_HOPS=2']
+    print("✅ Gevent serving mode test passed")
+
+
+def test_sync_workers_need_scheduler_and_admission_off(monkeypatch):
+    with pytest.raises(RuntimeError, match='ADMISSION_ENABLED=1 requires SERVING_MODE=gevent'):
+        load_config(monkeypatch, SERVING_MODE='sync', SCHEDULER_ENABLED='0')
+
+    config = load_config(monkeypatch, SERVING_MODE='SYNC', SCHEDULER_ENABLED='0', ADMISSION_ENABLED='0')
+    assert config['worker_class'] == 'sync'
+    assert config['workers'] == multiprocessing.cpu_count() * 2 + 1
+    assert 'worker_connections' not in config
+    print("✅ Sync serving mode test passed")
+
+
+def test_unknown_serving_mode_is_rejected(monkeypatch):
+    with pytest.raises(RuntimeError, match="Unknown SERVING_MODE='eventlet'"):
+        load_config(monkeypatch, SERVING_MODE='eventlet')
+    print("✅ Serving mode validation test passed")
@@ -0,0 +1,94 @@
+"""
+Tests for the offloaded password hasher: pool round trip, rehash detection,
+the per-IP concurrency cap and the client IP behind a reverse proxy.
+"""
+
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.auth.hashing import HashingBusy, PasswordHasher, password_hasher
+
+
+def test_pool_hash_and_verify():
+    """Hashes made in the process pool verify in the pool"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    try:
+        password_hash = hasher.hash("safe_test_password_123")
+        assert password_hash.startswith('pbkdf2:sha256:1000$')
+        assert hasher.verify(password_hash, "safe_test_password_123")
+        assert not hasher.verify(password_hash, "wrong_password")
+    finally:
+        hasher.shutdown()
+    print("✅ Pool hash/verify test passed")
+
+
+def test_needs_rehash_expands_short_method():
+    """A short method name matches werkzeug's full default parameters"""
+    hasher = PasswordHasher(method='scrypt', workers=0)
+    assert not hasher.needs_rehash(hasher.hash("password"))
+    assert hasher.needs_rehash("pbkdf2:sha256:1000$salt$hash")
+    print("✅ Rehash detection test passed")
+
+
+def test_per_ip_cap_rejects_excess_concurrency():
+    """A client over its concurrency cap is shed while others proceed"""
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=0, per_ip_limit=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold_slot():
+        with hasher._slot('10.0.0.1'):
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    try:
+        assert entered.wait(5)
+        with pytest.raises(HashingBusy):
+            hasher.hash("password", client_key='10.0.0.1')
+        assert hasher.hash("password", client_key='10.0.0.2')
+    finally:
+        release.set()
+        holder.join()
+
+    assert hasher.hash("password", client_key='10.0.0.1')
+    print("✅ Per-IP cap test passed")
+
+
+@pytest.mark.parametrize('hops, forwarded_for, client_key', [
+    (0, '203.0.113.7', '10.1.1.1'),           # no trusted proxy: the header is ignored
+    (1, '203.0.113.7', '203.0.113.7'),        # Railway: the client the proxy saw
+    (1, '6.6.6.6, 203.0.113.7', '203.0.113.7'),  # a spoofed leading entry is not trusted
+])
+def test_login_cap_keyed_on_client_behind_proxy(tmp_path, hops, forwarded_for, client_key):
+    """The per-IP cap sees the client, not the proxy every request comes through"""
+    from app import create_app
+    from extensions import db
+    from src.models.sql_models import User
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'proxy.db'}", 'TESTING': True,
+                      'TRUSTED_PROXY_HOPS': hops})
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username="proxy_user", email="proxy@example.com", password_hash="unused"))
+        db.session.commit()
+
+        seen = []
+        with patch.object(password_hasher, 'verify', side_effect=lambda *args, client_key: seen.append(client_key)):
+            app.test_client().post('/api/auth/login', json={'username': 'proxy_user', 'password': 'x'},
+                                   headers={'X-Forwarded-For': forwarded_for},
+                                   environ_base={'REMOTE_ADDR': '10.1.1.1'})
+        assert seen == [client_key]
+
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    print("✅ Client IP behind proxy test passed")
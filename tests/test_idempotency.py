@@ -0,0 +1,118 @@
+"""
+Tests for Idempotency-Key handling on /api/analyze: replay, conflicts,
+release on failure and expiry.
+"""
+
+import json
+import sys
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api import dedup, idempotency
+from src.api.models import AnalysisResponse, Entities
+from src.models.sql_models import AnalysisResult, IdempotencyKey, User
+
+TEXT = "Argued with my brother again, and now I am sure he will never speak to me."
+
+
+class FakeClient:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def analyze_text(self, text, language="ru"):
+        self.calls += 1
+        if self.fail:
+            raise Exception("upstream error")
+        return AnalysisResponse(sentiment="negative", entities=Entities(emotions=["sadness"], skills=[]),
+                                distortions=["fortune_telling"], confidence_score=0.85)
+
+
+class TestIdempotency:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        dedup.reset()
+
+        self.user = User(username="idempotency_user", email="idempotency_user@example.com")
+        self.user.set_password("safe_test_password_123")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def teardown_method(self):
+        dedup.reset()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, key, text=TEXT):
+        return self.client.post('/api/analyze',
+            headers={'X-API-Key': self.user.api_key, 'Idempotency-Key': key},
+            json={'text': text, 'language': 'en'}
+        )
+
+    def test_replay_returns_stored_response_without_new_analysis(self):
+        fake = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            first = self.post('key-1')
+            replay = self.post('key-1')
+            other = self.post('key-1', text=TEXT + " Really.")
+
+        assert first.status_code == replay.status_code == 200
+        assert json.loads(replay.data) == json.loads(first.data)
+        assert replay.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in first.headers
+        assert fake.calls == 1
+        assert db.session.query(AnalysisResult).count() == 1
+        # Same key, different request
+        assert other.status_code == 422
+        print("✅ Idempotent replay test passed")
+
+    def test_failed_request_releases_key(self):
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=FakeClient(fail=True)):
+            assert self.post('key-2').status_code == 500
+        assert db.session.query(IdempotencyKey).count() == 0
+
+        fake = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            assert self.post('key-2').status_code == 200
+        assert fake.calls == 1
+        print("✅ Release on failure test passed")
+
+    def test_in_progress_key_gets_409(self, monkeypatch):
+        monkeypatch.setattr(idempotency, 'IDEMPOTENCY_WAIT', 0.2)
+        with app.test_request_context('/api/analyze', method='POST', json={'text': TEXT, 'language': 'en'}):
+            request_hash = idempotency.request_fingerprint()
+        db.session.add(IdempotencyKey(user_id=self.user.id, key_hash=idempotency.fingerprint(b'key-3'),
+                                      request_hash=request_hash,
+                                      expires_at=idempotency._utcnow() + timedelta(seconds=60)))
+        db.session.commit()
+
+        response = self.post('key-3')
+        assert response.status_code == 409
+        assert response.headers['Retry-After'] == '1'
+        print("✅ In-progress conflict test passed")
+
+    def test_expired_keys_are_reclaimed_and_purged(self):
+        fake = FakeClient()
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            self.post('key-4')
+            db.session.query(IdempotencyKey).update({'expires_at': idempotency._utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+            # Past its TTL the key starts a new analysis
+            assert 'Idempotent-Replayed' not in self.post('key-4').headers
+        assert db.session.query(AnalysisResult).count() == 2
+
+        db.session.query(IdempotencyKey).update({'expires_at': idempotency._utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        assert idempotency.purge_expired() == 1
+        assert db.session.query(IdempotencyKey).count() == 0
+        print("✅ Expiry test passed")
@@ -0,0 +1,152 @@
+"""
+Tests for long-text map-reduce analysis: chunking, merging, parallel latency
+and POST /api/analyze/long.
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api.long_text import analyze_long_text, merge_results, split_text
+from src.api.models import AnalysisResponse, Entities
+from src.models.sql_models import AnalysisResult, User
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+
+
+def diary(min_chars):
+    """Golden-standard entries joined as paragraphs until min_chars"""
+    with open(DATA_DIR / 'golden_standard_en.json', 'r', encoding='utf-8') as file:
+        entries = [case['input_text'] for case in json.load(file)]
+    paragraphs = []
+    while sum(len(paragraph) + 2 for paragraph in paragraphs) < min_chars:
+        paragraphs.append(entries[len(paragraphs) % len(entries)])
+    return "\n\n".join(paragraphs)
+
+
+def result(sentiment, confidence, emotions=(), distortions=()):
+    return AnalysisResponse(sentiment=sentiment, entities=Entities(emotions=list(emotions), skills=[]),
+                            distortions=list(distortions), confidence_score=confidence)
+
+
+class SlowClient:
+    """Fake client: fixed latency per call, records peak concurrency"""
+
+    def __init__(self, delay, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.running = self.peak = 0
+        self.lock = threading.Lock()
+
+    def analyze_text(self, text, language="ru"):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        if text == self.fail_on:
+            raise Exception("upstream error")
+        return result("negative", 0.8, emotions=["anxiety"])
+
+
+def test_split_text_respects_boundaries_and_limit():
+    text = diary(20000)
+    chunks = split_text(text, max_chars=1800)
+
+    assert all(10 <= len(chunk) <= 1800 for chunk in chunks)
+    # Nothing lost or reordered; chunks only ever end at paragraph ends here
+    assert "".join(chunks).replace("\n", "") == text.replace("\n", "")
+    assert all(chunk.split("\n")[-1] in text.split("\n\n") for chunk in chunks)
+    # Even share: the smallest chunk is not a leftover sliver
+    assert min(len(chunk) for chunk in chunks) > 0.5 * max(len(chunk) for chunk in chunks)
+
+    # One run-on paragraph is cut between sentences, then between words
+    run_on = "I keep thinking about it. " * 150 + "word " * 500
+    pieces = split_text(run_on, max_chars=1800)
+    assert all(len(piece) <= 1800 for piece in pieces)
+    assert all(piece.endswith(("it.", "word")) for piece in pieces)
+    print("✅ Chunking test passed")
+
+
+def test_merge_results():
+    merged = merge_results([
+        (1000, result("negative", 0.9, emotions=["Anxiety", "shame"], distortions=["catastrophizing"])),
+        (500, result("positive", 0.5, emotions=["anxiety", "relief"])),
+        (500, result("neutral", 0.4, emotions=["boredom"])),
+    ])
+    assert merged.sentiment == "negative"
+    # Ranked by length x confidence; labels only seen at low confidence are dropped
+    assert merged.entities.emotions == ["Anxiety", "shame", "relief"]
+    assert merged.distortions == ["catastrophizing"]
+    assert merged.confidence_score == round((900 + 250 + 200) / 2000, 3)
+
+    mixed = merge_results([(1000, result("negative", 0.8)), (800, result("positive", 0.9))], total_weight=3600)
+    assert mixed.sentiment == "mixed"
+    # Half of the text failed: confidence is halved
+    assert mixed.confidence_score == round((800 + 720) / 1800 / 2, 3)
+    print("✅ Merge test passed")
+
+
+def test_parallel_latency_stays_close_to_one_call():
+    client = SlowClient(delay=0.1)
+    started = time.perf_counter()
+    merged, chunks, failed = analyze_long_text(client, diary(20000), 'en', max_workers=16)
+    elapsed = time.perf_counter() - started
+
+    assert chunks >= 11 and failed == 0
+    assert client.peak == chunks
+    assert elapsed < 3 * client.delay
+    assert merged.sentiment == "negative"
+    print(f"✅ Parallel latency test passed ({chunks} chunks in {elapsed:.2f}s)")
+
+
+class TestLongTextEndpoint:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username="long_text_user", email="long_text_user@example.com")
+        self.user.set_password("safe_test_password_123")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def teardown_method(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, text):
+        return self.client.post('/api/analyze/long',
+            headers={'X-API-Key': self.user.api_key},
+            json={'text': text, 'language': 'en'}
+        )
+
+    def test_long_text_is_analyzed_and_stored(self):
+        text = diary(6000)
+        # Fail exactly one chunk: the merged result still comes back
+        fake = SlowClient(delay=0.0, fail_on=split_text(text)[0])
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=fake):
+            response = self.post(text)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['chunks'] >= 4 and data['chunks_failed'] == 1
+        assert data['entities']['emotions'] == ["anxiety"]
+        stored = db.session.query(AnalysisResult).one()
+        assert stored.original_text == text
+
+        too_long = self.post("a" * 50001)
+        assert too_long.status_code == 400
+        assert "50000" in json.loads(too_long.data)['message']
+        print("✅ Long-text endpoint test passed")
@@ -0,0 +1,202 @@
+"""
+Tests for batched account deletion and the retention purge.
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import event
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.models import retention
+from src.models.sql_models import (
+    AnalysisResult, DailyRollup, DailyTagRollup, DataVersion, IdempotencyKey, User, analysis_tags, therapist_clients
+)
+
+NOW = datetime(2026, 3, 10, 15, 30)
+
+
+def make_result(emotions):
+    return {
+        'sentiment': 'negative',
+        'entities': {'emotions': emotions, 'skills': []},
+        'distortions': ['catastrophizing'],
+        'confidence_score': 0.8
+    }
+
+
+class TestRetention:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.users = []
+        for index in range(2):
+            user = User(username=f"retention_user_{index}", email=f"retention{index}@example.com")
+            user.set_password("safe_test_password_123")
+            db.session.add(user)
+            self.users.append(user)
+        db.session.commit()
+
+        self.loaded = 0
+        event.listen(AnalysisResult, 'load', self.count_load)
+
+    def teardown_method(self):
+        event.remove(AnalysisResult, 'load', self.count_load)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_load(self, target, context):
+        self.loaded += 1
+
+    def add_analyses(self, user, count, created_at):
+        for index in range(count):
+            record = AnalysisResult.from_response(user.id, f"Journal entry {index}", 'en',
+                                                  make_result(['anxiety', 'guilt']))
+            record.created_at = created_at
+            db.session.add(record)
+        db.session.commit()
+
+    def test_purge_removes_old_analyses_tags_and_rollups(self):
+        old_day = NOW - timedelta(days=40)
+        self.add_analyses(self.users[0], 5, old_day)
+        self.add_analyses(self.users[1], 2, old_day)
+        self.add_analyses(self.users[0], 3, NOW - timedelta(days=2))
+        progress = []
+        version = db.session.get(DataVersion, 1).version
+
+        deleted, cutoff = retention.purge_old_analyses(30, now=NOW, batch_size=2, pause=0,
+                                                       progress=progress.append)
+
+        assert deleted == 7
+        assert progress == [2, 4, 6, 7]
+        assert cutoff == datetime(2026, 2, 8)
+        assert db.session.query(AnalysisResult).count() == 3
+        assert db.session.query(analysis_tags).count() == 3 * 3
+        assert db.session.query(DailyRollup).filter(DailyRollup.day == old_day.date()).count() == 0
+        assert db.session.query(DailyTagRollup).filter(DailyTagRollup.day == old_day.date()).count() == 0
+        assert db.session.query(DailyRollup).one().analyses_count == 3
+        # Bulk deletes bypass the flush hooks but still invalidate dashboard caches
+        db.session.expire_all()
+        assert db.session.get(DataVersion, 1).version > version
+        assert self.loaded == 0
+        print("✅ Retention purge test passed")
+
+    def test_purge_is_off_without_retention_period(self):
+        self.add_analyses(self.users[0], 2, NOW - timedelta(days=4000))
+        assert retention.purge_old_analyses(0, now=NOW) == (0, None)
+        assert db.session.query(AnalysisResult).count() == 2
+        print("✅ Retention off test passed")
+
+    def test_delete_account_endpoint(self, monkeypatch):
+        user, other = self.users
+        self.add_analyses(user, 5, NOW)
+        self.add_analyses(other, 1, NOW)
+        db.session.add(IdempotencyKey(user_id=user.id, key_hash=b'k' * 16, request_hash=b'r' * 16,
+                                      expires_at=NOW))
+        db.session.commit()
+        user_id, api_key = user.id, user.api_key
+        headers = {'X-API-Key': api_key}
+
+        wrong = self.client.delete('/api/auth/account', headers=headers,
+                                   json={'password': 'not_the_password', 'language': 'en'})
+        assert wrong.status_code == 401
+        assert db.session.query(AnalysisResult).count() == 6
+
+        monkeypatch.setattr(retention, 'PURGE_BATCH_SIZE', 2)
+        response = self.client.delete('/api/auth/account', headers=headers,
+                                      json={'password': 'safe_test_password_123', 'language': 'en'})
+        assert response.status_code == 200
+        assert json.loads(response.data)['analyses_deleted'] == 5
+
+        db.session.expire_all()
+        assert db.session.get(User, user_id) is None
+        assert db.session.query(AnalysisResult).filter_by(user_id=user_id).count() == 0
+        assert db.session.query(DailyRollup).filter_by(user_id=user_id).count() == 0
+        assert db.session.query(IdempotencyKey).count() == 0
+        # The other user's data is untouched
+        assert db.session.query(AnalysisResult).filter_by(user_id=other.id).count() == 1
+        assert db.session.query(DailyRollup).filter_by(user_id=other.id).count() == 1
+        assert self.client.get('/api/profile', headers=headers).status_code == 401
+        assert self.loaded == 0
+        print("✅ Account deletion test passed")
+
+    def test_delete_account_over_budget_finishes_from_cli(self, monkeypatch):
+        """A heavy account is disabled in the request and purged by the CLI afterwards"""
+        user, other = self.users
+        self.add_analyses(user, 5, NOW)
+        self.add_analyses(other, 1, NOW)
+        user_id, other_id, username, headers = user.id, other.id, user.username, {'X-API-Key': user.api_key}
+
+        monkeypatch.setattr(retention, 'PURGE_BATCH_SIZE', 2)
+        monkeypatch.setattr(retention, 'ACCOUNT_DELETE_BUDGET', 0)
+        response = self.client.delete('/api/auth/account', headers=headers,
+                                      json={'password': 'safe_test_password_123', 'language': 'en'})
+        assert response.status_code == 202
+        assert json.loads(response.data)['analyses_deleted'] == 2
+
+        db.session.expire_all()
+        marked = db.session.get(User, user_id)
+        assert marked.deleted_at is not None and marked.api_key is None
+        assert db.session.query(AnalysisResult).filter_by(user_id=user_id).count() == 3
+        assert self.client.get('/api/profile', headers=headers).status_code == 401
+        login = self.client.post('/api/auth/login', json={'username': username, 'password': 'safe_test_password_123'})
+        assert login.status_code == 401
+        db.session.remove()
+
+        result = app.test_cli_runner().invoke(args=['purge-deleted-accounts', '--pause', '0'])
+        assert result.exit_code == 0, result.output
+        assert 'Removed 1 deleted accounts with 3 analyses' in result.output
+
+        assert db.session.get(User, user_id) is None
+        assert db.session.query(AnalysisResult).filter_by(user_id=user_id).count() == 0
+        assert db.session.query(DailyRollup).filter_by(user_id=user_id).count() == 0
+        assert db.session.query(AnalysisResult).filter_by(user_id=other_id).count() == 1
+        print("✅ Account deletion over budget test passed")
+
+
+def test_delete_account_without_foreign_key_enforcement(tmp_path, monkeypatch):
+    """No ON DELETE CASCADE needed: SQLite without the profile leaves foreign keys off"""
+    from sqlalchemy import text
+
+    from app import create_app
+
+    monkeypatch.setenv('SQLITE_PROFILE', '0')
+    plain_app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'no_fk.db'}", 'TESTING': True})
+    with plain_app.app_context():
+        # The shared db also knows the main app's read bind; create on this app's engine only
+        db.metadata.create_all(db.engine)
+        assert db.session.execute(text('PRAGMA foreign_keys')).scalar() == 0
+
+        user = User(username="no_fk_user", email="no_fk_user@example.com", password_hash="unused")
+        therapist = User(username="no_fk_therapist", email="no_fk_therapist@example.com", password_hash="unused",
+                         is_therapist=True)
+        db.session.add_all([user, therapist])
+        db.session.commit()
+        db.session.execute(therapist_clients.insert().values(therapist_id=therapist.id, client_id=user.id))
+        record = AnalysisResult.from_response(user.id, "Journal entry", 'en', make_result(['anxiety']))
+        db.session.add(record)
+        db.session.add(IdempotencyKey(user_id=user.id, key_hash=b'k' * 16, request_hash=b'r' * 16,
+                                      status_code=200, response='{"sentiment": "negative"}', expires_at=NOW))
+        db.session.commit()
+        user_id = user.id
+
+        assert retention.delete_account(user_id, pause=0) == (1, True)
+        for model in (AnalysisResult, DailyRollup, DailyTagRollup, IdempotencyKey):
+            assert db.session.query(model).filter_by(user_id=user_id).count() == 0, model.__name__
+        assert db.session.get(User, user_id) is None
+        assert db.session.query(analysis_tags).count() == 0
+        assert db.session.query(therapist_clients).count() == 0
+
+        db.session.remove()
+        db.engine.dispose()
+    print("✅ Account deletion without foreign keys test passed")
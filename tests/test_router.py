@@ -0,0 +1,97 @@
+"""
+Tests for model routing: plan selection and the confidence-gated cascade.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api import router, yandex_gpt
+from src.api.router import FULL_MODEL, LITE_MODEL, ModelRouter
+
+TEXT = "Slept badly again and snapped at my colleague, now I keep replaying it."
+
+
+class ModelSession:
+    """Fake HTTP session answering per model URI"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.models = []
+
+    def post(self, url, **kwargs):
+        model = kwargs['json']['modelUri'].rsplit('/', 1)[1]
+        self.models.append(model)
+        return ModelResponse(self.answers[model])
+
+
+class ModelResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        return {"result": {"alternatives": [{"message": {"text": self.text}}]}}
+
+
+def answer(confidence):
+    return json.dumps({"sentiment": "negative", "entities": {"emotions": ["guilt"], "skills": []},
+                       "distortions": [], "confidence_score": confidence})
+
+
+def make_client(monkeypatch, answers):
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    # Fake calls take microseconds; keep the latency rule out of these tests
+    monkeypatch.setattr(router, 'CASCADE_LATENCY_RATIO', float('inf'))
+    cascade = ModelRouter('cascade')
+    monkeypatch.setattr(yandex_gpt, 'model_router', cascade)
+    client = yandex_gpt.YandexGPTClient()
+    client.session = ModelSession(answers)
+    return client, cascade
+
+
+def test_plan_by_mode_length_and_latency(monkeypatch):
+    """Full mode never uses lite; cascade skips lite for long texts and while lite is slow"""
+    assert ModelRouter('full').plan(TEXT) == ('full', [FULL_MODEL])
+
+    cascade = ModelRouter('cascade')
+    assert cascade.plan(TEXT) == ('lite', [LITE_MODEL, FULL_MODEL])
+    assert cascade.plan("x" * (router.CASCADE_MAX_LITE_CHARS + 1))[0] == 'full:long_text'
+
+    cascade.observe_call(LITE_MODEL, 2.0)
+    cascade.observe_call(FULL_MODEL, 1.0)
+    monkeypatch.setattr(router, 'ROUTER_PROBE_EVERY', 3)
+    routes = [cascade.plan(TEXT)[0] for _ in range(3)]
+    assert routes == ['full:lite_slow', 'full:lite_slow', 'lite']
+    print("✅ Routing plan test passed")
+
+
+def test_cascade_keeps_confident_lite_answer(monkeypatch):
+    client, cascade = make_client(monkeypatch, {LITE_MODEL: answer(0.9), FULL_MODEL: answer(0.95)})
+
+    result = client.analyze_text(TEXT, 'en')
+
+    assert result.confidence_score == 0.9
+    assert client.session.models == [LITE_MODEL]
+    assert cascade.snapshot()['routes']['lite']['count'] == 1
+    print("✅ Confident lite answer test passed")
+
+
+def test_cascade_escalates_on_low_confidence_and_invalid(monkeypatch):
+    client, cascade = make_client(monkeypatch, {LITE_MODEL: answer(0.4), FULL_MODEL: answer(0.95)})
+    assert client.analyze_text(TEXT, 'en').confidence_score == 0.95
+
+    client.session.answers[LITE_MODEL] = "not json"
+    assert client.analyze_text(TEXT, 'en').confidence_score == 0.95
+
+    assert client.session.models == [LITE_MODEL, FULL_MODEL, LITE_MODEL, FULL_MODEL]
+    snapshot = cascade.snapshot()
+    assert set(snapshot['routes']) == {'lite->full:low_confidence', 'lite->full:invalid'}
+    assert snapshot['models'][LITE_MODEL]['calls'] == 2
+    assert snapshot['models'][FULL_MODEL]['ewma_ms'] is not None
+    print("✅ Cascade escalation test passed")
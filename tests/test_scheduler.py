@@ -0,0 +1,162 @@
+"""
+Tests for the fair upstream scheduler: weighted dequeue order, per-user cap,
+wait metrics, gevent workers.
+"""
+
+import json
+import runpy
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.api.scheduler import UpstreamScheduler
+
+ROOT = Path(__file__).parent.parent
+
+# One gevent worker process: greenlets share the scheduler, calls yield while "waiting on the upstream"
+GEVENT_WORKER = """
+from gevent import monkey
+monkey.patch_all()
+
+import json
+import sys
+import time
+
+import gevent
+
+sys.path.insert(0, sys.argv[1])
+from src.api.scheduler import UpstreamScheduler
+
+scheduler = UpstreamScheduler(concurrency=2, user_max_in_flight=2)
+order = []
+running = [0, 0]  # now, peak
+
+def call(user_id):
+    with scheduler.slot(user_id):
+        order.append(user_id)
+        running[0] += 1
+        running[1] = max(running[1], running[0])
+        time.sleep(0.05)
+        running[0] -= 1
+
+started = time.monotonic()
+greenlets = [gevent.spawn(call, 'bulk') for _ in range(8)]
+gevent.sleep(0.01)
+greenlets.append(gevent.spawn(call, 'light'))
+gevent.joinall(greenlets)
+print(json.dumps({'order': order, 'peak': running[1], 'elapsed': time.monotonic() - started}))
+"""
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "scheduler did not reach the expected state"
+        time.sleep(0.001)
+
+
+def submit(scheduler, order, user_id, weight=1.0, hold=None):
+    """Queue one call in a thread; it records its user when it gets a slot"""
+    def call():
+        with scheduler.slot(user_id, weight):
+            order.append(user_id)
+            if hold is not None:
+                hold.wait()
+
+    queued = scheduler.snapshot()['queued'] + scheduler.snapshot()['in_flight']
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    # Enqueue one at a time so start tags are assigned in submission order
+    wait_until(lambda: scheduler.snapshot()['queued'] + scheduler.snapshot()['in_flight'] == queued + 1)
+    return thread
+
+
+def run_behind_blocker(scheduler, calls):
+    """Queue calls behind a held slot, release it and return the dequeue order"""
+    order = []
+    release = threading.Event()
+    threads = [submit(scheduler, [], 'blocker', hold=release)]
+    threads += [submit(scheduler, order, user_id, weight) for user_id, weight in calls]
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+    return order
+
+
+def test_bulk_user_does_not_starve_others():
+    scheduler = UpstreamScheduler(concurrency=1, user_max_in_flight=1)
+
+    order = run_behind_blocker(scheduler, [('bulk', 1.0)] * 5 + [('other', 1.0)])
+
+    # Submitted last, but served right after the bulk user's first call
+    assert order.index('other') == 1
+    assert scheduler.snapshot()['in_flight'] == 0
+    print("✅ Fair dequeue test passed")
+
+
+def test_therapist_weight_gets_larger_share():
+    scheduler = UpstreamScheduler(concurrency=1, user_max_in_flight=1)
+
+    order = run_behind_blocker(scheduler, [('client', 1.0)] * 4 + [('therapist', 3.0)] * 4)
+
+    # Weight 3: three therapist calls per client call while both are backlogged
+    assert order[:5] == ['client', 'therapist', 'therapist', 'therapist', 'client']
+    print("✅ Therapist weight test passed")
+
+
+def test_per_user_in_flight_cap_and_wait_metrics():
+    scheduler = UpstreamScheduler(concurrency=4, user_max_in_flight=2)
+    order = []
+    release = threading.Event()
+
+    threads = [submit(scheduler, order, 'bulk', hold=release) for _ in range(3)]
+    snapshot = scheduler.snapshot()
+    assert (snapshot['in_flight'], snapshot['queued']) == (2, 1)
+
+    # A free global slot still goes to another user
+    threads.append(submit(scheduler, order, 'other', hold=release))
+    assert scheduler.snapshot()['in_flight'] == 3
+    release.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    stats = scheduler.snapshot()
+    assert stats['users']['bulk']['calls'] == 3
+    assert stats['users']['bulk']['wait_max_ms'] >= stats['users']['other']['wait_max_ms']
+    assert set(scheduler.snapshot({'other'})['users']) == {'other'}
+    print("✅ Per-user cap test passed")
+
+
+def test_fair_queueing_across_gevent_greenlets():
+    """Under gevent workers one process queues many requests and serves them fairly"""
+    pytest.importorskip('gevent')
+    output = subprocess.run([sys.executable, '-c', GEVENT_WORKER, str(ROOT)],
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result['peak'] == 2
+    # The light user's single call overtakes the bulk user's backlog
+    assert result['order'].index('light') <= 3
+    # Calls overlapped: well under 9 calls x 50ms run one after another
+    assert result['elapsed'] < 0.4
+    print("✅ Gevent fair queueing test passed")
+
+
+def test_gunicorn_refuses_sync_workers_with_scheduler(monkeypatch):
+    """The per-process scheduler is useless with one request per process"""
+    monkeypatch.setenv('SERVING_MODE', 'sync')
+    monkeypatch.setenv('SCHEDULER_ENABLED', '1')
+    with pytest.raises(RuntimeError, match='SERVING_MODE=gevent'):
+        runpy.run_path(str(ROOT / 'gunicorn.conf.py'))
+
+    monkeypatch.setenv('SCHEDULER_ENABLED', '0')
+    monkeypatch.setenv('ADMISSION_ENABLED', '0')
+    assert runpy.run_path(str(ROOT / 'gunicorn.conf.py'))['worker_class'] == 'sync'
+    print("✅ Gunicorn serving mode check test passed")
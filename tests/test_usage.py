@@ -0,0 +1,202 @@
+"""
+Tests for the usage ledger: token counts and latency recorded per analysis,
+aggregate queries and the usage-report command.
+"""
+
+import contextvars
+import json
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app, db
+from src.api import dedup
+from src.api.usage import UsageMeter, metered, price_per_1k, record_call
+from src.api.yandex_gpt import YandexGPTClient
+from src.models.analytics import usage_by_day, usage_percentiles, usage_totals
+from src.models.sql_models import AnalysisResult, AnalysisUsage, AnalysisUsageModel, User
+
+TEXT = "Slept badly again and snapped at my partner over breakfast, I feel awful about it."
+
+
+class CompletionWithUsage(BaseHTTPRequestHandler):
+    """Answers a valid completion with a usage block"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = json.dumps({"result": {
+            "alternatives": [{"message": {"text": json.dumps({
+                "sentiment": "negative", "entities": {"emotions": ["guilt"], "skills": []},
+                "distortions": [], "confidence_score": 0.9})}}],
+            "usage": {"inputTextTokens": "812", "completionTokens": "46", "totalTokens": "858"}
+        }}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream_client(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CompletionWithUsage)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    monkeypatch.setenv('YANDEX_API_URL', f"http://127.0.0.1:{server.server_address[1]}/completion")
+    yield YandexGPTClient()
+    server.shutdown()
+    server.server_close()
+
+
+def test_meter_sums_calls_from_threads():
+    clock = iter([0.0, 2.5]).__next__
+    meter = UsageMeter(clock=clock)
+    with metered(meter):
+        # Like long-text chunks: worker threads run in a copy of the request's context
+        workers = [threading.Thread(target=contextvars.copy_context().run,
+                                    args=(record_call, 'gpt://f/yandexgpt-lite', 100, 10, 0.5))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    # Outside the block calls are not counted
+    record_call('gpt://f/yandexgpt', 100, 10, 0.5)
+
+    record = meter.to_record('static-test')
+    assert (record.calls, record.prompt_tokens, record.completion_tokens) == (3, 300, 30)
+    assert (record.upstream_ms, record.total_ms) == (1500, 2500)
+    assert UsageMeter().to_record('static-test') is None
+    assert price_per_1k('gpt://f/yandexgpt-lite/latest') < price_per_1k('gpt://f/yandexgpt/latest')
+    print("✅ Usage meter test passed")
+
+
+class TestUsageLedger:
+    def setup_method(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        self.app_context = app.app_context()
+        self.app_context.push()
+        db.create_all()
+        dedup.reset()
+
+        self.user = User(username="usage_user", email="usage_user@example.com")
+        self.user.set_password("safe_test_password_123")
+        db.session.add(self.user)
+        db.session.commit()
+
+    def teardown_method(self):
+        dedup.reset()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, **payload):
+        return self.client.post('/api/analyze', headers={'X-API-Key': self.user.api_key},
+                                json=dict({'text': TEXT, 'language': 'en'}, **payload))
+
+    def add_analysis(self, language, total_ms, model='yandexgpt', prompt_version='static-a', created_at=None):
+        record = AnalysisResult.from_response(self.user.id, TEXT, language, {
+            'sentiment': 'neutral', 'entities': {'emotions': [], 'skills': []},
+            'distortions': [], 'confidence_score': 0.8})
+        record.created_at = created_at or datetime.now(timezone.utc)
+        record.usage = AnalysisUsage(model_uri=f"gpt://folder/{model}", prompt_version=prompt_version, calls=1,
+                                     prompt_tokens=900, completion_tokens=100,
+                                     upstream_ms=total_ms - 50, total_ms=total_ms,
+                                     models=[AnalysisUsageModel(model_uri=f"gpt://folder/{model}", calls=1,
+                                                                prompt_tokens=900, completion_tokens=100)])
+        db.session.add(record)
+
+    def test_analysis_records_usage_row(self, upstream_client):
+        with patch('src.api.yandex_gpt.get_yandex_gpt_client', return_value=upstream_client):
+            assert self.post().status_code == 200
+        assert self.post(mode='fast').status_code == 200
+
+        usage = db.session.query(AnalysisUsage).one()
+        assert usage.model_uri == 'gpt://test-folder/yandexgpt'
+        assert (usage.calls, usage.prompt_tokens, usage.completion_tokens) == (1, 812, 46)
+        assert 0 <= usage.upstream_ms <= usage.total_ms
+        assert usage.prompt_version.startswith('static-')
+        # Fast mode makes no upstream call and gets no ledger row
+        assert db.session.query(AnalysisResult).count() == 2
+        print("✅ Usage row test passed")
+
+    def test_aggregates_and_report(self):
+        for total_ms in range(100, 1100, 100):
+            self.add_analysis('en', total_ms)
+        self.add_analysis('ru', 3000, model='yandexgpt-lite', prompt_version='static-b',
+                          created_at=datetime.now(timezone.utc) - timedelta(days=1))
+        db.session.commit()
+
+        totals = usage_totals()
+        assert totals['en']['analyses'] == 10
+        assert totals['en']['tokens_per_char'] == pytest.approx(1000 / len(TEXT))
+        assert usage_totals(by='prompt_version')['static-b']['analyses'] == 1
+
+        percentiles = usage_percentiles('total_ms')
+        assert percentiles['en'] == {0.5: 600, 0.99: 1000}
+        assert percentiles['ru'] == {0.5: 3000, 0.99: 3000}
+
+        days = usage_by_day()
+        assert [(calls, prompt) for _, _, calls, prompt, _ in days] == [(1, 900), (10, 9000)]
+
+        result = app.test_cli_runner().invoke(args=['usage-report', '--days', '3'])
+        assert result.exit_code == 0, result.output
+        assert 'tokens/char' in result.output
+        # 10 full analyses at 1.2 per 1000 tokens + 1 lite at 0.2
+        assert '✅ Total cost: 12.20' in result.output
+        print("✅ Usage aggregates test passed")
+
+    def test_cascade_tokens_priced_per_model(self):
+        """A lite call followed by an escalation is billed at each model's own price"""
+        meter = UsageMeter()
+        meter.add_call('gpt://folder/yandexgpt-lite/latest', 900, 100, 0.2)
+        meter.add_call('gpt://folder/yandexgpt/latest', 900, 100, 0.8)
+        record = AnalysisResult.from_response(self.user.id, TEXT, 'en', {
+            'sentiment': 'neutral', 'entities': {'emotions': [], 'skills': []},
+            'distortions': [], 'confidence_score': 0.8})
+        record.usage = meter.to_record('static-a')
+        db.session.add(record)
+        db.session.commit()
+
+        usage = db.session.query(AnalysisUsage).one()
+        assert usage.model_uri == 'gpt://folder/yandexgpt/latest'
+        assert (usage.calls, usage.prompt_tokens) == (2, 1800)
+        assert sorted((row.model_uri, row.calls, row.prompt_tokens) for row in usage.models) == [
+            ('gpt://folder/yandexgpt-lite/latest', 1, 900), ('gpt://folder/yandexgpt/latest', 1, 900)
+        ]
+
+        result = app.test_cli_runner().invoke(args=['usage-report', '--days', '1'])
+        assert result.exit_code == 0, result.output
+        # 1000 tokens at 0.2 + 1000 at 1.2, not 2000 at the full-model rate
+        assert '✅ Total cost: 1.40' in result.output
+        print("✅ Cascade pricing test passed")
+
+    def test_init_db_splits_existing_usage(self):
+        """Ledger rows recorded before the per-model split are attributed to their model"""
+        self.add_analysis('en', 500)
+        db.session.commit()
+        db.session.query(AnalysisUsageModel).delete()
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['init-db'])
+        assert result.exit_code == 0, result.output
+        assert [(row.model_uri, row.prompt_tokens) for row in db.session.query(AnalysisUsageModel)] == [
+            ('gpt://folder/yandexgpt', 900)
+        ]
+        assert 'per-model usage rows for 1 analyses' in result.output
+        assert 'per-model' not in app.test_cli_runner().invoke(args=['init-db']).output
+        print("✅ Usage split backfill test passed")
@@ -0,0 +1,76 @@
+"""
+Tests for worker warm-up and the shared prompt cache.
+"""
+
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import app
+from src.api import yandex_gpt
+from src.warmup import warm_worker
+
+
+def test_prompts_are_read_once():
+    """Prompt files are cached per process and independent of the working directory"""
+    yandex_gpt._prompt_cache.clear()
+    count = yandex_gpt.preload_prompts()
+    assert count == len(list(yandex_gpt.PROMPTS_DIR.glob('*.md')))
+
+    with patch.object(Path, 'read_text', side_effect=AssertionError("prompt re-read")):
+        assert yandex_gpt.load_prompt('system_prompt_en.md')
+    print("✅ Prompt cache test passed")
+
+
+def test_warm_worker_primes_resources(monkeypatch):
+    """Warm-up connects to the DB and opens the upstream connection once"""
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    monkeypatch.setattr(yandex_gpt, '_yandex_gpt_client_instance', None)
+
+    with patch('requests.Session.head') as head:
+        warm_worker(app)
+    head.assert_called_once()
+    assert yandex_gpt._yandex_gpt_client_instance is not None
+    print("✅ Worker warm-up test passed")
+
+
+def test_warm_worker_tolerates_missing_credentials(monkeypatch):
+    """A worker without YandexGPT credentials still boots"""
+    monkeypatch.delenv('YANDEX_API_KEY', raising=False)
+    monkeypatch.setattr(yandex_gpt, '_yandex_gpt_client_instance', None)
+    warm_worker(app)
+    assert yandex_gpt._yandex_gpt_client_instance is None
+    print("✅ Warm-up without credentials test passed")
+
+
+def test_warm_worker_disposes_every_engine(monkeypatch):
+    """Pools inherited from the master are dropped for the write engine and the read bind"""
+    from extensions import db
+
+    monkeypatch.delenv('YANDEX_API_KEY', raising=False)
+    monkeypatch.setattr(yandex_gpt, '_yandex_gpt_client_instance', None)
+    with app.app_context():
+        engines = list(db.engines.values())
+    assert len(engines) == 2
+
+    disposed = []
+    for engine in engines:
+        monkeypatch.setattr(engine, 'dispose', lambda close=True, engine=engine: disposed.append(engine))
+    warm_worker(app)
+    assert disposed == engines
+    print("✅ Engine dispose on warm-up test passed")
+
+
+def test_warm_worker_survives_upstream_errors(monkeypatch):
+    """A network or TLS error while warming the upstream connection does not escape"""
+    monkeypatch.setenv('YANDEX_API_KEY', 'test-key')
+    monkeypatch.setenv('YANDEX_FOLDER_ID', 'test-folder')
+    monkeypatch.setattr(yandex_gpt, '_yandex_gpt_client_instance', None)
+
+    with patch('requests.Session.head', side_effect=OSError("TLS handshake failed")):
+        warm_worker(app)
+    print("✅ Warm-up upstream error test passed")